@@ -4,5 +4,7 @@ from django.core.wsgi import get_wsgi_application
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "school_project.settings")
+# Cold starts skip the admin, seeding and API docs apps; set DJANGO_APP_PROFILE=full to serve them.
+os.environ.setdefault("DJANGO_APP_PROFILE", "lean")
 
 app = get_wsgi_application()
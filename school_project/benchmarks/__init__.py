@@ -0,0 +1,23 @@
+"""
+Performance benchmarks for the API.
+
+Run them from the directory that contains ``manage.py``, for example::
+
+    python -m benchmarks.json_render
+"""
+
+import os
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module="school_project.settings"):
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    import django
+
+    django.setup()
@@ -0,0 +1,95 @@
+"""
+Bytes on the wire and CPU cost of response compression, per coding and level, on the
+JSON payloads of benchmarks.json_render and a start-attempt response. ``gzip+segment`` is
+the start-attempt response gzipped around its cached question set, as CompressionMiddleware
+sends it; brotli rows appear when the ``brotli`` package is installed.
+
+    python -m benchmarks.compression --repeat 20 --link-kbps 1000
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from benchmarks import setup_django
+from benchmarks.json_render import PAYLOADS
+
+
+def start_attempt_test_payload(questions=60):
+    return {
+        "id": 12,
+        "title": "Algebra: yakuniy nazorat",
+        "description": "Kasr va tenglamalar bo'yicha nazorat ishi.",
+        "time_limit_sec": 2700,
+        "questions": [
+            {
+                "id": 5_000 + q,
+                "text": f"{q + 2}x + {q} = {3 * q + 7} tenglamani yeching. x nechaga teng?",
+                "question_type": "OC",
+                "mark": 1.5,
+                "answer_options": [{"id": 20_000 + q * 4 + o, "text": f"x = {q + o}"} for o in range(4)],
+            }
+            for q in range(questions)
+        ],
+    }
+
+
+def _time(function, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--link-kbps", type=int, default=1000, help="link speed used for the transfer time column")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.test import override_settings
+
+    from school_project import compression
+    from school_project.renderers import FastJSONRenderer
+
+    renderer = FastJSONRenderer()
+    test = start_attempt_test_payload()
+    cached = compression.segment(renderer.render(test))
+    started_at = datetime(2026, 5, 20, 9, 0, tzinfo=dt_timezone.utc)
+    bodies = {name: renderer.render(build()) for name, build in PAYLOADS.items()}
+    bodies["start_attempt"] = renderer.render({"attempt_id": 90_001, "test_id": 12, "started_at": started_at, "test": test})
+
+    codings = [("gzip-1", "gzip", 1), ("gzip-6", "gzip", 6), ("gzip-9", "gzip", 9)]
+    if compression.brotli is not None:
+        codings += [("br-4", "br", 4), ("br-5", "br", 5), ("br-11", "br", 11)]
+    else:
+        print("brotli is not installed; only gzip is measured.")
+
+    def wire_ms(size):
+        return size * 8 / args.link_kbps
+
+    print(f"{'payload':<22}{'coding':<14}{'bytes':>10}{'ratio':>8}{'cpu ms':>9}{'wire ms':>10}")
+    for name, body in bodies.items():
+        print(f"{name:<22}{'identity':<14}{len(body):>10}{1:>8.2f}{0:>9.2f}{wire_ms(len(body)):>10.1f}")
+        for label, encoding, level in codings:
+            setting = "COMPRESSION_GZIP_LEVEL" if encoding == "gzip" else "COMPRESSION_BROTLI_QUALITY"
+            with override_settings(**{setting: level}):
+                cpu_ms, compressed = _time(lambda: compression.compress(body, encoding), args.repeat)
+            ratio = len(compressed) / len(body)
+            print(f"{'':<22}{label:<14}{len(compressed):>10}{ratio:>8.2f}{cpu_ms:>9.2f}{wire_ms(len(compressed)):>10.1f}")
+        if name == "start_attempt":
+            cpu_ms, compressed = _time(lambda: compression.gzip_around(body, cached), args.repeat)
+            if gzip.decompress(compressed) != body:
+                raise SystemExit("gzip+segment produced a different body")
+            ratio = len(compressed) / len(body)
+            print(f"{'':<22}{'gzip+segment':<14}{len(compressed):>10}{ratio:>8.2f}{cpu_ms:>9.2f}{wire_ms(len(compressed)):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
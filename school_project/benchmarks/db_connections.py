@@ -0,0 +1,157 @@
+"""
+Compare the connection-setup overhead of the database connection modes under burst load.
+
+    DATABASE_URL=postgres://... python -m benchmarks.db_connections --threads 32 --requests 20
+
+Each mode serves one burst: ``--threads`` workers start together and each handles
+``--requests`` simulated requests, with the connection handling Django does on
+request_started/request_finished around a ``SELECT 1``. Modes:
+
+- ``fresh``: ``CONN_MAX_AGE=0``, a new connection per request.
+- ``persistent``: ``CONN_MAX_AGE`` with health checks, one connection per worker thread.
+- ``pool``: the psycopg 3 pool (``DB_POOL=true`` in settings); skipped when psycopg_pool
+  is not installed or the database is not PostgreSQL.
+
+The report lists p50/p95 request latency, the burst wall time and how many server
+connections were opened. SQLite has no handshake to save, so there the numbers only show
+that the harness works.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks import setup_django
+from benchmarks.exam_day import percentile
+
+
+MODES = ("fresh", "persistent", "pool")
+
+
+def mode_settings(mode, base):
+    """Copy of the ``base`` DATABASES entry configured for ``mode``; None if unsupported."""
+    from school_project.settings import _pool_options
+
+    settings_dict = dict(base, OPTIONS=dict(base.get("OPTIONS", {})), TEST=dict(base.get("TEST", {})))
+    settings_dict["OPTIONS"].pop("pool", None)
+    settings_dict["CONN_HEALTH_CHECKS"] = True
+    if mode == "fresh":
+        settings_dict["CONN_MAX_AGE"] = 0
+    elif mode == "persistent":
+        settings_dict["CONN_MAX_AGE"] = 600
+    else:
+        pool = _pool_options()
+        if pool is None or settings_dict["ENGINE"] != "django.db.backends.postgresql":
+            return None
+        settings_dict["OPTIONS"]["pool"] = pool
+        settings_dict["CONN_MAX_AGE"] = 0
+    return settings_dict
+
+
+def burst(alias, threads, requests):
+    """Run the burst on ``alias``; returns per-request latencies in ms and the wall time."""
+    from django.db import close_old_connections, connections
+
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def worker():
+        connection = connections[alias]
+        start.wait()
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            connection.close_if_unusable_or_obsolete()
+            timings.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(timings)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    close_old_connections()
+    return sorted(latencies), (time.perf_counter() - started) * 1000
+
+
+def measure(mode, threads, requests):
+    from django.conf import settings
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    settings_dict = mode_settings(mode, settings.DATABASES["default"])
+    if settings_dict is None:
+        return None
+    alias = f"bench_{mode}"
+    connections.settings[alias] = connections.configure_settings(
+        {**settings.DATABASES, alias: settings_dict}
+    )[alias]
+
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        if connection.alias == alias:
+            opened.append(1)
+
+    connection_created.connect(count, weak=False)
+    try:
+        burst(alias, 1, 1)  # open the pool before timing, like a warm instance
+        opened.clear()
+        latencies, wall_ms = burst(alias, threads, requests)
+        connections_opened = len(opened)
+        if mode == "pool":
+            # Pooled connections are opened by the pool, not by Django.
+            connections_opened = connections[alias].pool.get_stats().get("connections_num", 0)
+    finally:
+        connection_created.disconnect(count)
+        if mode == "pool":
+            connections[alias].close_pool()
+
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "mean_ms": statistics.fmean(latencies),
+        "wall_ms": wall_ms,
+        "connections": connections_opened,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent workers in the burst.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per worker.")
+    parser.add_argument("--mode", choices=MODES, action="append", help="Mode to measure (repeatable).")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.db import connection
+
+    print(f"{connection.vendor} at {connection.settings_dict['HOST'] or connection.settings_dict['NAME']}, "
+          f"{args.threads} workers x {args.requests} requests")
+    print(f"{'mode':<12}{'p50':>9}{'p95':>9}{'mean':>9}{'wall':>10}{'connections':>13}")
+    for mode in args.mode or MODES:
+        row = measure(mode, args.threads, args.requests)
+        if row is None:
+            print(f"{mode:<12}skipped (needs PostgreSQL and psycopg_pool)")
+            continue
+        print(
+            f"{row['mode']:<12}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['mean_ms']:>9.2f}"
+            f"{row['wall_ms']:>10.1f}{row['connections']:>13}"
+        )
+    print("Latencies in ms per request, including connection setup.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Benchmark the main HTTP endpoints against seeded S/M/L datasets and gate regressions.
+
+    python -m benchmarks.endpoints run --tier M --repeat 10
+    python -m benchmarks.endpoints compare              # latest run vs the previous one of that tier
+    python -m benchmarks.endpoints run --tier M --check # run, record, compare, exit 1 on regression
+
+Every scenario goes through Django's test client, so the whole middleware, authentication
+and rendering stack is included. Per scenario the suite records the median, fastest and
+slowest wall time, the SQL query count and the peak Python memory (``tracemalloc``) of a
+single request. Each run is appended to a JSON history file together with the git
+revision, so two revisions can be compared on the same machine.
+
+Each tier lives in its own SQLite file under ``--data-dir``, migrated and filled with
+``seed_scale <tier> --seed <seed>`` the first time it is used; seeding M takes about a
+minute, L several. Requests run inside a transaction that is rolled back, so the file
+never changes. With ``--database configured`` the Django database settings are used as
+they are instead (for example PostgreSQL through ``DATABASE_URL``) and the database must
+already be seeded with the tier.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from benchmarks import PROJECT_DIR, setup_django
+
+
+DEFAULT_HISTORY = PROJECT_DIR / "benchmarks" / "results" / "endpoints.json"
+DEFAULT_DATA_DIR = PROJECT_DIR / "benchmarks" / "data"
+# The dataset sizes of ``manage.py seed_scale``.
+TIERS = ("XS", "S", "M", "L", "XL")
+
+# Issued by the rollback around every measured request, not by the endpoint.
+SAVEPOINT_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+# Environment variables that make settings pick PostgreSQL over the tier's SQLite file.
+DATABASE_URL_VARIABLES = (
+    "DATABASE_URL", "POSTGRES_URL", "POSTGRES_PRISMA_URL", "DATABASE_URL_UNPOOLED", "POSTGRES_URL_NON_POOLING",
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    url_name: str
+    # Function returning (user, URL kwargs) for the heaviest matching object in the dataset.
+    target: object
+    method: str = "get"
+
+
+def _heaviest(queryset, relation):
+    from django.db.models import Count
+
+    return queryset.annotate(weight=Count(relation)).order_by("-weight", "pk").first()
+
+
+def busiest_test():
+    from testapp.models import Test
+
+    test = _heaviest(Test.objects.select_related("teacher__user"), "testattempt")
+    return test.teacher.user, {"test_id": test.pk}
+
+
+def longest_attempt():
+    from testapp.models import TestAttempt
+
+    attempt = _heaviest(TestAttempt.objects.select_related("test__teacher__user"), "answers")
+    return attempt.test.teacher.user, {"attempt_id": attempt.pk}
+
+
+def busiest_teacher():
+    from schoolapp.models import Teacher
+
+    teacher = _heaviest(Teacher.objects.filter(user__isnull=False).select_related("user"), "tasks")
+    return teacher.user, {}
+
+
+def largest_course():
+    from schoolapp.models import Course
+
+    course = _heaviest(Course.objects.filter(teacher__user__isnull=False).select_related("teacher__user"), "enrollments")
+    return course.teacher.user, {"course_id": course.pk}
+
+
+def busiest_task():
+    from schoolapp.models import Task
+
+    task = _heaviest(Task.objects.select_related("teacher__user"), "submissions")
+    return task.teacher.user, {"pk": task.pk}
+
+
+def busiest_student():
+    from schoolapp.models import Student
+
+    student = _heaviest(Student.objects.filter(user__isnull=False).select_related("user"), "enrollments")
+    return student.user, {}
+
+
+def busiest_nazorat():
+    from django.db.models import Count
+
+    from nazoratapp.models import Nazorat
+    from testapp.models import TestAttempt
+
+    attempts = dict(TestAttempt.objects.order_by().values_list("test").annotate(Count("id")))
+    nazorat = max(
+        Nazorat.objects.filter(source_type="test", course__teacher__user__isnull=False).select_related("course__teacher__user"),
+        key=lambda item: (attempts.get(item.source_id, 0), -item.pk),
+    )
+    return nazorat.course.teacher.user, {"pk": nazorat.pk}
+
+
+SCENARIOS = [
+    Scenario("teacher_test_results", "testapp:api_v1_teacher_test_results", busiest_test),
+    Scenario("teacher_attempt_details", "testapp:api_v1_teacher_attempt_details", longest_attempt),
+    Scenario("course_stats", "course_stats", busiest_teacher),
+    Scenario("course_stats_table", "teacher/course_stats_table", largest_course),
+    Scenario("task_stats", "task_stats_detail", busiest_task),
+    Scenario("student_tasks", "student_tasks", busiest_student),
+    Scenario("student_tests", "testapp:api_v1_student_tests", busiest_student),
+    Scenario("nazorat_recompute", "nazorat-calculate-scores", busiest_nazorat, method="post"),
+]
+
+
+# --- measuring ----------------------------------------------------------------
+
+
+def _request(client, scenario, url):
+    from django.db import transaction
+
+    # Roll every request back so write scenarios see the same data each time.
+    with transaction.atomic():
+        response = getattr(client, scenario.method)(url, HTTP_ACCEPT="application/json")
+        transaction.set_rollback(True)
+    return response
+
+
+def measure(scenario, repeat):
+    """Run one scenario ``repeat`` times after a warm-up; returns its result row."""
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    user, kwargs = scenario.target()
+    client = APIClient(raise_request_exception=False)
+    client.force_login(user)
+    url = reverse(scenario.url_name, kwargs=kwargs)
+
+    # Warm-up, which also counts the queries; the timed requests run without the wrapper.
+    queries = []
+
+    def count(execute, sql, *args):
+        if not sql.startswith(SAVEPOINT_STATEMENTS):
+            queries.append(sql)
+        return execute(sql, *args)
+
+    with connection.execute_wrapper(count):
+        response = _request(client, scenario, url)
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _request(client, scenario, url)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        _request(client, scenario, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "status": response.status_code,
+        "bytes": len(response.content),
+        "queries": len(queries),
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_suite(repeat=10, names=None, log=print):
+    """Measure every scenario (or the ones in ``names``) against the current database."""
+    from django.db import transaction
+
+    results = {}
+    with transaction.atomic():
+        for scenario in SCENARIOS:
+            if names and scenario.name not in names:
+                continue
+            results[scenario.name] = row = measure(scenario, repeat)
+            log(
+                f"{scenario.name:<26}{row['status']:>5}{row['queries']:>9}{row['median_ms']:>11.2f}"
+                f"{row['min_ms']:>10.2f}{row['max_ms']:>10.2f}{row['peak_kib']:>11.1f}"
+            )
+        # Sessions from force_login and any other leftovers.
+        transaction.set_rollback(True)
+    return results
+
+
+# --- history and comparison -----------------------------------------------------
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.exists():
+        return {"runs": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def append_run(path, run):
+    path = Path(path)
+    history = load_history(path)
+    history["runs"].append(run)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(history, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def find_run(runs, selector, tier=None, before=None):
+    """A run by position (-1 is the latest), id or git revision prefix; newest match wins."""
+    candidates = [run for run in runs if tier is None or run["tier"] == tier]
+    if before is not None:
+        candidates = [run for run in candidates if run["id"] < before["id"]]
+    if selector is None:
+        return candidates[-1] if candidates else None
+    try:
+        return candidates[int(selector)]
+    except (ValueError, IndexError):
+        pass
+    for run in reversed(candidates):
+        if run["id"] == selector or (run.get("git") and run["git"].startswith(selector)):
+            return run
+    return None
+
+
+def compare_runs(baseline, candidate, max_slowdown=1.5, min_delta_ms=2.0, max_memory_growth=1.5, min_delta_kib=256):
+    """Rows of (scenario, baseline row, candidate row, problems); no problems means no regression."""
+    rows = []
+    for name, new in candidate["results"].items():
+        old = baseline["results"].get(name)
+        problems = []
+        if old is None:
+            rows.append((name, None, new, problems))
+            continue
+        if new["status"] != old["status"]:
+            problems.append(f"status {old['status']} -> {new['status']}")
+        if new["queries"] > old["queries"]:
+            problems.append(f"queries {old['queries']} -> {new['queries']}")
+        if new["median_ms"] > old["median_ms"] * max_slowdown and new["median_ms"] - old["median_ms"] > min_delta_ms:
+            problems.append(f"median {new['median_ms'] / old['median_ms']:.2f}x slower")
+        if (
+            new["peak_kib"] > old["peak_kib"] * max_memory_growth
+            and new["peak_kib"] - old["peak_kib"] > min_delta_kib
+        ):
+            problems.append(f"peak memory {new['peak_kib'] / old['peak_kib']:.2f}x")
+        rows.append((name, old, new, problems))
+    return rows
+
+
+def print_comparison(baseline, candidate, rows):
+    print(f"baseline  {baseline['id']} ({baseline.get('git') or 'no git'})")
+    print(f"candidate {candidate['id']} ({candidate.get('git') or 'no git'})  tier {candidate['tier']}")
+    print(f"{'scenario':<26}{'queries':>12}{'median ms':>22}{'peak KiB':>22}")
+    for name, old, new, problems in rows:
+        if old is None:
+            print(f"{name:<26}{'new':>12}")
+            continue
+        print(
+            f"{name:<26}{old['queries']:>5} ->{new['queries']:>4}"
+            f"{old['median_ms']:>10.2f} ->{new['median_ms']:>9.2f}"
+            f"{old['peak_kib']:>10.1f} ->{new['peak_kib']:>9.1f}"
+            + (f"   REGRESSION: {'; '.join(problems)}" if problems else "")
+        )
+
+
+# --- command line -----------------------------------------------------------------
+
+
+def use_tier_database(data_dir, tier, seed):
+    """Point Django at the tier's SQLite file, seeding it first when it does not exist."""
+    path = Path(data_dir) / f"endpoints-{tier}-seed{seed}.sqlite3"
+    partial = path.with_suffix(".partial")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for variable in DATABASE_URL_VARIABLES:
+        os.environ.pop(variable, None)
+    os.environ["DB_ENGINE"] = "django.db.backends.sqlite3"
+    os.environ["DB_NAME"] = str(path if path.exists() else partial)
+    setup_django()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command("migrate", verbosity=0)
+    if path.exists():
+        return path
+
+    print(f"Seeding tier {tier} (seed {seed}) into {path} ...")
+    call_command("seed_scale", tier, seed=seed, flush=True)
+    connection.close()
+    os.replace(partial, path)
+    connection.settings_dict["NAME"] = str(path)
+    return path
+
+
+def cmd_run(args):
+    if args.database == "tier":
+        use_tier_database(args.data_dir, args.tier, args.seed)
+    else:
+        setup_django()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()  # allows the test client's "testserver" host
+    logging.getLogger("school_project.perf").setLevel(logging.ERROR)
+
+    print(f"{'scenario':<26}{'HTTP':>5}{'queries':>9}{'median ms':>11}{'min ms':>10}{'max ms':>10}{'peak KiB':>11}")
+    results = run_suite(args.repeat, set(args.scenario or ()))
+    run = {
+        "id": datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ"),
+        "git": git_revision(),
+        "tier": args.tier,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "results": results,
+    }
+    append_run(args.history, run)
+    print(f"Recorded run {run['id']} in {args.history}")
+
+    if args.check:
+        runs = load_history(args.history)["runs"]
+        baseline = find_run(runs, args.baseline, tier=args.tier, before=run)
+        if baseline is None:
+            print("No earlier run of this tier to compare with.")
+            return 0
+        return report(baseline, run, args)
+    return 0
+
+
+def cmd_compare(args):
+    runs = load_history(args.history)["runs"]
+    candidate = find_run(runs, args.candidate, tier=args.tier)
+    if candidate is None:
+        raise SystemExit("No run to compare; record one with 'run' first.")
+    baseline = find_run(runs, args.baseline, tier=candidate["tier"], before=candidate if args.baseline is None else None)
+    if baseline is None:
+        raise SystemExit(f"No baseline run of tier {candidate['tier']} found.")
+    return report(baseline, candidate, args)
+
+
+def report(baseline, candidate, args):
+    rows = compare_runs(
+        baseline, candidate, args.max_slowdown, args.min_delta_ms, args.max_memory_growth, args.min_delta_kib
+    )
+    print_comparison(baseline, candidate, rows)
+    regressions = [name for name, _, _, problems in rows if problems]
+    if regressions:
+        print(f"{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+def add_threshold_arguments(parser):
+    parser.add_argument("--baseline", help="Baseline run: position (-2), run id or git revision prefix.")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="Allowed median time ratio (default 1.5).")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this.")
+    parser.add_argument("--max-memory-growth", type=float, default=1.5, help="Allowed peak memory ratio.")
+    parser.add_argument("--min-delta-kib", type=float, default=256, help="Ignore memory growth smaller than this.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY), help="JSON history file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Measure every scenario and append the results to the history.")
+    run.add_argument("--tier", choices=TIERS, default="S")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--repeat", type=int, default=10, help="Timed requests per scenario.")
+    run.add_argument("--scenario", action="append", choices=[s.name for s in SCENARIOS], help="Only these scenarios.")
+    run.add_argument("--database", choices=["tier", "configured"], default="tier")
+    run.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="Where the tier SQLite files live.")
+    run.add_argument("--check", action="store_true", help="Compare with the previous run and exit 1 on regression.")
+    add_threshold_arguments(run)
+    run.set_defaults(handler=cmd_run)
+
+    compare = commands.add_parser("compare", help="Compare two recorded runs; exit 1 on regression.")
+    compare.add_argument("--candidate", help="Candidate run (default: the latest).")
+    compare.add_argument("--tier", help="Only consider runs of this tier.")
+    add_threshold_arguments(compare)
+    compare.set_defaults(handler=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Exam-day load test: many students log in through Telegram, open a test, autosave while
+they work and submit together when the deadline hits.
+
+Start the server against a seeded database with the same TELEGRAM_BOT_TOKEN, then::
+
+    python manage.py seed_scale M --flush
+    python -m benchmarks.exam_day --prepare --users 200      # link tg_* logins to seeded students
+    python -m benchmarks.exam_day --url http://127.0.0.1:8000 --users 200 --ramp linear:30 \\
+        --exam-seconds 120 --autosave-every 15
+
+Each virtual user is one thread with its own keep-alive connection. The report lists
+p50/p95/p99 latency, error rate and row-lock time (the ``lock`` metric of the
+``Server-Timing`` header) per endpoint. ``--prepare`` writes to the database configured
+for Django, so run it on the same machine and settings as the server. SQLite allows one
+writer at a time, so submit bursts there show up as "database is locked" 500s; rehearse on
+PostgreSQL for real numbers.
+"""
+
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import setup_django
+
+
+# Virtual user N logs in as Telegram id TELEGRAM_ID_BASE + N (username tg_<id>).
+TELEGRAM_ID_BASE = 9_000_000_000
+
+LOGIN_PATH = "/school/telegram/login/"
+TESTS_PATH = "/testapp/api/v1/student/tests/"
+START_PATH = "/testapp/api/v1/student/tests/{test_id}/start/"
+AUTOSAVE_PATH = "/testapp/api/v1/student/attempts/{attempt_id}/autosave/"
+SUBMIT_PATH = "/testapp/api/v1/student/attempts/{attempt_id}/submit/"
+
+
+def sign_init_data(bot_token, telegram_id, auth_date=None):
+    """Build Telegram WebApp initData signed the way TelegramWebAppLoginAPIView checks it."""
+    fields = {
+        "auth_date": str(int(auth_date or time.time())),
+        "query_id": f"load-{telegram_id}",
+        "user": json.dumps({"id": telegram_id, "first_name": "Load", "last_name": f"User{telegram_id}"}),
+    }
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                try:
+                    metrics[name] = float(value)
+                except ValueError:
+                    pass
+    return metrics
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.lock_ms = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, seconds, status, timing):
+        with self.lock:
+            self.latency[endpoint].append(seconds * 1000)
+            self.lock_ms[endpoint].append(timing.get("lock", 0.0))
+            self.statuses[endpoint][status] += 1
+            if status == 0 or status >= 400:
+                self.errors[endpoint] += 1
+
+    def rows(self):
+        for endpoint in sorted(self.latency):
+            values = sorted(self.latency[endpoint])
+            locks = sorted(self.lock_ms[endpoint])
+            yield {
+                "endpoint": endpoint,
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": values[-1],
+                "lock_p95_ms": percentile(locks, 95),
+                "lock_total_ms": sum(locks),
+                "statuses": dict(self.statuses[endpoint]),
+            }
+
+
+class Client:
+    """One keep-alive HTTP connection; failures count as status 0."""
+
+    def __init__(self, base_url, stats, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.conn = self.connect()
+        self.stats = stats
+        self.token = None
+
+    def request(self, endpoint, method, path, payload=None):
+        headers = {"Accept": "application/json"}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = self.connect()
+            self.stats.record(endpoint, time.perf_counter() - started, 0, {})
+            return 0, None
+        self.stats.record(endpoint, time.perf_counter() - started, response.status, parse_server_timing(
+            response.getheader("Server-Timing")
+        ))
+        try:
+            return response.status, json.loads(raw) if raw else None
+        except ValueError:
+            return response.status, None
+
+
+def pick_answers(questions, rng, share=1.0, revision=None):
+    answers = []
+    for question in questions:
+        if rng.random() > share:
+            continue
+        options = question.get("answer_options") or []
+        item = {"question_id": question["id"]}
+        if revision is not None:
+            item["revision"] = revision
+        if options:
+            count = 1 if question.get("question_type") == "OC" else rng.randint(1, min(2, len(options)))
+            item["selected_option_ids"] = [option["id"] for option in rng.sample(options, count)]
+        else:
+            item["written_answer"] = str(rng.randint(1, 500))
+        answers.append(item)
+    return answers
+
+
+def student_flow(index, args, stats, deadline, rng):
+    client = Client(args.url, stats, args.timeout)
+    init_data = sign_init_data(args.bot_token, TELEGRAM_ID_BASE + index)
+    status, body = client.request("telegram_login", "POST", LOGIN_PATH, {"initData": init_data, "roleHint": "student"})
+    if status != 200 or not body:
+        return
+    client.token = body["token"]
+
+    status, tests = client.request("student_tests", "GET", TESTS_PATH)
+    if status != 200 or not tests:
+        return
+    test = rng.choice(tests)
+
+    status, started = client.request("start_attempt", "POST", START_PATH.format(test_id=test["id"]))
+    if status != 201 or not started:
+        return
+    attempt_id = started["attempt_id"]
+    questions = started["test"]["questions"]
+
+    # Work until the deadline, saving the answers changed since the last save now and then.
+    autosaving = bool(args.autosave_path and args.autosave_every)
+    revision = 0
+    while time.monotonic() < deadline:
+        pause = rng.uniform(0.5, 1.5) * args.autosave_every if args.autosave_every else deadline - time.monotonic()
+        time.sleep(max(0.0, min(pause, deadline - time.monotonic())))
+        if autosaving and time.monotonic() < deadline:
+            revision += 1
+            client.request(
+                "autosave", "POST", args.autosave_path.format(attempt_id=attempt_id),
+                {"answers": pick_answers(questions, rng, share=0.3, revision=revision)},
+            )
+
+    # Deadline burst: everybody submits within --burst-jitter seconds. With autosave the
+    # answers are stored already and the submit only carries the last edits.
+    time.sleep(rng.uniform(0, args.burst_jitter))
+    final = pick_answers(questions, rng, share=0.1, revision=revision + 1) if autosaving else pick_answers(questions, rng)
+    client.request("submit_attempt", "POST", SUBMIT_PATH.format(attempt_id=attempt_id), {"answers": final})
+
+
+def ramp_delays(profile, users):
+    """Start offset in seconds per user: ``spike``, ``linear:<seconds>`` or ``step:<users>x<seconds>``."""
+    kind, _, arg = profile.partition(":")
+    if kind == "spike":
+        return [0.0] * users
+    if kind == "linear":
+        duration = float(arg or 30)
+        return [duration * index / max(1, users) for index in range(users)]
+    if kind == "step":
+        size, _, every = arg.partition("x")
+        size, every = int(size or 10), float(every or 5)
+        return [every * (index // size) for index in range(users)]
+    raise SystemExit(f"Unknown ramp profile: {profile}")
+
+
+def prepare_users(users):
+    """Rename seed_student_N logins to tg_<id> so Telegram logins land on enrolled students."""
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import transaction
+
+    with transaction.atomic():
+        existing = set(User.objects.filter(username__startswith="tg_").values_list("username", flat=True))
+        linked = 0
+        for index in range(users):
+            username = f"tg_{TELEGRAM_ID_BASE + index}"
+            if username in existing:
+                continue
+            linked += User.objects.filter(username=f"seed_student_{index}").update(username=username)
+    print(f"Linked {linked} seeded students to Telegram logins ({users - linked} already linked or missing).")
+
+
+def print_report(stats, elapsed):
+    print(f"\nFinished in {elapsed:.1f}s")
+    print(f"{'endpoint':<16}{'reqs':>7}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'lock p95':>10}{'lock sum':>10}")
+    for row in stats.rows():
+        print(
+            f"{row['endpoint']:<16}{row['requests']:>7}{row['error_rate'] * 100:>6.1f}%"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+            f"{row['lock_p95_ms']:>10.1f}{row['lock_total_ms']:>10.1f}"
+        )
+    print("Latencies in ms; lock = time in SELECT ... FOR UPDATE reported by the server (0 on SQLite).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual students.")
+    parser.add_argument("--ramp", default="linear:10", help="spike, linear:<seconds> or step:<users>x<seconds>.")
+    parser.add_argument("--exam-seconds", type=float, default=60, help="Time from the last start to the deadline.")
+    parser.add_argument("--autosave-every", type=float, default=10, help="Mean seconds between autosaves (0 = off).")
+    parser.add_argument("--autosave-path", default=os.getenv("LOADTEST_AUTOSAVE_PATH", AUTOSAVE_PATH),
+                        help="Autosave URL with {attempt_id}; autosaves are skipped when empty.")
+    parser.add_argument("--burst-jitter", type=float, default=2.0, help="Spread of the deadline submit burst.")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--bot-token", default=os.getenv("TELEGRAM_BOT_TOKEN", ""))
+    parser.add_argument("--json", help="Also write the report rows to this file.")
+    parser.add_argument("--prepare", action="store_true", help="Link seeded students to tg_* users and exit.")
+    args = parser.parse_args(argv)
+
+    if args.prepare:
+        prepare_users(args.users)
+        return
+    if not args.bot_token:
+        raise SystemExit("Set TELEGRAM_BOT_TOKEN (or --bot-token) to the server's bot token.")
+
+    stats = Stats()
+    delays = ramp_delays(args.ramp, args.users)
+    started = time.monotonic()
+    deadline = started + max(delays, default=0) + args.exam_seconds
+    threads = []
+    for index, delay in enumerate(delays):
+        thread = threading.Thread(
+            target=student_flow,
+            args=(index, args, stats, deadline, random.Random(args.seed * 100_003 + index)),
+            daemon=True,
+        )
+        threads.append((delay, thread))
+
+    for delay, thread in threads:
+        time.sleep(max(0.0, started + delay - time.monotonic()))
+        thread.start()
+    for _, thread in threads:
+        thread.join()
+
+    print_report(stats, time.monotonic() - started)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(list(stats.rows()), handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare the stock DRF JSONRenderer with FastJSONRenderer on payloads shaped like
+TeacherTestResultsAPIView, CourseStatsView and FrontendMockDataAPIView responses.
+
+    python -m benchmarks.json_render --repeat 20
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+
+def teacher_test_results_payload(attempts=2000):
+    completed = datetime(2026, 3, 1, 9, 0, tzinfo=dt_timezone.utc)
+    max_score = Decimal("25.00")
+    return [
+        {
+            "attempt_id": i,
+            "student_id": 10_000 + i,
+            "student_name": f"Oʻtkir Toʻxtayev {i}",
+            "score": float(i % 25) + 0.5,
+            "max_score": max_score,
+            "percentage": round((i % 25) / 25 * 100, 2),
+            "completed_at": completed + timedelta(seconds=i * 7),
+        }
+        for i in range(attempts)
+    ]
+
+
+def course_stats_payload(students=500, tasks=40):
+    titles = [f"Topshiriq {t}" for t in range(tasks)]
+    return {
+        "tasks": titles,
+        "students": [
+            {
+                "student": f"Student {s} Familiya",
+                "total_tasks": tasks,
+                "submitted_tasks": s % tasks,
+                "completion_rate": round((s % tasks) / tasks * 100, 2),
+                "tasks": {title: (s * t) % 101 for t, title in enumerate(titles)},
+            }
+            for s in range(students)
+        ],
+    }
+
+
+def mock_data_payload(limit=100):
+    created = datetime(2026, 2, 10, 9, 0, tzinfo=dt_timezone.utc)
+    return {
+        "source": "database",
+        "summary": {"students": 100_000, "courses": 2_000, "enrollments": 800_000, "tasks": 20_000, "tests": 5_000},
+        "students": [{"id": i, "name": f"Ali Valiyev {i}", "email": f"s{i}@student.local"} for i in range(limit)],
+        "courses": [
+            {
+                "id": i,
+                "title": f"Course {i}",
+                "teacher_id": i % 50,
+                "teacher_name": "John Doe",
+                "schedule": {"days": [0, 2, 4], "time": "10:00 - 11:30"},
+            }
+            for i in range(limit)
+        ],
+        "enrollments": [{"id": i, "student_id": i, "course_id": i % 20} for i in range(limit)],
+        "tasks": [
+            {
+                "id": i,
+                "title": f"Task {i}",
+                "course_id": i % 20,
+                "teacher_id": i % 50,
+                "max_score": 100,
+                "due_date": date(2026, 3, 1) + timedelta(days=i % 30),
+            }
+            for i in range(limit)
+        ],
+        "tests": [
+            {
+                "id": i,
+                "title": f"Quiz {i}",
+                "teacher_id": i % 50,
+                "teacher_name": "Jane Smith",
+                "question_count": 10,
+                "created_at": created + timedelta(hours=i),
+            }
+            for i in range(limit)
+        ],
+    }
+
+
+PAYLOADS = {
+    "teacher_test_results": teacher_test_results_payload,
+    "course_stats": course_stats_payload,
+    "mock_data": mock_data_payload,
+}
+
+
+def _time_render(renderer, data, repeat):
+    samples = []
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = renderer.render(data)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from school_project.renderers import FastJSONRenderer, fast_json_enabled
+
+    if not fast_json_enabled():
+        print("orjson is not installed or API_FAST_JSON is off; FastJSONRenderer falls back to the stock renderer.")
+
+    print(f"{'payload':<22}{'bytes':>10}{'stock ms':>11}{'fast ms':>10}{'speedup':>9}")
+    for name, build in PAYLOADS.items():
+        data = build()
+        stock_ms, stock_body = _time_render(JSONRenderer(), data, args.repeat)
+        fast_ms, fast_body = _time_render(FastJSONRenderer(), data, args.repeat)
+        if json.loads(stock_body) != json.loads(fast_body):
+            raise SystemExit(f"{name}: renderers produced different JSON")
+        print(f"{name:<22}{len(fast_body):>10}{stock_ms:>11.2f}{fast_ms:>10.2f}{stock_ms / fast_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Cold-start benchmark for the serverless entrypoint (``api/index.py``).
+
+Every run is a fresh interpreter that imports the entrypoint and serves one request to
+``/school/api/public/`` (no authentication, no database), the way a new function instance
+does. The report gives the median import time, time to the first response and wall time
+per app profile::
+
+    python -m benchmarks.startup                          # lean and full, 5 runs each
+    python -m benchmarks.startup --profile lean --runs 10 --budget-ms 800
+
+``--budget-ms`` exits with status 1 when the median time to first response of any
+measured profile is over the budget. ``--importtime`` instead runs one cold start per
+profile under ``python -X importtime`` and lists the slowest modules and the packages they
+belong to::
+
+    python -m benchmarks.startup --importtime --profile lean --top 25 --sort cumulative
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks import PROJECT_DIR
+
+
+PROFILES = ("lean", "full")
+PROBE_PATH = "/school/api/public/"
+# Top-level modules of the apps the lean profile leaves out. DRF imports django.contrib.admin
+# itself (rest_framework.schemas -> admindocs), so the admin is not a useful probe.
+LEAN_OMITTED_MODULES = ("drf_spectacular", "import_export", "django_seed")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def child(path):
+    """Import the entrypoint, serve one request and print the timings as JSON."""
+    started = time.perf_counter()
+    sys.path.insert(0, str(PROJECT_DIR))
+    from api.index import app
+
+    imported = time.perf_counter()
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost",
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    statuses = []
+    response = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        b"".join(response)
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+    finished = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_response_ms": (finished - started) * 1000,
+        "status": int(statuses[0].split()[0]),
+        "modules": len(sys.modules),
+        "omitted_loaded": sorted(module for module in LEAN_OMITTED_MODULES if module in sys.modules),
+    }))
+
+
+def run_once(profile, path=PROBE_PATH, python_flags=()):
+    """Start one interpreter with ``DJANGO_APP_PROFILE=profile``; returns (result, stderr)."""
+    env = dict(os.environ, DJANGO_APP_PROFILE=profile)
+    env.pop("DJANGO_SETTINGS_MODULE", None)
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *python_flags, "-m", "benchmarks.startup", "child", "--path", path],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode:
+        raise RuntimeError(f"{profile} startup failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    return result, completed.stderr
+
+
+def measure(profile, runs, path=PROBE_PATH):
+    """Median timings of ``runs`` cold starts; the first, compiling run is discarded."""
+    run_once(profile, path)
+    results = [run_once(profile, path)[0] for _ in range(runs)]
+    summary = {
+        key: statistics.median(result[key] for result in results)
+        for key in ("import_ms", "first_response_ms", "wall_ms", "modules")
+    }
+    summary["profile"] = profile
+    summary["status"] = results[-1]["status"]
+    summary["omitted_loaded"] = results[-1]["omitted_loaded"]
+    return summary
+
+
+def parse_importtime(output):
+    """Parse ``-X importtime`` stderr into ``(module, self_us, cumulative_us, depth)`` rows."""
+    rows = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def package_totals(rows):
+    """Self time per top-level package, slowest first."""
+    totals = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        totals[module.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def report_importtime(profile, path, top, sort):
+    """Print the slowest modules and packages of one cold start of ``profile``."""
+    result, stderr = run_once(profile, path, python_flags=("-X", "importtime"))
+    rows = parse_importtime(stderr)
+    if not rows:
+        raise SystemExit("The child process printed no -X importtime output.")
+
+    column = 1 if sort == "self" else 2
+    total_us = sum(row[1] for row in rows)
+    print(
+        f"{profile}: {len(rows)} modules, {total_us / 1000:.1f} ms importing, "
+        f"first response after {result['first_response_ms']:.1f} ms (status {result['status']})\n"
+    )
+    print(f"{'self ms':>9}{'cum ms':>9}  module")
+    for module, self_us, cumulative_us, depth in sorted(rows, key=lambda row: row[column], reverse=True)[:top]:
+        print(f"{self_us / 1000:>9.1f}{cumulative_us / 1000:>9.1f}  {module}")
+    print(f"\n{'self ms':>9}{'share':>9}  package")
+    for package, self_us in package_totals(rows)[:top]:
+        print(f"{self_us / 1000:>9.1f}{self_us / total_us:>9.1%}  {package}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command")
+    child_parser = subparsers.add_parser("child", help=argparse.SUPPRESS)
+    child_parser.add_argument("--path", default=PROBE_PATH)
+    parser.add_argument("--profile", choices=PROFILES, action="append", help="Profile to measure (repeatable).")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default=PROBE_PATH, help="Request path of the first request.")
+    parser.add_argument("--budget-ms", type=float, help="Fail when the median time to first response is higher.")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports of one cold start.")
+    parser.add_argument("--top", type=int, default=20, help="Modules and packages listed by --importtime.")
+    parser.add_argument("--sort", choices=("self", "cumulative"), default="self", help="Order of --importtime.")
+    args = parser.parse_args(argv)
+
+    if args.command == "child":
+        child(args.path)
+        return
+    if args.importtime:
+        for profile in args.profile or PROFILES:
+            report_importtime(profile, args.path, args.top, args.sort)
+        return
+
+    rows = [measure(profile, args.runs, args.path) for profile in args.profile or PROFILES]
+    print(f"{'profile':<8}{'import':>10}{'first resp':>12}{'wall':>10}{'modules':>9}{'status':>8}")
+    for row in rows:
+        print(
+            f"{row['profile']:<8}{row['import_ms']:>10.1f}{row['first_response_ms']:>12.1f}"
+            f"{row['wall_ms']:>10.1f}{row['modules']:>9.0f}{row['status']:>8}"
+        )
+    print(f"Medians of {args.runs} cold starts in ms; wall includes interpreter start-up.")
+
+    failed = [row for row in rows if row["status"] != 200]
+    if args.budget_ms is not None:
+        failed += [row for row in rows if row["first_response_ms"] > args.budget_ms]
+    for row in failed:
+        print(f"FAIL {row['profile']}: status {row['status']}, first response {row['first_response_ms']:.1f} ms")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,18 @@
 # serializers.py
 from rest_framework import serializers
+from school_project.fieldsets import SparseFieldsetSerializerMixin
 from .models import Nazorat, NazoratResult
 from schoolapp.models import Student  # Assuming Student model is in schoolapp
 from schoolapp.serializers import StudentSerializer  # Adjust import if needed
 
 
-class NazoratSerializer(serializers.ModelSerializer):
+class NazoratSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Nazorat
         fields = '__all__'
 
 
-class NazoratResultSerializer(serializers.ModelSerializer):
+class NazoratResultSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # Fields from Nazorat (related_name 'nazorat')
     title = serializers.CharField(source='nazorat.title', read_only=True)
     description = serializers.CharField(source='nazorat.description', read_only=True)
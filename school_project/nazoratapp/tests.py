@@ -1,3 +1,32 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from schoolapp.models import Course, Student, Teacher
+from testapp.models import Test, TestAttempt
+
+from .models import Nazorat, NazoratResult
+
+
+class CalculateScoresTests(TestCase):
+    def test_best_score_and_attempt_count_per_student(self):
+        teacher = Teacher.objects.create(user=User.objects.create_user(username="t", password="x"), name="T")
+        course = Course.objects.create(title="Algebra", teacher=teacher, schedule={})
+        test = Test.objects.create(title="Quiz", teacher=teacher)
+        first, second = Student.objects.create(name="A"), Student.objects.create(name="B")
+        for student, score in ((first, 3), (first, 7), (second, 5)):
+            TestAttempt.objects.create(student=student, test=test, score=score)
+        nazorat = Nazorat.objects.create(course=course, title="N", source_type="test", source_id=test.id)
+        NazoratResult.objects.create(nazorat=nazorat, student=second, best_score=1, attempt_count=9)
+
+        client = APIClient()
+        client.force_authenticate(teacher.user)
+        response = client.post(reverse("nazorat-calculate-scores", args=[nazorat.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        results = NazoratResult.objects.filter(nazorat=nazorat).order_by("student__name")
+        self.assertEqual(
+            list(results.values_list("student__name", "best_score", "attempt_count")),
+            [("A", 7.0, 2), ("B", 5.0, 1)],
+        )
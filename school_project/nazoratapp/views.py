@@ -3,14 +3,16 @@ from rest_framework import viewsets, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Max
+from django.db.models import Count, Max
 from .models import Nazorat, NazoratResult
 from .serializers import NazoratSerializer, NazoratResultSerializer
 from testapp.models import TestAttempt
 from schoolapp.models import TaskSubmission
+from school_project.db_routers import ReplicaReadMixin
+from school_project.fieldsets import SparseFieldsetViewMixin
 
 
-class NazoratViewSet(viewsets.ModelViewSet):
+class NazoratViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Nazorat.objects.all()
     serializer_class = NazoratSerializer
 
@@ -19,50 +21,38 @@ class NazoratViewSet(viewsets.ModelViewSet):
         nazorat = self.get_object()
 
         if nazorat.source_type == 'task':
-            submissions = TaskSubmission.objects.filter(task=nazorat.source)
-            students = submissions.values_list('student', flat=True).distinct()
-
-            for student in students:
-                student_subs = submissions.filter(student=student)
-                best_score = student_subs.aggregate(Max('score'))['score__max'] or 0
-                attempt_count = student_subs.count()
-
-                NazoratResult.objects.update_or_create(
-                    nazorat=nazorat,
-                    student=student,
-                    defaults={
-                        'best_score': best_score,
-                        'attempt_count': attempt_count
-                    }
-                )
-
-        elif nazorat.source_type == 'test':
-            attempts = TestAttempt.objects.filter(test=nazorat.source)
-            students = attempts.values_list('student', flat=True).distinct()
-
-            for student in students:
-                student_attempts = attempts.filter(student=student)
-                best_score = student_attempts.aggregate(Max('score'))['score__max'] or 0
-                attempt_count = student_attempts.count()
-
-                NazoratResult.objects.update_or_create(
-                    nazorat=nazorat,
-                    student=student,
-                    defaults={
-                        'best_score': best_score,
-                        'attempt_count': attempt_count
-                    }
-                )
+            sources = TaskSubmission.objects.filter(task_id=nazorat.source_id)
+        else:
+            sources = TestAttempt.objects.filter(test_id=nazorat.source_id)
+
+        # Bitta guruhlangan so'rov va bitta upsert, studentlar soniga bog'liq emas
+        results = [
+            NazoratResult(
+                nazorat=nazorat,
+                student_id=row['student'],
+                best_score=row['best_score'] or 0,
+                attempt_count=row['attempt_count'],
+            )
+            for row in sources.order_by().values('student').annotate(
+                best_score=Max('score'), attempt_count=Count('id')
+            )
+        ]
+        NazoratResult.objects.bulk_create(
+            results,
+            update_conflicts=True,
+            unique_fields=['nazorat', 'student'],
+            update_fields=['best_score', 'attempt_count', 'last_updated'],
+        )
 
         return Response({"status": "Scores updated"})
 
 
-class NazoratResultViewSet(viewsets.ReadOnlyModelViewSet):
+class NazoratResultViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = NazoratResult.objects.select_related('nazorat', 'student')
     serializer_class = NazoratResultSerializer
 
 
-class NazoratResultsView(generics.ListAPIView):
+class NazoratResultsView(ReplicaReadMixin, generics.ListAPIView):
     queryset = NazoratResult.objects.select_related('nazorat', 'student')
     serializer_class = NazoratResultSerializer
 
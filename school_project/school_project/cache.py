@@ -0,0 +1,377 @@
+"""
+Tiered cache: a bounded per-process LRU (L1) in front of the shared Django cache (L2).
+
+Code caches through a namespace::
+
+    ANSWER_KEYS = namespace("answer_keys", ttl=600, local_ttl=30, max_entries=2000)
+
+    key = ANSWER_KEYS.get_or_set(test.pk, lambda: build_answer_key(test))
+
+    @ANSWER_KEYS.memoize()
+    def answer_key(test_id): ...
+
+    answer_key.invalidate(test_id)
+
+Entries built from database rows declare them with ``depends_on`` (``(entity, pk)`` pairs,
+see ``school_project.versions``); their keys embed the rows' version stamps, so a committed
+write to any of them makes the entry unreachable in every process, L1 included, without
+waiting for ``local_ttl``. Such lookups cost one extra L2 round trip for the stamps.
+
+Expensive values go through ``single_flight()`` (or ``memoize(single_flight=True)``) so that
+an expiring entry is recomputed by one request, not by every request that sees it expire:
+
+- the request that wins a lock in L2 (``cache.add``) recomputes; the others get the
+  previous value for up to ``stale_ttl`` seconds past its expiry, or, when there is none,
+  wait up to ``lock_wait`` seconds for the winner's result and only then compute it
+  themselves;
+- entries are refreshed early at random, more likely the closer they are to expiry and
+  the longer they took to compute (``early_beta`` scales this; 0 turns it off), so
+  refreshes of entries written together spread out instead of expiring at one instant.
+
+L2 keys are ``<namespace>:<version>.<generation>:<key>``. ``version`` is bumped in code when
+the shape of the cached values changes, so a deploy never reads entries written by the
+previous release. The generation is a stamp kept in L2 that ``clear()`` replaces, dropping
+the whole namespace for every process at once.
+
+L2 is ``CACHES["default"]`` (``CACHE_URL``), shared between processes when it is Redis, a
+database table or a directory. L1 entries, and each process's copy of the generation, live
+at most ``local_ttl`` seconds: that bounds how long another process can keep serving a
+value after ``delete()`` or ``clear()``. ``local_ttl=0`` always reads L2, ``ttl=0`` turns
+the namespace off. ``settings.CACHE_NAMESPACES`` overrides ``ttl``, ``local_ttl`` and
+``max_entries`` per namespace. L2 errors count as misses, so an unreachable Redis slows
+requests down instead of failing them. A per-process L2 (``locmem://`` without
+``CACHE_SINGLE_PROCESS``) cannot carry a delete to the other workers, so its entries live at
+most ``CACHE_PROCESS_LOCAL_TTL`` seconds.
+
+L1 hands out the stored objects themselves: treat cached values as read-only. Lookups are
+exported as ``cache_requests_total{namespace,tier,result}``.
+"""
+
+import functools
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import CACHE_L1_EVICTIONS, CACHE_REQUESTS, CACHE_SINGLE_FLIGHT
+from .versions import is_shared, stamp
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Longer keys, or keys with characters memcached-style backends reject, are hashed.
+MAX_RAW_KEY_LENGTH = 160
+SINGLE_FLIGHT_POLL_SECONDS = 0.05
+
+# A single_flight() entry: the value, its wall-clock expiry and how long it took to compute.
+Computed = namedtuple("Computed", "value fresh_until cost")
+
+
+def _key_text(key):
+    if isinstance(key, (tuple, list)):
+        text = ":".join(str(part) for part in key)
+    else:
+        text = str(key)
+    if len(text) > MAX_RAW_KEY_LENGTH or any(char.isspace() or ord(char) < 33 for char in text):
+        return "h-" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:40]
+    return text
+
+
+class CacheNamespace:
+    def __init__(
+        self, name, ttl=300, local_ttl=10, max_entries=1000, version=1, alias="default",
+        stale_ttl=0, lock_timeout=30, lock_wait=2.0, early_beta=1.0,
+    ):
+        self.name = name
+        self.version = version
+        self.alias = alias
+        self._defaults = {
+            "ttl": ttl,
+            "local_ttl": local_ttl,
+            "max_entries": max_entries,
+            "stale_ttl": stale_ttl,
+            "lock_timeout": lock_timeout,
+            "lock_wait": lock_wait,
+            "early_beta": early_beta,
+        }
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._generation = None
+        self._generation_expires = 0.0
+
+    # --- configuration --------------------------------------------------------
+
+    def option(self, name):
+        overrides = getattr(settings, "CACHE_NAMESPACES", {}).get(self.name, {})
+        value = overrides.get(name, self._defaults[name])
+        if name == "ttl" and value > 0 and not is_shared(self.alias):
+            # delete() and clear() do not reach the other processes' L2: bound how long they serve old entries.
+            value = min(value, settings.CACHE_PROCESS_LOCAL_TTL)
+        return value
+
+    @property
+    def enabled(self):
+        return self.option("ttl") > 0
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    # --- public API -----------------------------------------------------------
+
+    def get(self, key, default=None, depends_on=()):
+        if not self.enabled:
+            return default
+        full_key = self._full_key(key, depends_on)
+        if full_key is None:
+            return default
+        return self._get(full_key, default)
+
+    def set(self, key, value, ttl=None, depends_on=()):
+        if self.enabled:
+            self._set(self._full_key(key, depends_on), value, ttl)
+
+    def delete(self, key, depends_on=()):
+        full_key = self._full_key(key, depends_on)
+        if full_key is None:
+            return
+        self._l2("delete", full_key)
+        with self._lock:
+            self._local.pop(full_key, None)
+
+    def get_or_set(self, key, compute, ttl=None, depends_on=()):
+        if not self.enabled:
+            return compute()
+        # One key for both steps: the stamps are read before computing, so a write that
+        # commits meanwhile leaves the result under stamps that are already outdated.
+        full_key = self._full_key(key, depends_on)
+        value = self._get(full_key, _MISSING) if full_key is not None else _MISSING
+        if value is _MISSING:
+            value = compute()
+            self._set(full_key, value, ttl)
+        return value
+
+    def single_flight(self, key, compute, ttl=None, depends_on=()):
+        """``get_or_set`` that lets one request at a time recompute an entry; see the module docs."""
+        if not self.enabled:
+            return compute()
+        full_key = self._full_key(key, depends_on)
+        if full_key is None:
+            return compute()
+        ttl = self.option("ttl") if ttl is None else ttl
+        entry = self._get(full_key, None)
+        if entry is not None:
+            remaining = entry.fresh_until - time.time()
+            if remaining > 0 and not self._refresh_early(entry, remaining):
+                return entry.value
+
+        lock_key = f"{full_key}:lock"
+        token = uuid.uuid4().hex
+        locked = self._l2("add", lock_key, token, self.option("lock_timeout"))
+        if locked:
+            try:
+                outcome = "recomputed" if entry is None or entry.fresh_until <= time.time() else "early"
+                return self._recompute(full_key, compute, ttl, outcome)
+            finally:
+                if self._l2("get", lock_key, None) == token:
+                    self._l2("delete", lock_key)
+
+        if entry is not None and time.time() < entry.fresh_until + self.option("stale_ttl"):
+            CACHE_SINGLE_FLIGHT.inc(self.name, "stale")
+            return entry.value
+        if locked is None:
+            # No lock without L2: everybody computes, as without a cache.
+            CACHE_SINGLE_FLIGHT.inc(self.name, "unlocked")
+            return compute()
+
+        deadline = time.monotonic() + self.option("lock_wait")
+        while time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+            entry = self._l2("get", full_key, None)
+            if entry is not None and entry.fresh_until > time.time():
+                CACHE_SINGLE_FLIGHT.inc(self.name, "waited")
+                self._local_set(full_key, entry, ttl)
+                return entry.value
+        CACHE_SINGLE_FLIGHT.inc(self.name, "unlocked")
+        return compute()
+
+    def memoize(self, key=None, ttl=None, depends_on=None, single_flight=False):
+        """
+        Decorator caching a function's result in this namespace. ``key`` maps the call
+        arguments to the cache key (default: all positional and keyword arguments) and
+        ``depends_on`` to the ``(entity, pk)`` pairs the result is built from; the
+        wrapper's ``invalidate(*args, **kwargs)`` drops the entry for those arguments.
+        With ``single_flight`` the result is computed through ``single_flight()``.
+        """
+
+        def key_for(args, kwargs):
+            if key is not None:
+                return key(*args, **kwargs)
+            return args + tuple(f"{name}={value}" for name, value in sorted(kwargs.items()))
+
+        def dependencies_for(args, kwargs):
+            return depends_on(*args, **kwargs) if depends_on is not None else ()
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                fetch = self.single_flight if single_flight else self.get_or_set
+                return fetch(key_for(args, kwargs), lambda: func(*args, **kwargs), ttl, dependencies_for(args, kwargs))
+
+            wrapper.invalidate = lambda *args, **kwargs: self.delete(key_for(args, kwargs), dependencies_for(args, kwargs))
+            return wrapper
+
+        return decorator
+
+    def clear(self):
+        """Drop every entry of the namespace, in all processes (theirs within ``local_ttl``)."""
+        generation = time.time_ns()
+        self._l2("set", self._generation_key(), generation, None)
+        with self._lock:
+            self._local.clear()
+            self._generation = generation
+            self._generation_expires = time.monotonic() + self.option("local_ttl")
+
+    def clear_local(self):
+        """Forget this process's L1 entries and generation; L2 is left alone."""
+        with self._lock:
+            self._local.clear()
+            self._generation = None
+            self._generation_expires = 0.0
+
+    # --- internals ------------------------------------------------------------
+
+    def _generation_key(self):
+        return f"{self.name}:generation"
+
+    def _current_generation(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._generation is not None and now < self._generation_expires:
+                return self._generation
+        generation = self._l2("get", self._generation_key(), None)
+        if generation is None:
+            # A fresh stamp, never a counter restarting at 0: entries written under an
+            # evicted generation must not become visible again.
+            candidate = time.time_ns()
+            if not self._l2("add", self._generation_key(), candidate, None):
+                generation = self._l2("get", self._generation_key(), None)
+            generation = generation or candidate
+        with self._lock:
+            if generation != self._generation:
+                self._local.clear()
+            self._generation = generation
+            self._generation_expires = now + self.option("local_ttl")
+        return generation
+
+    def _full_key(self, key, depends_on=()):
+        full_key = f"{self.name}:{self.version}.{self._current_generation()}:{_key_text(key)}"
+        if depends_on:
+            versions = stamp(depends_on)
+            if versions is None:
+                return None
+            full_key = f"{full_key}@{versions}"
+        return full_key
+
+    def _refresh_early(self, entry, remaining):
+        # XFetch: recompute ahead of expiry with a probability that grows as expiry nears.
+        beta = self.option("early_beta")
+        return beta > 0 and entry.cost * beta * -math.log(1.0 - random.random()) >= remaining
+
+    def _recompute(self, full_key, compute, ttl, outcome):
+        started = time.monotonic()
+        value = compute()
+        cost = time.monotonic() - started
+        if ttl > 0:
+            entry = Computed(value, time.time() + ttl, cost)
+            # Kept past its expiry so that it can be served stale while it is recomputed.
+            self._set(full_key, entry, ttl + self.option("stale_ttl"))
+        CACHE_SINGLE_FLIGHT.inc(self.name, outcome)
+        return value
+
+    def _get(self, full_key, default):
+        if self.option("local_ttl") > 0:
+            value = self._local_get(full_key)
+            if value is not _MISSING:
+                CACHE_REQUESTS.inc(self.name, "l1", "hit")
+                return value
+            CACHE_REQUESTS.inc(self.name, "l1", "miss")
+
+        value = self._l2("get", full_key, _MISSING)
+        if value is _MISSING:
+            CACHE_REQUESTS.inc(self.name, "l2", "miss")
+            return default
+        CACHE_REQUESTS.inc(self.name, "l2", "hit")
+        self._local_set(full_key, value, self.option("ttl"))
+        return value
+
+    def _set(self, full_key, value, ttl):
+        ttl = self.option("ttl") if ttl is None else ttl
+        if full_key is None or ttl <= 0:
+            return
+        self._l2("set", full_key, value, ttl)
+        self._local_set(full_key, value, ttl)
+
+    def _local_get(self, full_key):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._local.get(full_key)
+            if hit is None:
+                return _MISSING
+            expires, value = hit
+            if expires <= now:
+                del self._local[full_key]
+                return _MISSING
+            self._local.move_to_end(full_key)
+            return value
+
+    def _local_set(self, full_key, value, ttl):
+        local_ttl = min(self.option("local_ttl"), ttl)
+        if local_ttl <= 0:
+            return
+        max_entries = self.option("max_entries")
+        evicted = 0
+        with self._lock:
+            self._local[full_key] = (time.monotonic() + local_ttl, value)
+            self._local.move_to_end(full_key)
+            while len(self._local) > max_entries:
+                self._local.popitem(last=False)
+                evicted += 1
+        if evicted:
+            CACHE_L1_EVICTIONS.inc(self.name, amount=evicted)
+
+    def _l2(self, method, *args):
+        try:
+            return getattr(self.l2, method)(*args)
+        except Exception:  # noqa: BLE001
+            logger.warning("Shared cache %s failed for namespace %s.", method, self.name, exc_info=True)
+            CACHE_REQUESTS.inc(self.name, "l2", "error")
+            return args[1] if method == "get" else None
+
+
+_NAMESPACES = {}
+_NAMESPACES_LOCK = threading.Lock()
+
+
+def namespace(name, **options):
+    """The process-wide ``CacheNamespace`` called ``name``, created with ``options`` on first use."""
+    with _NAMESPACES_LOCK:
+        if name not in _NAMESPACES:
+            _NAMESPACES[name] = CacheNamespace(name, **options)
+        return _NAMESPACES[name]
+
+
+def clear_local_caches():
+    """Forget the L1 entries of every namespace in this process; L2 is left alone."""
+    with _NAMESPACES_LOCK:
+        registered = list(_NAMESPACES.values())
+    for cache_namespace in registered:
+        cache_namespace.clear_local()
@@ -0,0 +1,119 @@
+"""
+Response compression: gzip, and brotli when the ``brotli`` package is installed.
+
+``CompressionMiddleware`` compresses bodies of at least ``COMPRESSION_MIN_BYTES`` with the
+coding the client prefers. Bytes that many responses share verbatim, such as a test's
+question set in every start-attempt response, can be deflated once and cached as a
+``Segment``; a view attaches it to its response and the middleware builds the gzip body
+around it, compressing only the bytes before and after::
+
+    response.compressed_segment = payload.segment
+
+The gzip format allows this because a deflate stream ended with a sync flush can be
+followed by another one: the header, the compressed parts, an empty final block and the
+CRC-32 and length of the whole body form a valid member that any gzip decoder reads.
+"""
+
+import gzip
+import struct
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+# Magic, deflate, no flags, no mtime, no extra flags, unknown OS: what gzip.compress(mtime=0) writes.
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# An empty final block with fixed Huffman codes, closing a stream of sync-flushed parts.
+_DEFLATE_END = b"\x03\x00"
+
+# ``raw``: the bytes as they appear in response bodies; ``deflated``: those bytes as a raw
+# deflate stream ended with a sync flush.
+Segment = namedtuple("Segment", "raw deflated")
+
+
+def gzip_level():
+    return getattr(settings, "COMPRESSION_GZIP_LEVEL", 6)
+
+
+def brotli_quality():
+    return getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5)
+
+
+def available_encodings():
+    """Codings this process can produce, in the order the server prefers them."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` of an ``Accept-Encoding`` header; q=0 marks a coding as refused."""
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = max(quality, 0.0)
+    return accepted
+
+
+def negotiate(header, offered=None):
+    """The coding of ``offered`` with the highest q in ``header``; ties go to the server order."""
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for coding in offered or available_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality())
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=gzip_level(), mtime=0)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def _deflate(data):
+    compressor = zlib.compressobj(gzip_level(), zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def segment(raw):
+    """A ``Segment`` of ``raw``, to cache next to the data it was rendered from."""
+    return Segment(raw, _deflate(raw))
+
+
+def gzip_around(body, cached):
+    """
+    ``body`` gzipped with the deflated ``cached`` segment reused as is, or None when the
+    segment's bytes do not appear in ``body`` (another renderer, say).
+    """
+    start = body.find(cached.raw) if cached.raw else -1
+    if start < 0:
+        return None
+    end = start + len(cached.raw)
+    parts = [_GZIP_HEADER]
+    if start:
+        parts.append(_deflate(body[:start]))
+    parts.append(cached.deflated)
+    if end < len(body):
+        parts.append(_deflate(body[end:]))
+    parts.append(_DEFLATE_END)
+    parts.append(struct.pack("<II", zlib.crc32(body) & 0xFFFFFFFF, len(body) & 0xFFFFFFFF))
+    return b"".join(parts)
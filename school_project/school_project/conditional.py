@@ -0,0 +1,85 @@
+"""
+Conditional GET for DRF views, validated without building the response body.
+
+A view lists what its response is built from and ``ConditionalGetMixin`` turns that into a
+weak ETag: a hash of the entity version stamps (``school_project.versions``, read from the
+shared cache), the user and the negotiated media type. A request whose ``If-None-Match``
+(or, without one, ``If-Modified-Since``) still matches is answered ``304 Not Modified``
+right after authentication, before the handler runs, so a poll costs no queries beyond the
+ones ``get_validators`` makes itself::
+
+    class StudentAvailableTestsAPIView(ConditionalGetMixin, APIView):
+        def get_validators(self, request, *args, **kwargs):
+            return Validators([("student", request.user.student_profile.pk), ("test", ANY)])
+
+Validators are only sent with 200 responses. Responses default to ``private, no-cache``:
+clients keep them but revalidate on every use.
+"""
+
+import calendar
+import hashlib
+from collections import namedtuple
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .versions import versions
+
+
+# ``dependencies``: (entity, pk) pairs; ``last_modified``: an aware datetime or None;
+# ``cache_control``: replaces the mixin's default for this response.
+Validators = namedtuple("Validators", "dependencies last_modified cache_control", defaults=(None, None))
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        super().__init__("Not modified")
+        self.response = response
+
+
+class ConditionalGetMixin:
+    cache_control = "private, no-cache"
+
+    def get_validators(self, request, *args, **kwargs):
+        """``Validators`` of this GET, or None to answer it without conditional handling."""
+        raise NotImplementedError
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validator_headers = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return
+        current = versions(validators.dependencies)
+        if current is None:
+            return  # shared cache down: always send the body
+        digest = hashlib.sha256(
+            repr((request.user.pk, request.accepted_media_type, list(validators.dependencies), current)).encode()
+        ).hexdigest()[:32]
+        headers = {"ETag": f'W/"{digest}"', "Cache-Control": validators.cache_control or self.cache_control}
+        last_modified = None
+        if validators.last_modified is not None:
+            last_modified = calendar.timegm(validators.last_modified.utctimetuple())
+            headers["Last-Modified"] = http_date(last_modified)
+        self._validator_headers = headers
+
+        response = get_conditional_response(request, etag=headers["ETag"], last_modified=last_modified)
+        if response is not None:
+            for name, value in headers.items():
+                response[name] = value
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        headers = getattr(self, "_validator_headers", None)
+        if headers and response.status_code == 200:
+            for name, value in headers.items():
+                response[name] = value
+        return response
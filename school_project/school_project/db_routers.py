@@ -0,0 +1,178 @@
+"""
+Read replica routing (``DATABASE_REPLICA_URL``).
+
+Views that only report on data (teacher statistics, result tables, exports) opt in with
+``ReplicaReadMixin``: once the request is authenticated, the rest of its reads go to the
+``replica`` alias through ``ReplicaRouter``. Writes always go to the primary, and so does
+everything else. A user whose last write is less than ``DATABASE_REPLICA_STICKY_SEC``
+seconds old keeps reading from the primary, so they see their own changes despite
+replication lag; ``ReplicaStickinessMiddleware`` records those writes in a signed cookie
+that travels with the client to whichever worker serves its next request, and, for clients
+that keep no cookies, in the cache when that is shared between workers. A replica that
+fails its health check (or a query) is skipped for ``DATABASE_REPLICA_HEALTH_INTERVAL``
+seconds, and a read that fails on it mid-request is retried on the primary.
+"""
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+from .versions import is_shared
+
+REPLICA_ALIAS = "replica"
+# Signed cookie naming the user pinned to the primary; also the signing salt.
+PIN_COOKIE = "replica_pin"
+
+_read_alias = ContextVar("read_alias", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaHealth:
+    """Per-process replica health, probed with ``SELECT 1`` at most once per interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._healthy = False
+
+    def is_healthy(self):
+        interval = settings.DATABASE_REPLICA_HEALTH_INTERVAL
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return self._healthy
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= interval:
+                self._healthy = self._probe()
+                self._checked_at = now
+        return self._healthy
+
+    def mark_unhealthy(self):
+        with self._lock:
+            self._healthy = False
+            self._checked_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+
+    def _probe(self):
+        try:
+            with connections[REPLICA_ALIAS].cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        except DatabaseError:
+            # Django closes the broken connection when the request finishes.
+            logger.warning("Read replica is unavailable; reading from the primary.", exc_info=True)
+            return False
+        return True
+
+
+REPLICA_HEALTH = ReplicaHealth()
+
+
+def _pin_key(user):
+    return f"replica-pin:{user.pk}"
+
+
+def pin_to_primary(user, response=None):
+    """Serve ``user``'s reads from the primary until their write has reached the replica."""
+    sticky_sec = settings.DATABASE_REPLICA_STICKY_SEC
+    if is_shared():
+        cache.set(_pin_key(user), 1, sticky_sec)
+    if response is not None:
+        response.set_signed_cookie(
+            PIN_COOKIE, str(user.pk), salt=PIN_COOKIE, max_age=sticky_sec,
+            secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite="Lax",
+        )
+
+
+def _is_pinned(user, request):
+    if request is not None:
+        pinned = request.get_signed_cookie(
+            PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=settings.DATABASE_REPLICA_STICKY_SEC
+        )
+        if pinned == str(user.pk):
+            return True
+    return is_shared() and bool(cache.get(_pin_key(user)))
+
+
+def read_alias(user, request=None):
+    """Database alias that report reads for ``user`` (making ``request``) should use right now."""
+    if REPLICA_ALIAS not in connections.settings:
+        return DEFAULT_DB_ALIAS
+    if user is not None and user.is_authenticated and _is_pinned(user, request):
+        return DEFAULT_DB_ALIAS
+    return REPLICA_ALIAS if REPLICA_HEALTH.is_healthy() else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Routes reads to the alias chosen for the current request, if any."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_ALIAS, None}
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema from the primary through replication.
+        return db != REPLICA_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    DRF view mixin: after authentication and permission checks (which stay on the primary),
+    safe requests read from ``read_alias(request.user, request)``.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            self._read_alias_token = _read_alias.set(read_alias(request.user, request))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, OperationalError) and _read_alias.get() == REPLICA_ALIAS:
+            # The replica went away after its health check: answer this read from the primary.
+            logger.warning("Read replica query failed; retrying on the primary.", exc_info=exc)
+            REPLICA_HEALTH.mark_unhealthy()
+            _read_alias.set(DEFAULT_DB_ALIAS)
+            handler = getattr(self, self.request.method.lower())
+            try:
+                return handler(self.request, *self.args, **self.kwargs)
+            except Exception as retry_exc:  # noqa: BLE001
+                exc = retry_exc
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_read_alias_token", None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaStickinessMiddleware:
+    """Pins users to the primary after a request that may have written for them."""
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the user it authenticated onto the Django request.
+        user = getattr(request, "user", None)
+        if request.method not in self.SAFE_METHODS and user is not None and user.is_authenticated:
+            pin_to_primary(user, response)
+        return response
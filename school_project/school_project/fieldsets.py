@@ -0,0 +1,136 @@
+"""
+Sparse fieldsets for DRF viewsets.
+
+``?fields=id,name`` limits both the serialized fields and the SQL columns (``.only()``),
+``?expand=teacher`` swaps a foreign key id for a nested object declared in
+``Meta.expandable_fields``. List actions use the viewset's slim ``list_serializer_class``
+unless the client asks for explicit fields.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def _csv_param(request, name):
+    raw = request.query_params.get(name) or ''
+    return [item.strip() for item in raw.split(',') if item.strip()]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Prunes ``self.fields`` to the ``sparse_fields`` passed in the serializer context and
+    replaces expandable foreign keys with nested serializers. ``expandable_fields`` maps a
+    field name to ``(serializer_class, kwargs)``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = kwargs.get('context') or {}
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable_fields', {})
+
+        for name in context.get('expand') or ():
+            if name in expandable:
+                serializer_class, field_kwargs = expandable[name]
+                self.fields[name] = serializer_class(read_only=True, **field_kwargs)
+
+        requested = context.get('sparse_fields')
+        if requested:
+            keep = set(requested) | set(context.get('expand') or ())
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Viewset side of sparse fieldsets: picks the serializer, passes the requested fields
+    through the context and restricts read querysets to the columns being serialized.
+    """
+
+    list_serializer_class = None
+
+    def get_serializer_class(self):
+        if (
+            getattr(self, 'action', None) == 'list'
+            and self.list_serializer_class is not None
+            and not self._requested_fields()
+        ):
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None:
+            context['sparse_fields'] = self._requested_fields()
+            context['expand'] = _csv_param(self.request, 'expand')
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        return self.restrict_queryset_columns(queryset)
+
+    def restrict_queryset_columns(self, queryset):
+        serializer = self.get_serializer()
+        requested = self._requested_fields()
+        if requested:
+            unknown = sorted(set(requested) - set(serializer.fields))
+            if unknown:
+                raise ValidationError({'fields': [f"Unknown fields: {', '.join(unknown)}"]})
+
+        paths, related = set(), set()
+        if not _collect_column_paths(serializer, queryset.model, '', paths, related):
+            return queryset.select_related(*related) if related else queryset
+
+        paths.add(queryset.model._meta.pk.name)
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*sorted(paths))
+
+    def _requested_fields(self):
+        if self.request is None:
+            return []
+        return _csv_param(self.request, 'fields')
+
+
+def _collect_column_paths(serializer, model, prefix, paths, related):
+    """
+    Resolve every serializer field to a model column path. Returns False when a field
+    cannot be mapped (method fields, properties, reverse relations) so the caller keeps
+    loading all columns instead of deferring something the serializer will touch.
+    """
+    for field in serializer.fields.values():
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            return False
+        if isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # e.g. StringRelatedField needs the whole related row, not just the key.
+            return False
+
+        model_cls = model
+        path = prefix
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                model_field = model_cls._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return False
+            if not model_field.concrete or model_field.many_to_many:
+                return False
+            path = f"{path}__{attr}" if path else attr
+            if model_field.is_relation and index < len(field.source_attrs) - 1:
+                related.add(path)
+                model_cls = model_field.related_model
+
+        if isinstance(field, serializers.BaseSerializer):
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            related.add(path)
+            if not _collect_column_paths(nested, model_field.related_model, path, paths, related):
+                return False
+            paths.add(f"{path}__{model_field.related_model._meta.pk.name}")
+            continue
+
+        paths.add(path)
+    # Foreign keys that are traversed must stay loaded alongside select_related().
+    paths.update(related)
+    return True
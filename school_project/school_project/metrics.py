@@ -0,0 +1,306 @@
+"""
+In-process metrics registry with a Prometheus text endpoint.
+
+Counters and histograms live in process memory. With ``METRICS_MULTIPROC_DIR`` set, every
+worker also dumps its samples to ``<dir>/metrics-<pid>-<start>.json`` (at most once every
+``METRICS_FLUSH_INTERVAL`` seconds and at exit) and ``/metrics`` sums the files of all
+workers, so whichever gunicorn worker answers the scrape reports the whole server.
+Point the directory at a fresh, empty location on every deploy.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._last_flush = time.monotonic()
+        self._owner_pid = None
+        self._file_name = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    # --- multiprocess mode -------------------------------------------------
+
+    def multiproc_dir(self):
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", "")
+        return Path(directory) if directory else None
+
+    def _own_file(self, directory):
+        # Recomputed after fork so pre-forked workers never share a file.
+        pid = os.getpid()
+        if self._owner_pid != pid:
+            self._owner_pid = pid
+            self._file_name = f"metrics-{pid}-{time.time_ns()}.json"
+        return directory / self._file_name
+
+    def maybe_flush(self):
+        directory = self.multiproc_dir()
+        if directory is None:
+            return
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+        now = time.monotonic()
+        if now - self._last_flush < interval:
+            return
+        self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory=None):
+        directory = directory or self.multiproc_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        target = self._own_file(directory)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot(), separators=(",", ":")))
+        os.replace(tmp, target)
+
+    def collect(self):
+        """Samples of this process merged with the dumps of every other worker."""
+        merged = self.snapshot()
+        directory = self.multiproc_dir()
+        if directory is None or not directory.is_dir():
+            return merged
+
+        own = self._own_file(directory).name
+        for path in sorted(directory.glob("metrics-*.json")):
+            if path.name == own:
+                continue
+            try:
+                other = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file was removed
+            for name, samples in other.items():
+                metric = self.metrics.get(name)
+                if metric is not None:
+                    metric.merge_into(merged.setdefault(name, {}), samples)
+        return merged
+
+    def render(self):
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.exposition(collected.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+atexit.register(lambda: REGISTRY.flush())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._values = {}
+        registry.register(self)
+
+    def inc(self, *labelvalues, amount=1):
+        key = tuple(str(value) for value in labelvalues)
+        with self._registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(tuple(str(value) for value in labelvalues), 0)
+
+    def snapshot(self):
+        # JSON keys must be strings, so label tuples are stored JSON-encoded.
+        return {json.dumps(key): value for key, value in self._values.items()}
+
+    def merge_into(self, target, samples):
+        for key, value in samples.items():
+            target[key] = target.get(key, 0) + value
+
+    def exposition(self, samples):
+        for key, value in sorted(samples.items()):
+            labels = _label_text(self.labelnames, json.loads(key))
+            yield f"{self.name}{labels} {_format_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._registry = registry
+        self._values = {}
+        registry.register(self)
+
+    def observe(self, amount, *labelvalues):
+        key = tuple(str(value) for value in labelvalues)
+        with self._registry.lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += amount
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues):
+        state = self._values.get(tuple(str(value) for value in labelvalues))
+        return state[2] if state else 0
+
+    def snapshot(self):
+        return {
+            json.dumps(key): [list(counts), total, count]
+            for key, (counts, total, count) in self._values.items()
+        }
+
+    def merge_into(self, target, samples):
+        for key, (counts, total, count) in samples.items():
+            if len(counts) != len(self.buckets):
+                continue  # dumped by a worker running different bucket settings
+            current = target.get(key)
+            if current is None:
+                target[key] = [list(counts), total, count]
+                continue
+            current[0] = [a + b for a, b in zip(current[0], counts)]
+            current[1] += total
+            current[2] += count
+
+    def exposition(self, samples):
+        for key, (counts, total, count) in sorted(samples.items()):
+            values = json.loads(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames, values, f'le="{_format_number(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, values, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {count}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by URL name, method and status.", ("view", "method", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request wall time by URL name and method.", ("view", "method")
+)
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries per request by URL name.", ("view",), buckets=QUERY_COUNT_BUCKETS
+)
+HTTP_DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per request by URL name.", ("view",)
+)
+EXAM_ATTEMPTS_STARTED = Counter("exam_attempts_started_total", "Test attempts started by students.")
+EXAM_ATTEMPTS_SUBMITTED = Counter("exam_attempts_submitted_total", "Test attempts submitted and graded.")
+EXAM_ATTEMPTS_EXPIRED = Counter(
+    "exam_attempts_expired_total", "Open test attempts finalized by the expiry sweeper after their deadline."
+)
+EXAM_GRADING_DURATION = Histogram("exam_grading_duration_seconds", "Time spent grading one submitted attempt.")
+HTTP_COMPRESSED_BYTES = Counter(
+    "http_compressed_bytes_total",
+    "Bytes of compressed response bodies before (raw) and after (sent) compression, by coding.",
+    ("encoding", "stage"),
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Requests with an Idempotency-Key: first runs, replays (at once or after waiting for the first run), "
+    "duplicates still in progress and keys reused for another request.",
+    ("outcome",),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Tiered cache lookups by namespace, tier (l1, l2) and result.", ("namespace", "tier", "result")
+)
+CACHE_L1_EVICTIONS = Counter(
+    "cache_l1_evictions_total", "Entries evicted from the per-process cache when it is full.", ("namespace",)
+)
+CACHE_SINGLE_FLIGHT = Counter(
+    "cache_single_flight_total",
+    "Single-flight lookups that recomputed (on expiry or early), served a stale value, waited for another "
+    "request's result or computed without the lock.",
+    ("namespace", "outcome"),
+)
+
+
+def metrics_enabled():
+    return getattr(settings, "METRICS_ENABLED", True)
+
+
+def observe_request(request, response, total_seconds, perf):
+    """Called by PerformanceInstrumentationMiddleware once the response is ready."""
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match is not None else "<unresolved>"
+
+    HTTP_REQUESTS.inc(view, request.method, response.status_code)
+    HTTP_LATENCY.observe(total_seconds, view, request.method)
+    HTTP_DB_QUERIES.observe(perf.query_count, view)
+    HTTP_DB_TIME.observe(perf.db_time, view)
+    REGISTRY.maybe_flush()
+
+
+def metrics_view(request):
+    token = getattr(settings, "METRICS_AUTH_TOKEN", "")
+    if not token:
+        # Without a token the endpoint is only open on a development server.
+        if not settings.DEBUG:
+            return HttpResponseForbidden("Forbidden: set METRICS_AUTH_TOKEN")
+    elif request.headers.get("Authorization", "") != f"Bearer {token}":
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
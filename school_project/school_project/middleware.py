@@ -1,7 +1,19 @@
+import heapq
+import json
+import logging
 import os
+from contextlib import ExitStack
+from time import perf_counter
 
 from django.conf import settings
+from django.db import connections
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics
+
+
+perf_logger = logging.getLogger("school_project.perf")
 
 
 class ApiExceptionToJsonMiddleware:
@@ -72,3 +84,189 @@ class ApiExceptionToJsonMiddleware:
         accept = (request.headers.get("Accept") or "").lower()
         content_type = (request.headers.get("Content-Type") or "").lower()
         return "application/json" in accept or "application/json" in content_type
+
+
+class RequestPerf:
+    """Per-request timings collected by PerformanceInstrumentationMiddleware (``request.perf``)."""
+
+    __slots__ = (
+        "started", "query_count", "db_time", "lock_time", "queries", "query_limit", "render_started", "render_time",
+    )
+
+    def __init__(self, query_limit=5):
+        self.started = perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.lock_time = 0.0
+        # Min-heap of the ``query_limit`` slowest (duration, sql) pairs: bulk requests run
+        # thousands of queries and only the slowest are ever logged.
+        self.queries = []
+        self.query_limit = query_limit
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: time every query on every database alias.
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.query_count += 1
+            self.db_time += duration
+            if len(self.queries) < self.query_limit:
+                heapq.heappush(self.queries, (duration, sql))
+            elif duration > self.queries[0][0]:
+                heapq.heapreplace(self.queries, (duration, sql))
+            if " FOR UPDATE" in sql:
+                # Row-lock queries: on PostgreSQL this is mostly time spent waiting for the lock.
+                self.lock_time += duration
+
+    def mark_render_started(self):
+        self.render_started = perf_counter()
+
+    def mark_render_finished(self, response):
+        if self.render_started is not None:
+            self.render_time = perf_counter() - self.render_started
+        return response
+
+
+class PerformanceInstrumentationMiddleware:
+    """
+    Record wall time, query count, DB time, render time and response size for every request.
+
+    The numbers are sent back in a ``Server-Timing`` header, logged as one JSON line on the
+    ``school_project.perf`` logger, and requests slower than ``PERF_SLOW_REQUEST_MS`` also
+    log their slowest queries. Keep this first in MIDDLEWARE so it measures everything.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "PERF_INSTRUMENTATION", True)
+        self.server_timing = getattr(settings, "PERF_SERVER_TIMING", True)
+        self.slow_request_ms = getattr(settings, "PERF_SLOW_REQUEST_MS", 500)
+        self.slow_query_limit = getattr(settings, "PERF_SLOW_QUERY_LOG_LIMIT", 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        perf = RequestPerf(self.slow_query_limit)
+        request.perf = perf
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(perf))
+            response = self.get_response(request)
+
+        total_seconds = perf_counter() - perf.started
+        total_ms = total_seconds * 1000
+        db_ms = perf.db_time * 1000
+        render_ms = perf.render_time * 1000
+        lock_ms = perf.lock_time * 1000
+        size = None if response.streaming else len(response.content)
+
+        if metrics.metrics_enabled():
+            metrics.observe_request(request, response, total_seconds, perf)
+
+        if self.server_timing:
+            timing = (
+                f"app;dur={max(total_ms - db_ms - render_ms, 0):.1f}, "
+                f'db;dur={db_ms:.1f};desc="{perf.query_count} queries", '
+                f"render;dur={render_ms:.1f}, "
+                f"total;dur={total_ms:.1f}"
+            )
+            if perf.lock_time:
+                timing += f", lock;dur={lock_ms:.1f}"
+            response["Server-Timing"] = timing
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(request.resolver_match, "view_name", None),
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "db_ms": round(db_ms, 2),
+            "queries": perf.query_count,
+            "render_ms": round(render_ms, 2),
+            "lock_ms": round(lock_ms, 2),
+            "bytes": size,
+            "encoding": response.get("Content-Encoding"),
+        }
+        if perf_logger.isEnabledFor(logging.INFO):
+            perf_logger.info(json.dumps(record, separators=(",", ":")))
+
+        if self.slow_request_ms and total_ms >= self.slow_request_ms:
+            slowest = sorted(perf.queries, key=lambda item: item[0], reverse=True)
+            record["top_queries"] = [
+                {"ms": round(duration * 1000, 2), "sql": sql[:500]} for duration, sql in slowest
+            ]
+            perf_logger.warning("slow request %s", json.dumps(record, separators=(",", ":")))
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs right before DRF/template responses are rendered; the post-render
+        # callback closes the render timer.
+        perf = getattr(request, "perf", None)
+        if perf is not None:
+            perf.mark_render_started()
+            response.add_post_render_callback(perf.mark_render_finished)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress text responses of at least ``COMPRESSION_MIN_BYTES`` with the coding the client
+    accepts (``school_project.compression``): brotli when installed, else gzip. A response
+    carrying a ``compressed_segment`` is gzipped around the cached segment instead whenever
+    the client takes gzip, so its largest part is never compressed again.
+
+    Place it after PerformanceInstrumentationMiddleware, which then logs the bytes sent, and
+    before ApiExceptionToJsonMiddleware, so the JSON errors it builds are compressed too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, "COMPRESSION_MIN_BYTES", 1024)
+        self.content_types = frozenset(getattr(settings, "COMPRESSION_CONTENT_TYPES", ("application/json",)))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accepted = request.headers.get("Accept-Encoding", "")
+        segment = getattr(response, "compressed_segment", None)
+        raw = response.content
+        body = encoding = None
+        if segment is not None and compression.negotiate(accepted, ("gzip",)):
+            body = compression.gzip_around(raw, segment)
+            encoding = "gzip" if body is not None else None
+        if body is None:
+            encoding = compression.negotiate(accepted)
+            if encoding is None:
+                return response
+            body = compression.compress(raw, encoding)
+        if len(body) >= len(raw):
+            return response
+
+        if metrics.metrics_enabled():
+            metrics.HTTP_COMPRESSED_BYTES.inc(encoding, "raw", amount=len(raw))
+            metrics.HTTP_COMPRESSED_BYTES.inc(encoding, "sent", amount=len(body))
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        # The body is no longer byte-for-byte what a strong validator promised.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def _compressible(self, response):
+        if response.streaming or response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        if response.has_header("Content-Encoding") or len(response.content) < self.min_bytes:
+            return False
+        content_type = (response.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+        return content_type in self.content_types or content_type.endswith("+json")
@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Project-wide keyset pagination.
+
+    Pages are read with ``WHERE id < <cursor position>`` over the primary key index,
+    so every page costs O(page_size) no matter how deep the client scrolls. Ids grow
+    with ``created_at``, so ``-id`` is also "newest first". Cursors are opaque
+    (base64 encoded by DRF) and clients only follow the ``next``/``previous`` links.
+
+    ``?include_count=1`` adds an approximate ``count``: exact up to
+    ``API_PAGINATION_COUNT_CAP`` rows, a planner estimate above that on PostgreSQL.
+    """
+
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    count_query_param = 'include_count'
+    count_cap = settings.API_PAGINATION_COUNT_CAP
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.count_is_exact = True
+        if self._wants_count(request):
+            self.count, self.count_is_exact = self._approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_exact'] = self.count_is_exact
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'nullable': True},
+            'count_is_exact': {'type': 'boolean'},
+            **response_schema['properties'],
+        }
+        return response_schema
+
+    def _wants_count(self, request):
+        value = (request.query_params.get(self.count_query_param) or '').strip().lower()
+        return value in {'1', 'true', 'yes'}
+
+    def _approximate_count(self, queryset):
+        # Counting at most cap + 1 rows keeps the query bounded on huge tables.
+        capped = queryset.order_by()[: self.count_cap + 1].count()
+        if capped <= self.count_cap:
+            return capped, True
+
+        estimate = self._planner_estimate(queryset)
+        return max(estimate or 0, capped), False
+
+    def _planner_estimate(self, queryset):
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        try:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
@@ -0,0 +1,66 @@
+"""
+JSON renderer and parser backed by orjson.
+
+orjson is optional: when it is not installed, or ``API_FAST_JSON`` is off, both classes
+behave exactly like the stock DRF ones. Types orjson does not handle natively
+(``Decimal``, lazy translation strings, querysets, ...) are converted with DRF's own
+``JSONEncoder.default`` so the output matches the stock renderer.
+"""
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+if orjson is not None:
+    # OPT_UTC_Z matches DRF, which renders UTC offsets as "Z" rather than "+00:00".
+    _ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    _ORJSON_ERRORS = (orjson.JSONEncodeError, TypeError, ValueError)
+else:
+    _ORJSON_OPTIONS = 0
+    _ORJSON_ERRORS = ()
+
+_drf_default = JSONEncoder().default
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, 'API_FAST_JSON', True)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # Indented (browsable/debug) output and anything orjson rejects, such as
+        # integers wider than 64 bits, use the stock renderer.
+        if not fast_json_enabled() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            return orjson.dumps(data, default=_drf_default, option=_ORJSON_OPTIONS)
+        except _ORJSON_ERRORS:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not fast_json_enabled():
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -10,7 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 from urllib.parse import parse_qs, unquote, urlparse
 
@@ -61,6 +64,18 @@ def _split_csv_env(name, default_values):
     return [item.strip() for item in raw.split(",") if item.strip()]
 
 
+def _int_env(name, default, minimum=0):
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, value)
+
+
+def _env_flag(name, default):
+    return os.getenv(name, "true" if default else "false").strip().lower() == "true"
+
+
 def _first_non_empty(*values):
     for value in values:
         if value is None:
@@ -85,6 +100,7 @@ def _parse_postgres_url(database_url):
     sslmode = _first_non_empty(*(query.get("sslmode") or []))
     connect_timeout = _first_non_empty(*(query.get("connect_timeout") or []))
     channel_binding = _first_non_empty(*(query.get("channel_binding") or []))
+    pgbouncer = _first_non_empty(*(query.get("pgbouncer") or []))
 
     config = {
         "ENGINE": "django.db.backends.postgresql",
@@ -101,18 +117,49 @@ def _parse_postgres_url(database_url):
         config["CONNECT_TIMEOUT"] = connect_timeout
     if channel_binding:
         config["CHANNEL_BINDING"] = channel_binding
+    if pgbouncer:
+        config["PGBOUNCER"] = pgbouncer
 
     return config
 
 
-def _build_database_settings():
-    database_url = _first_non_empty(
+def _is_transaction_pooler(parsed_url, host, port):
+    """PgBouncer-style transaction pooling, where a session does not outlive a transaction."""
+    explicit = os.getenv("DB_TRANSACTION_POOLER", "").strip().lower()
+    if explicit in {"true", "false"}:
+        return explicit == "true"
+    return (
+        parsed_url.get("PGBOUNCER", "").lower() == "true"  # Prisma-style ?pgbouncer=true
+        or "-pooler." in host  # Neon
+        or port == "6543"  # Supabase transaction mode
+    )
+
+
+def _pool_options():
+    """psycopg 3 connection pool options, or None when psycopg_pool is not installed."""
+    if importlib.util.find_spec("psycopg_pool") is None:
+        return None
+    return {
+        "min_size": _int_env("DB_POOL_MIN_SIZE", 2),
+        "max_size": _int_env("DB_POOL_MAX_SIZE", 10, minimum=1),
+        "timeout": _int_env("DB_POOL_TIMEOUT", 10, minimum=1),
+        "max_idle": _int_env("DB_POOL_MAX_IDLE", 300, minimum=1),
+        "max_lifetime": _int_env("DB_POOL_MAX_LIFETIME", 3600, minimum=1),
+    }
+
+
+def _build_database_settings(direct=False):
+    """Settings for the default database; ``direct`` prefers the unpooled URL and host."""
+    pooled_urls = (
         os.getenv("DATABASE_URL"),
         os.getenv("POSTGRES_URL"),
         os.getenv("POSTGRES_PRISMA_URL"),
+    )
+    unpooled_urls = (
         os.getenv("DATABASE_URL_UNPOOLED"),
         os.getenv("POSTGRES_URL_NON_POOLING"),
     )
+    database_url = _first_non_empty(*(unpooled_urls + pooled_urls if direct else pooled_urls + unpooled_urls))
     parsed_url = _parse_postgres_url(database_url)
 
     has_postgres_hint = bool(
@@ -165,8 +212,8 @@ def _build_database_settings():
     host = _first_non_empty(
         parsed_url.get("HOST"),
         os.getenv("POSTGRES_HOST"),
-        os.getenv("PGHOST"),
-        os.getenv("PGHOST_UNPOOLED"),
+        os.getenv("PGHOST_UNPOOLED") if direct else os.getenv("PGHOST"),
+        os.getenv("PGHOST") if direct else os.getenv("PGHOST_UNPOOLED"),
         os.getenv("DB_HOST"),
     )
     port = _first_non_empty(
@@ -216,6 +263,11 @@ def _build_database_settings():
         connect_timeout = 15
     options["connect_timeout"] = max(1, connect_timeout)
 
+    # Migrations and long jobs hold one connection for their whole run: no pool for them.
+    pool = _pool_options() if _env_flag("DB_POOL", False) and not direct else None
+    if pool:
+        options["pool"] = pool
+
     if options:
         db_settings["OPTIONS"] = options
 
@@ -223,11 +275,78 @@ def _build_database_settings():
         conn_max_age = int(conn_max_age_raw)
     except (TypeError, ValueError):
         conn_max_age = 60
-    db_settings["CONN_MAX_AGE"] = max(0, conn_max_age)
+    # Pooled connections go back to the pool on close; Django refuses persistent ones.
+    db_settings["CONN_MAX_AGE"] = 0 if pool else max(0, conn_max_age)
+    # Persistent connections are pinged before reuse, pooled ones on checkout.
+    db_settings["CONN_HEALTH_CHECKS"] = _env_flag("DB_CONN_HEALTH_CHECKS", True)
+
+    # Named server-side cursors (QuerySet.iterator()) do not survive a transaction pooler
+    # handing the next FETCH to another server connection.
+    if _is_transaction_pooler(parsed_url, host, port):
+        db_settings["DISABLE_SERVER_SIDE_CURSORS"] = True
 
     return db_settings
 
 
+def _build_cache_settings(cache_url):
+    """
+    The shared cache behind ``school_project.cache`` (L2), from ``CACHE_URL``: ``redis://`` or
+    ``rediss://``, ``db://<table>`` (run ``createcachetable``), ``file:///<dir>``, ``dummy://`` or,
+    by default, ``locmem://``, which is per process and therefore only fit for one worker.
+    """
+    parsed = urlparse(_first_non_empty(cache_url, "locmem://"))
+    scheme = (parsed.scheme or "").lower()
+    if scheme in {"redis", "rediss"}:
+        cache_settings = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": cache_url}
+    elif scheme == "db":
+        cache_settings = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": parsed.netloc or parsed.path.strip("/") or "cache_entries",
+        }
+    elif scheme == "file":
+        cache_settings = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": unquote(parsed.path)}
+    elif scheme == "dummy":
+        cache_settings = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    else:
+        cache_settings = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": parsed.netloc or "school"}
+
+    if scheme not in {"redis", "rediss", "dummy"}:
+        # Django's default of 300 entries is far too small for per-user entries.
+        cache_settings["OPTIONS"] = {"MAX_ENTRIES": _int_env("CACHE_MAX_ENTRIES", 10000, minimum=1)}
+    cache_settings["KEY_PREFIX"] = os.getenv("CACHE_KEY_PREFIX", "school").strip()
+    return cache_settings
+
+
+def _build_replica_settings(replica_url, primary):
+    """
+    ``DATABASES`` entry for the read replica at ``replica_url``: a ``postgres://`` URL takes
+    the primary's options, ``sqlite:///<path>`` (relative to BASE_DIR) is for local testing.
+    """
+    replica_url = _first_non_empty(replica_url)
+    if not replica_url:
+        return None
+
+    parsed = urlparse(replica_url)
+    if (parsed.scheme or "").lower() == "sqlite":
+        replica = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / unquote(parsed.path[1:])}
+    else:
+        parsed_url = _parse_postgres_url(replica_url)
+        if not parsed_url:
+            return None
+        replica = {key: value for key, value in primary.items() if key != "DISABLE_SERVER_SIDE_CURSORS"}
+        replica["OPTIONS"] = dict(primary.get("OPTIONS", {}))
+        for key in ("NAME", "USER", "PASSWORD", "HOST", "PORT"):
+            replica[key] = parsed_url[key] or primary.get(key, "")
+        if parsed_url.get("SSLMODE"):
+            replica["OPTIONS"]["sslmode"] = parsed_url["SSLMODE"]
+        if _is_transaction_pooler(parsed_url, replica["HOST"], replica["PORT"]):
+            replica["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+    # Tests read the replica alias from the test database instead of creating another one.
+    replica["TEST"] = {"MIRROR": "default"}
+    return replica
+
+
 ALLOWED_HOSTS = _split_csv_env(
     "DJANGO_ALLOWED_HOSTS",
     [
@@ -266,7 +385,16 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     ]
 
+# DJANGO_APP_PROFILE=lean (the default of the serverless entrypoint api/index.py) leaves out
+# the apps that only serve the admin, data seeding and API docs, so cold starts import less.
+APP_PROFILE = os.getenv("DJANGO_APP_PROFILE", "full").strip().lower()
+LEAN_OMITTED_APPS = ['django.contrib.admin', 'import_export', 'django_seed', 'drf_spectacular']
+if APP_PROFILE == "lean":
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in LEAN_OMITTED_APPS]
+
 MIDDLEWARE = [
+    'school_project.middleware.PerformanceInstrumentationMiddleware',
+    'school_project.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'school_project.middleware.ApiExceptionToJsonMiddleware',
@@ -355,7 +483,38 @@ WSGI_APPLICATION = 'school_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {"default": _build_database_settings()}
+# Schema changes and bulk jobs bypass the pooler (DATABASE_URL_UNPOOLED / POSTGRES_URL_NON_POOLING):
+# session state, advisory locks and long transactions need a connection of their own.
+# A process connects directly when DB_DIRECT=true or when it is `manage.py <command>` for one of
+# these commands (read from sys.argv[1]; gunicorn and other entry points never match).
+DIRECT_DB_COMMANDS = set(_split_csv_env(
+    "DB_DIRECT_COMMANDS",
+    ["migrate", "makemigrations", "sqlmigrate", "showmigrations", "dbshell", "flush", "loaddata",
+     "dumpdata", "createcachetable", "seed_scale"],
+))
+DB_DIRECT = _env_flag("DB_DIRECT", False) or (len(sys.argv) > 1 and sys.argv[1] in DIRECT_DB_COMMANDS)
+
+DATABASES = {"default": _build_database_settings(direct=DB_DIRECT)}
+
+# Optional read replica for report views (school_project/db_routers.py). The test suite runs
+# on the primary alone; school_project.tests_db_routers brings its own replica.
+_replica_settings = (
+    None
+    if DB_DIRECT or sys.argv[1:2] == ["test"]
+    else _build_replica_settings(os.getenv("DATABASE_REPLICA_URL"), DATABASES["default"])
+)
+if _replica_settings:
+    DATABASES["replica"] = _replica_settings
+    DATABASE_ROUTERS = ["school_project.db_routers.ReplicaRouter"]
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1,
+        "school_project.db_routers.ReplicaStickinessMiddleware",
+    )
+
+# Seconds a user reads from the primary after a write, to cover replication lag.
+DATABASE_REPLICA_STICKY_SEC = _int_env("DATABASE_REPLICA_STICKY_SEC", 15)
+# Seconds between replica health probes; an unhealthy replica is skipped meanwhile.
+DATABASE_REPLICA_HEALTH_INTERVAL = _int_env("DATABASE_REPLICA_HEALTH_INTERVAL", 10, minimum=1)
 
 
 # Password validation
@@ -401,21 +560,50 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/redirect/'
 LOGIN_URL = 'school/login/'
+
+
+# Keyset pagination for every list endpoint (see school_project/pagination.py).
+API_PAGE_SIZE = _int_env("API_PAGE_SIZE", 50, minimum=1)
+API_MAX_PAGE_SIZE = _int_env("API_MAX_PAGE_SIZE", 500, minimum=1)
+API_PAGINATION_COUNT_CAP = _int_env("API_PAGINATION_COUNT_CAP", 1000, minimum=1)
+
+# orjson-backed JSON rendering/parsing; falls back to the stock DRF classes when
+# orjson is not installed or API_FAST_JSON=false.
+API_FAST_JSON = _env_flag("API_FAST_JSON", True)
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'school_project.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'school_project.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'schoolapp.authentication.CachedTokenAuthentication',
+        'schoolapp.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_SCHEMA_CLASS': (
+        'rest_framework.schemas.openapi.AutoSchema' if APP_PROFILE == "lean" else 'drf_spectacular.openapi.AutoSchema'
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'school_project.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': API_PAGE_SIZE,
 }
     
+# Access tokens carry role and profile id claims (schoolapp.tokens) and are checked without
+# a database lookup, so keep them short-lived.
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=_int_env("JWT_ACCESS_MINUTES", 15, minimum=1)),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=_int_env("JWT_REFRESH_DAYS", 1, minimum=1)),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'UPDATE_LAST_LOGIN': False,
+}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'My School API',
     'DESCRIPTION': 'API documentation for test, users, tasks, etc.',
@@ -425,3 +613,82 @@ SPECTACULAR_SETTINGS = {
 
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Per-request timing (school_project.middleware.PerformanceInstrumentationMiddleware).
+PERF_INSTRUMENTATION = _env_flag("PERF_INSTRUMENTATION", True)
+PERF_SERVER_TIMING = _env_flag("PERF_SERVER_TIMING", True)
+PERF_SLOW_REQUEST_MS = _int_env("PERF_SLOW_REQUEST_MS", 500)
+PERF_SLOW_QUERY_LOG_LIMIT = _int_env("PERF_SLOW_QUERY_LOG_LIMIT", 5, minimum=1)
+
+# Shared cache (L2) of the tiered cache in school_project/cache.py.
+CACHES = {"default": _build_cache_settings(os.getenv("CACHE_URL"))}
+# Set when the site runs in one process (runserver, a single worker), so a per-process L2 is
+# seen by every request. Otherwise entity version stamps (school_project.versions) are not
+# kept in a locmem:// L2, which only the process that writes them would see.
+CACHE_SINGLE_PROCESS = _env_flag("CACHE_SINGLE_PROCESS", False)
+# Longest TTL of a namespace entry in a per-process L2, where deletes (a revoked token, say)
+# reach only the process that makes them.
+CACHE_PROCESS_LOCAL_TTL = _int_env("CACHE_PROCESS_LOCAL_TTL", 5)
+
+# Token principal cache (schoolapp.authentication); a TTL of 0 disables it.
+PRINCIPAL_CACHE_TTL = _int_env("PRINCIPAL_CACHE_TTL", 300)
+PRINCIPAL_CACHE_LOCAL_TTL = _int_env("PRINCIPAL_CACHE_LOCAL_TTL", 10)
+
+# Teacher statistics are served from the cache for up to STATS_CACHE_TTL seconds (0 disables)
+# and, while one request recomputes them, up to STATS_CACHE_STALE_SEC seconds longer.
+STATS_CACHE_TTL = _int_env("STATS_CACHE_TTL", 30)
+STATS_CACHE_STALE_SEC = _int_env("STATS_CACHE_STALE_SEC", 60)
+
+# Browser cache lifetime of a submitted attempt's result (StudentAttemptResultAPIView).
+COMPLETED_RESULT_MAX_AGE = _int_env("COMPLETED_RESULT_MAX_AGE", 86400)
+
+# Seconds after an attempt's deadline (time limit or assignment end) in which its submit and
+# autosaves still count, to cover slow mobile networks; manage.py expire_attempts finalizes
+# attempts once it has passed.
+EXAM_DEADLINE_GRACE_SEC = _int_env("EXAM_DEADLINE_GRACE_SEC", 30)
+
+# Idempotency-Key handling (schoolapp.idempotency): responses are replayed to retries for
+# IDEMPOTENCY_KEY_TTL seconds; a duplicate of a running request waits up to IDEMPOTENCY_WAIT_SEC
+# seconds for its response; a claim older than IDEMPOTENCY_LOCK_TIMEOUT seconds is abandoned.
+IDEMPOTENCY_KEY_TTL = _int_env("IDEMPOTENCY_KEY_TTL", 86400, minimum=1)
+IDEMPOTENCY_WAIT_SEC = _int_env("IDEMPOTENCY_WAIT_SEC", 10)
+IDEMPOTENCY_LOCK_TIMEOUT = _int_env("IDEMPOTENCY_LOCK_TIMEOUT", 60, minimum=1)
+
+# Response compression (CompressionMiddleware): bodies of at least COMPRESSION_MIN_BYTES with
+# one of these content types (or any +json type) are sent gzip- or brotli-encoded.
+COMPRESSION_MIN_BYTES = _int_env("COMPRESSION_MIN_BYTES", 1024)
+COMPRESSION_GZIP_LEVEL = _int_env("COMPRESSION_GZIP_LEVEL", 6, minimum=1)
+COMPRESSION_BROTLI_QUALITY = _int_env("COMPRESSION_BROTLI_QUALITY", 5)
+COMPRESSION_CONTENT_TYPES = ("application/json", "text/csv", "text/plain")
+
+# Per-namespace overrides of the tiered cache: ttl, local_ttl and stale_ttl in seconds (ttl 0
+# disables the namespace), max_entries for the per-process L1, and the single-flight
+# lock_timeout, lock_wait and early_beta.
+CACHE_NAMESPACES = {
+    "principal": {"ttl": PRINCIPAL_CACHE_TTL, "local_ttl": PRINCIPAL_CACHE_LOCAL_TTL},
+    "teacher_stats": {"ttl": STATS_CACHE_TTL, "stale_ttl": STATS_CACHE_STALE_SEC},
+}
+
+# Prometheus metrics served at /metrics (school_project.metrics).
+METRICS_ENABLED = _env_flag("METRICS_ENABLED", True)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "").strip()
+METRICS_FLUSH_INTERVAL = _int_env("METRICS_FLUSH_INTERVAL", 5)
+METRICS_AUTH_TOKEN = os.getenv("METRICS_AUTH_TOKEN", "").strip()
+
+TEST_RUNNER = "school_project.test_runner.TestRunner"
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'school_project.perf': {
+            'handlers': ['console'],
+            # Per-request lines are INFO; school_project.test_runner only keeps slow-request warnings.
+            'level': os.getenv("PERF_LOG_LEVEL", "INFO").strip().upper(),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,18 @@
+"""
+Test runner for ``manage.py test`` (``TEST_RUNNER``).
+
+Every test request would log its per-request ``school_project.perf`` line at INFO; the
+runner keeps only the slow-request warnings unless ``PERF_LOG_LEVEL`` asks for more.
+"""
+
+import logging
+import os
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if not os.getenv("PERF_LOG_LEVEL"):
+            logging.getLogger("school_project.perf").setLevel(logging.WARNING)
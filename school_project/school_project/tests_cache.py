@@ -0,0 +1,241 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from schoolapp.models import Course, Enrollment, Student, Teacher
+
+from . import settings as project_settings, versions
+from .cache import CacheNamespace, Computed
+from .metrics import CACHE_L1_EVICTIONS, CACHE_REQUESTS
+
+
+class CacheNamespaceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_l1_answers_repeat_reads(self):
+        answers = CacheNamespace("t-l1", ttl=60, local_ttl=60)
+        answers.set("key", {"score": 5})
+        cache.delete(answers._full_key("key"))
+
+        hits = CACHE_REQUESTS.value("t-l1", "l1", "hit")
+        self.assertEqual(answers.get("key"), {"score": 5})
+        self.assertEqual(CACHE_REQUESTS.value("t-l1", "l1", "hit"), hits + 1)
+
+    def test_l1_evicts_the_least_recently_used_entry(self):
+        answers = CacheNamespace("t-lru", ttl=60, local_ttl=60, max_entries=2)
+        answers.set("a", 1)
+        answers.set("b", 2)
+        answers.get("a")
+        answers.set("c", 3)
+
+        self.assertEqual(CACHE_L1_EVICTIONS.value("t-lru"), 1)
+        misses = CACHE_REQUESTS.value("t-lru", "l1", "miss")
+        self.assertEqual([answers.get(key) for key in "cab"], [3, 1, 2])
+        # Only "b" had to come from L2.
+        self.assertEqual(CACHE_REQUESTS.value("t-lru", "l1", "miss"), misses + 1)
+
+    def test_processes_share_l2_deletes_and_clears(self):
+        # Two instances of one namespace stand in for two worker processes.
+        first = CacheNamespace("t-shared", ttl=60, local_ttl=0)
+        second = CacheNamespace("t-shared", ttl=60, local_ttl=0)
+
+        first.set("key", "value")
+        self.assertEqual(second.get("key"), "value")
+        first.delete("key")
+        self.assertIsNone(second.get("key"))
+
+        first.set("key", "value")
+        second.clear()
+        self.assertIsNone(first.get("key"))
+
+    def test_other_processes_see_a_delete_within_local_ttl(self):
+        first = CacheNamespace("t-stale", ttl=60, local_ttl=10)
+        second = CacheNamespace("t-stale", ttl=60, local_ttl=10)
+        first.set("key", "value")
+        self.assertEqual(second.get("key"), "value")
+
+        first.delete("key")
+        self.assertEqual(second.get("key"), "value")
+        with mock.patch("school_project.cache.time.monotonic", return_value=10**9):
+            self.assertIsNone(second.get("key"))
+
+    def test_version_bump_ignores_old_entries(self):
+        CacheNamespace("t-version", version=1).set("key", "old shape")
+        self.assertIsNone(CacheNamespace("t-version", version=2).get("key"))
+
+    def test_memoize_and_invalidate(self):
+        answers = CacheNamespace("t-memo", ttl=60, local_ttl=0)
+        calls = []
+
+        @answers.memoize()
+        def answer_key(test_id, variant="a"):
+            calls.append((test_id, variant))
+            return f"{test_id}{variant}"
+
+        self.assertEqual(answer_key(1), "1a")
+        self.assertEqual(answer_key(1), "1a")
+        self.assertEqual(answer_key(1, variant="b"), "1b")
+        answer_key.invalidate(1)
+        answer_key(1)
+        self.assertEqual(calls, [(1, "a"), (1, "b"), (1, "a")])
+
+    @override_settings(CACHE_NAMESPACES={"t-off": {"ttl": 0}})
+    def test_settings_can_disable_a_namespace(self):
+        answers = CacheNamespace("t-off", ttl=60)
+        self.assertEqual(answers.get_or_set("key", lambda: "computed"), "computed")
+        self.assertIsNone(answers.get("key"))
+
+    @override_settings(CACHE_SINGLE_PROCESS=False, CACHE_PROCESS_LOCAL_TTL=5)
+    def test_per_process_l2_entries_expire_soon(self):
+        principals = CacheNamespace("t-local-l2", ttl=300)
+        self.assertEqual(principals.option("ttl"), 5)
+        with mock.patch.object(principals.l2, "set") as l2_set:
+            principals.set("token", "principal")
+        self.assertEqual(l2_set.call_args.args[2], 5)
+
+    def test_l2_errors_are_misses(self):
+        answers = CacheNamespace("t-error", ttl=60, local_ttl=0)
+        errors = CACHE_REQUESTS.value("t-error", "l2", "error")
+        with mock.patch.object(cache, "get", side_effect=ConnectionError("redis down")), \
+                self.assertLogs("school_project.cache", "WARNING"):
+            self.assertEqual(answers.get_or_set("key", lambda: "computed"), "computed")
+        self.assertGreater(CACHE_REQUESTS.value("t-error", "l2", "error"), errors)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_concurrently(self, stats, workers=6):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "new"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(stats.single_flight("stats", compute)))
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(calls), sorted(results)
+
+    def test_one_request_recomputes_while_the_others_get_the_stale_value(self):
+        stats = CacheNamespace("t-flight-stale", ttl=30, local_ttl=0, stale_ttl=60)
+        stats._set(stats._full_key("stats"), Computed("old", time.time() - 1, 0.01), 60)
+
+        self.assertEqual(self.run_concurrently(stats), (1, ["new"] + ["old"] * 5))
+        self.assertEqual(stats.single_flight("stats", lambda: "unused"), "new")
+
+    def test_without_a_stale_value_the_others_wait_for_the_result(self):
+        stats = CacheNamespace("t-flight-wait", ttl=30, local_ttl=0)
+
+        self.assertEqual(self.run_concurrently(stats), (1, ["new"] * 6))
+
+    def test_entries_near_expiry_are_refreshed_early(self):
+        stats = CacheNamespace("t-flight-early", ttl=30, local_ttl=0)
+        # Took 10 s to compute and expires in 5 s: refresh now rather than at expiry.
+        stats._set(stats._full_key("stats"), Computed("old", time.time() + 5, 10.0), 60)
+
+        with mock.patch("school_project.cache.random.random", return_value=0.5):
+            self.assertEqual(stats.single_flight("stats", lambda: "new"), "new")
+        stats._set(stats._full_key("stats"), Computed("old", time.time() + 5, 10.0), 60)
+        with override_settings(CACHE_NAMESPACES={"t-flight-early": {"early_beta": 0}}):
+            self.assertEqual(stats.single_flight("stats", lambda: "new"), "old")
+
+    def test_computes_without_the_lock_when_l2_fails(self):
+        stats = CacheNamespace("t-flight-down", ttl=30, local_ttl=0)
+        with mock.patch.object(cache, "add", side_effect=ConnectionError("redis down")), \
+                self.assertLogs("school_project.cache", "WARNING"):
+            self.assertEqual(stats.single_flight("stats", lambda: "computed"), "computed")
+
+
+@override_settings(CACHE_SINGLE_PROCESS=True)
+class EntityVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = Teacher.objects.create(name="T", last_name="One", email="t@example.com")
+        self.course = Course.objects.create(title="Algebra", teacher=teacher, schedule={})
+        self.student = Student.objects.create(name="S", last_name="One")
+
+    def test_dependent_entries_go_stale_when_a_dependency_changes(self):
+        titles = CacheNamespace("t-deps", ttl=60, local_ttl=60)
+        depends_on = [("course", self.course.pk)]
+        calls = []
+
+        def title():
+            calls.append(1)
+            return Course.objects.get(pk=self.course.pk).title
+
+        self.assertEqual(titles.get_or_set("title", title, depends_on=depends_on), "Algebra")
+        self.assertEqual(titles.get_or_set("title", title, depends_on=depends_on), "Algebra")
+        self.course.title = "Geometry"
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.course.save()
+        # Bumped at once inside the transaction, and again once it commits.
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(titles.get_or_set("title", title, depends_on=depends_on), "Geometry")
+        self.assertEqual(len(calls), 2)
+
+    def test_tracked_relations_bump_their_parents(self):
+        before = versions.versions([("student", self.student.pk), ("course", self.course.pk), ("course", versions.ANY)])
+        Enrollment.objects.create(student=self.student, course=self.course)
+        after = versions.versions([("student", self.student.pk), ("course", self.course.pk), ("course", versions.ANY)])
+
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+
+    def test_batched_bulk_deletes_write_once(self):
+        students = [Student.objects.create(name=f"S{i}") for i in range(3)]
+        for student in students:
+            Enrollment.objects.create(student=student, course=self.course)
+
+        with mock.patch.object(versions, "_write") as write, versions.batched():
+            Enrollment.objects.all().delete()
+        write.assert_called_once()
+        self.assertIn(f"version:student:{students[2].pk}", write.call_args.args[0])
+
+    def test_unreadable_versions_disable_caching(self):
+        titles = CacheNamespace("t-deps-down", ttl=60, local_ttl=60)
+        with mock.patch.object(cache, "get_many", side_effect=ConnectionError("redis down")), \
+                self.assertLogs("school_project.versions", "WARNING"):
+            self.assertIsNone(versions.stamp([("course", self.course.pk)]))
+            self.assertEqual(titles.get_or_set("t", lambda: "fresh", depends_on=[("course", 1)]), "fresh")
+            self.assertIsNone(titles.get("t", depends_on=[("course", 1)]))
+
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_per_process_caches_keep_no_stamps(self):
+        titles = CacheNamespace("t-deps-local", ttl=60, local_ttl=60)
+        self.assertIsNone(versions.stamp([("course", self.course.pk)]))
+        titles.set("t", "cached", depends_on=[("course", self.course.pk)])
+        self.assertIsNone(titles.get("t", depends_on=[("course", self.course.pk)]))
+        with self.assertLogs("school_project.versions", "WARNING"):
+            versions.warn_if_not_shared()
+
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}}
+        with override_settings(CACHES=redis):
+            self.assertTrue(versions.is_shared())
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_cache_url_schemes(self):
+        build = project_settings._build_cache_settings
+
+        self.assertEqual(build("")["BACKEND"], "django.core.cache.backends.locmem.LocMemCache")
+        self.assertEqual(build(None)["OPTIONS"], {"MAX_ENTRIES": 10000})
+        redis = build("rediss://:pw@cache.internal:6380/1")
+        self.assertEqual(redis["BACKEND"], "django.core.cache.backends.redis.RedisCache")
+        self.assertEqual(redis["LOCATION"], "rediss://:pw@cache.internal:6380/1")
+        self.assertNotIn("OPTIONS", redis)
+        self.assertEqual(build("db://school_cache")["LOCATION"], "school_cache")
+        self.assertEqual(build("file:///var/tmp/school-cache")["LOCATION"], "/var/tmp/school-cache")
+        self.assertEqual(build("dummy://")["KEY_PREFIX"], "school")
@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from schoolapp.models import Department
+
+from . import settings as project_settings
+from .db_routers import (
+    REPLICA_ALIAS,
+    REPLICA_HEALTH,
+    ReplicaReadMixin,
+    ReplicaRouter,
+    ReplicaStickinessMiddleware,
+    pin_to_primary,
+)
+
+
+class DepartmentNamesView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(list(Department.objects.order_by("name").values_list("name", flat=True)))
+
+
+@override_settings(DATABASE_ROUTERS=["school_project.db_routers.ReplicaRouter"])
+class ReplicaRoutingTests(TestCase):
+    """The test database is the primary, a second SQLite file stands in for the replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists for this class, so the test runner must not set it up.
+        cls.databases = {"default", REPLICA_ALIAS}
+        cls.replica_dir = Path(tempfile.mkdtemp())
+        connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+            **connections.settings,
+            REPLICA_ALIAS: {"ENGINE": "django.db.backends.sqlite3", "NAME": str(cls.replica_dir / "replica.sqlite3")},
+        })[REPLICA_ALIAS]
+        with connections[REPLICA_ALIAS].schema_editor() as editor:
+            editor.create_model(Department)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        shutil.rmtree(cls.replica_dir)
+        REPLICA_HEALTH.reset()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="teacher", password="secret")
+        Department.objects.create(name="Primary")
+        Department.objects.using(REPLICA_ALIAS).create(name="Replica")
+
+    def setUp(self):
+        cache.clear()
+        REPLICA_HEALTH.reset()
+
+    def get_names(self, cookies=None):
+        request = APIRequestFactory().get("/departments/")
+        if cookies:
+            request.COOKIES.update({name: morsel.value for name, morsel in cookies.items()})
+        force_authenticate(request, user=self.user)
+        return DepartmentNamesView.as_view()(request).data
+
+    def test_report_reads_go_to_the_replica(self):
+        self.assertEqual(self.get_names(), ["Replica"])
+        # Outside the view, reads are back on the primary.
+        self.assertEqual(list(Department.objects.values_list("name", flat=True)), ["Primary"])
+
+    @override_settings(CACHE_SINGLE_PROCESS=True)
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        request = RequestFactory().post("/anything/")
+        request.user = self.user
+        ReplicaStickinessMiddleware(lambda request: HttpResponse())(request)
+
+        self.assertEqual(self.get_names(), ["Primary"])
+
+        cache.clear()
+        self.assertEqual(self.get_names(), ["Replica"])
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_pins_travel_with_the_client_when_the_cache_is_per_process(self):
+        request = RequestFactory().post("/anything/")
+        request.user = self.user
+        response = ReplicaStickinessMiddleware(lambda request: HttpResponse())(request)
+
+        self.assertFalse(cache.get(f"replica-pin:{self.user.pk}"))
+        self.assertEqual(self.get_names(response.cookies), ["Primary"])
+        self.assertEqual(self.get_names(), ["Replica"])
+
+    def test_pins_are_per_user(self):
+        other = User.objects.create_user(username="other", password="secret")
+        response = HttpResponse()
+        pin_to_primary(other, response)
+
+        self.assertEqual(self.get_names(response.cookies), ["Replica"])
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        replica = connections[REPLICA_ALIAS]
+        with mock.patch.object(replica, "cursor", side_effect=OperationalError("replica down")):
+            with self.assertLogs("school_project.db_routers", "WARNING"):
+                self.assertEqual(self.get_names(), ["Primary"])
+
+    def test_failed_replica_query_is_retried_on_the_primary(self):
+        with connections[REPLICA_ALIAS].cursor() as cursor:
+            cursor.execute(f"DROP TABLE {Department._meta.db_table}")
+
+        with self.assertLogs("school_project.db_routers", "WARNING"):
+            self.assertEqual(self.get_names(), ["Primary"])
+        # Marked unhealthy: the next request does not try the replica again.
+        with self.assertNoLogs("school_project.db_routers", "WARNING"):
+            self.assertEqual(self.get_names(), ["Primary"])
+
+
+class ReplicaSettingsTests(SimpleTestCase):
+    primary = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": "school",
+        "USER": "app",
+        "PASSWORD": "secret",
+        "HOST": "ep-primary-pooler.neon.tech",
+        "PORT": "5432",
+        "OPTIONS": {"sslmode": "require", "connect_timeout": 15},
+        "CONN_MAX_AGE": 60,
+        "DISABLE_SERVER_SIDE_CURSORS": True,
+    }
+
+    def test_postgres_replica_keeps_the_primary_options(self):
+        replica = project_settings._build_replica_settings(
+            "postgres://reader:pw@replica.internal:5433/school", self.primary
+        )
+
+        self.assertEqual(replica["HOST"], "replica.internal")
+        self.assertEqual(replica["USER"], "reader")
+        self.assertEqual(replica["PORT"], "5433")
+        self.assertEqual(replica["OPTIONS"], self.primary["OPTIONS"])
+        self.assertEqual(replica["CONN_MAX_AGE"], 60)
+        self.assertNotIn("DISABLE_SERVER_SIDE_CURSORS", replica)
+        self.assertEqual(replica["TEST"], {"MIRROR": "default"})
+
+    def test_sqlite_replica_for_local_testing(self):
+        replica = project_settings._build_replica_settings("sqlite:///replica.sqlite3", self.primary)
+
+        self.assertEqual(replica["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(replica["NAME"], project_settings.BASE_DIR / "replica.sqlite3")
+        self.assertIsNone(project_settings._build_replica_settings("", self.primary))
+
+    def test_router_keeps_writes_and_migrations_on_the_primary(self):
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_write(Department), "default")
+        self.assertIsNone(router.db_for_read(Department))
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, "schoolapp"))
+        self.assertTrue(router.allow_migrate("default", "schoolapp"))
@@ -0,0 +1,157 @@
+import re
+from collections import Counter
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from nazoratapp.models import Nazorat, NazoratResult
+from schoolapp.models import Course, Enrollment, Student, Task, TaskSubmission, Teacher
+from testapp.models import Answer, EnrollmentTest, Question, StudentAnswer, Test, TestAttempt
+
+from .cache import clear_local_caches
+from .query_budgets import BUDGETS, EXEMPT, EXEMPT_NAMESPACES
+
+
+def named_urls(patterns=None, namespace=None):
+    """Every URL name reachable from the root URLconf, skipping exempt namespaces."""
+    names = set()
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver):
+            child = pattern.namespace
+            if child in EXEMPT_NAMESPACES:
+                continue
+            full = f"{namespace}:{child}" if namespace and child else (child or namespace)
+            names |= named_urls(pattern.url_patterns, full)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f"{namespace}:{pattern.name}" if namespace else pattern.name)
+    return names
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def duplicated_sql(queries):
+    """Statements that ran more than once once literals are masked, most repeated first."""
+    counts = Counter(_LITERALS.sub("?", query["sql"]) for query in queries)
+    return [(count, sql) for sql, count in counts.most_common() if count > 1]
+
+
+def build_dataset():
+    teacher_user = User.objects.create_user(username="budget_teacher", password="x")
+    student_user = User.objects.create_user(username="budget_student", password="x")
+    staff_user = User.objects.create_user(username="budget_staff", password="x", is_staff=True)
+    teacher = Teacher.objects.create(user=teacher_user, name="T", last_name="One", email="t@example.com")
+    student = Student.objects.create(user=student_user, name="S", last_name="One")
+    course = Course.objects.create(title="Algebra", teacher=teacher, schedule={})
+    test = Test.objects.create(title="Quiz", teacher=teacher, status=Test.STATUS_PUBLISHED)
+    question = Question.objects.create(test=test, text="2+2", question_type="OC", mark=1)
+    answer = Answer.objects.create(question=question, text="4", is_correct=True)
+    task = Task.objects.create(title="Task", description="", teacher=teacher, course=course)
+    attempt = TestAttempt.objects.create(student=student, test=test, completed_at=timezone.now())
+    nazorat = Nazorat.objects.create(course=course, title="N", source_type="test", source_id=test.id)
+    return SimpleNamespace(
+        users={"teacher": teacher_user, "student": student_user, "staff": staff_user},
+        teacher=teacher,
+        student=student,
+        course=course,
+        test=test,
+        question=question,
+        answer=answer,
+        task=task,
+        attempt=attempt,
+        nazorat=nazorat,
+        enrollment=Enrollment.objects.create(student=student, course=course),
+        enrollment_test=EnrollmentTest.objects.create(teacher=teacher, test=test, course=course),
+        submission=TaskSubmission.objects.create(task=task, student=student, teacher=teacher, is_done=True, score=5),
+        nazorat_result=NazoratResult.objects.create(nazorat=nazorat, student=student, best_score=5),
+    )
+
+
+def grow_dataset(data, rows):
+    """Add ``rows`` more of every relation the endpoints read, all linked to ``data``."""
+    for _ in range(rows):
+        other = Student.objects.create(name="Other", last_name="Student")
+        Enrollment.objects.create(student=other, course=data.course)
+
+        course = Course.objects.create(title="Geometry", teacher=data.teacher, schedule={})
+        Enrollment.objects.create(student=data.student, course=course)
+        task = Task.objects.create(title="More", description="", teacher=data.teacher, course=data.course)
+        TaskSubmission.objects.create(task=task, student=data.student, teacher=data.teacher, is_done=True, score=3)
+        TaskSubmission.objects.create(task=data.task, student=other, teacher=data.teacher)
+
+        test = Test.objects.create(title="More", teacher=data.teacher, status=Test.STATUS_PUBLISHED)
+        Question.objects.create(test=test, text="1+1", question_type="WR")
+        EnrollmentTest.objects.create(teacher=data.teacher, test=test, course=course)
+
+        question = Question.objects.create(test=data.test, text="3+3", question_type="MC", mark=2)
+        options = Answer.objects.bulk_create(
+            [Answer(question=question, text="6", is_correct=True), Answer(question=question, text="7")]
+        )
+        student_answer = StudentAnswer.objects.create(attempt=data.attempt, question=question, scored_mark=2)
+        student_answer.selected_answers.add(options[0])
+
+        attempt = TestAttempt.objects.create(student=other, test=data.test, completed_at=timezone.now())
+        StudentAnswer.objects.create(attempt=attempt, question=question)
+        NazoratResult.objects.create(nazorat=data.nazorat, student=other)
+
+
+@override_settings(METRICS_AUTH_TOKEN="budget")
+class QueryBudgetTests(TestCase):
+    """Every named URL stays within its budget in ``query_budgets`` regardless of data size."""
+
+    small_rows = 1
+    large_rows = 6
+
+    def test_every_named_url_has_a_budget(self):
+        missing = sorted(named_urls() - set(BUDGETS) - set(EXEMPT))
+        self.assertEqual(missing, [], "Add these URL names to school_project/query_budgets.py")
+
+    def test_budgets_hold_at_two_dataset_sizes(self):
+        data = build_dataset()
+        grow_dataset(data, self.small_rows)
+        small = self._measure_all(data)
+        grow_dataset(data, self.large_rows - self.small_rows)
+        large = self._measure_all(data)
+
+        problems = []
+        for name, budget in sorted(BUDGETS.items()):
+            (small_status, small_queries), (large_status, large_queries) = small[name], large[name]
+            if large_status >= 400:
+                problems.append(f"{name}: HTTP {large_status}")
+                continue
+            if len(large_queries) != len(small_queries):
+                problems.append(
+                    f"{name}: {len(small_queries)} queries with {self.small_rows} rows, "
+                    f"{len(large_queries)} with {self.large_rows} (grows with data)"
+                )
+            elif len(large_queries) > budget.max_queries:
+                problems.append(f"{name}: {len(large_queries)} queries, budget {budget.max_queries}")
+            else:
+                continue
+            for count, sql in duplicated_sql(large_queries)[:3]:
+                problems.append(f"    {count}x {sql[:300]}")
+
+        self.assertFalse(problems, "\n" + "\n".join(problems))
+
+    def _measure_all(self, data):
+        return {name: self._measure(data, name, budget) for name, budget in BUDGETS.items()}
+
+    def _measure(self, data, name, budget):
+        client = APIClient(raise_request_exception=False)
+        if budget.user:
+            client.force_login(data.users[budget.user])
+        url = reverse(name, kwargs={key: getattr(data, attr).pk for key, attr in budget.kwargs.items()})
+        # Budgets are for cold requests.
+        cache.clear()
+        clear_local_caches()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_ACCEPT=budget.accept, headers=budget.headers)
+        return response.status_code, context.captured_queries
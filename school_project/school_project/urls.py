@@ -14,34 +14,51 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from schoolapp import views
+from school_project.metrics import metrics_view
 from django.urls import path
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
 
 
 urlpatterns = [
     path('', views.ProfileRedirectAPIView.as_view(), name='home'),
-    path('admin/', admin.site.urls),
     path('school/',include('schoolapp.urls')),
     path('testapp/', include('testapp.urls', namespace='testapp')),
     path('nazorat/', include('nazoratapp.urls')),
     path('api-token-auth/', views.SafeObtainAuthToken.as_view(), name='api_token_auth'),
-     # API schema
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
-    # Swagger UI
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    # Prometheus scrape target
+    path('metrics', metrics_view, name='metrics'),
+    ]
+
+# The admin and the API docs are not installed in the lean app profile (settings.APP_PROFILE);
+# their modules are only imported when they are.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if apps.is_installed('drf_spectacular'):
+    from drf_spectacular.views import (
+        SpectacularAPIView,
+        SpectacularRedocView,
+        SpectacularSwaggerView,
+    )
+
+    urlpatterns += [
+        # API schema
+        path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+
+        # Swagger UI
+        path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 
-    # Redoc (alternative UI)
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+        # Redoc (alternative UI)
+        path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     ]
 
 
@@ -0,0 +1,170 @@
+"""
+Entity version stamps: cache invalidation that reaches every process.
+
+A stamp is kept in the shared cache per entity row, e.g. ``("test", 12)``, and per entity
+table, ``("test", ANY)``. A row's stamp covers the row and the rows that hang off it: the
+``test`` stamp changes with the test's questions and answers, the ``student`` and ``course``
+stamps with their enrollments. Writes bump the stamps they touch; cached values embed the
+stamps of everything they were built from, so after a write no process can find the old
+entries any more, however many workers or instances share the cache::
+
+    ANSWER_KEYS.get_or_set(test.pk, build, depends_on=[("test", test.pk)])
+
+Models declare what they bump in their app's ``ready()``::
+
+    track(Question, ("test", "test_id"))
+    track(Answer, ("test", "question__test_id"))
+
+Bumps run when the transaction commits, and inside a transaction also at once: a reader
+between the write and the commit can only cache the old data under a stamp that the commit
+bump replaces. ``QuerySet.update()`` and ``bulk_create()`` send no signals; call ``bump()``
+after them. Bulk deletes send one signal per row, so wrap them in ``batched()`` to write
+the stamps once. A missing stamp (new, or evicted) is seeded with a fresh time stamp, never a
+counter that could return to an old value, so entries built before an eviction stay
+unreachable. If the shared cache is down, ``stamp()`` returns None and callers skip caching.
+
+Stamps only work in a cache every process shares. With a per-process L2 (``locmem://``)
+a bump would reach only the process that made it, so unless ``CACHE_SINGLE_PROCESS`` says
+there is just one process, ``versions()`` returns None as if the cache were down: entries
+with dependencies are not cached and conditional GETs always send the body.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+
+logger = logging.getLogger(__name__)
+
+# Pk of the table-wide stamp, bumped with every row of the entity.
+ANY = "*"
+# Cache backends whose entries live in one process's memory.
+PROCESS_LOCAL_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+_batch = threading.local()
+
+
+def _version_key(entity, pk):
+    return f"version:{entity}:{pk}"
+
+
+def _resolve(instance, path):
+    value = instance
+    for attribute in path.split("__"):
+        value = getattr(value, attribute, None)
+        if value is None:
+            return None
+    return value
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Whether writes to cache ``alias`` reach every process that serves the site."""
+    return settings.CACHE_SINGLE_PROCESS or settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def warn_if_not_shared():
+    """Log at startup that stamps are off because the cache is per process; see the module docs."""
+    if not is_shared():
+        logger.warning(
+            "CACHE_URL is a per-process cache, so entity versions cannot reach other workers: entries "
+            "with dependencies are not cached and conditional GETs always send the body. Set CACHE_URL "
+            "to a shared cache, or CACHE_SINGLE_PROCESS=true if the site runs in one process."
+        )
+
+
+def versions(dependencies):
+    """Current stamps of ``(entity, pk)`` pairs, in order; None if the shared cache failed."""
+    if not is_shared():
+        return None
+    keys = [_version_key(entity, pk) for entity, pk in dependencies]
+    try:
+        found = cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                seeded = time.time_ns()
+                found[key] = seeded if cache.add(key, seeded, None) else cache.get(key, seeded)
+    except Exception:  # noqa: BLE001
+        logger.warning("Could not read entity versions; not caching.", exc_info=True)
+        return None
+    return [found[key] for key in keys]
+
+
+def stamp(dependencies):
+    """Short text identifying the current versions of ``dependencies``, for use in cache keys."""
+    current = versions(dependencies)
+    if current is None:
+        return None
+    return hashlib.sha256(".".join(map(str, current)).encode("ascii")).hexdigest()[:16]
+
+
+def _write(keys):
+    try:
+        now = time.time_ns()
+        cache.set_many({key: now for key in keys}, None)
+    except Exception:  # noqa: BLE001
+        logger.warning("Could not bump entity versions %s; cached entries stay until they expire.", sorted(keys), exc_info=True)
+
+
+def _schedule(keys, using):
+    if not keys:
+        return
+    if connections[using].in_atomic_block:
+        _write(keys)
+    transaction.on_commit(lambda: _write(keys), using=using)
+
+
+def bump(*dependencies, using=DEFAULT_DB_ALIAS):
+    """New stamps for ``(entity, pk)`` pairs, and for their entity tables, once ``using`` commits."""
+    keys = set()
+    for entity, pk in dependencies:
+        keys.add(_version_key(entity, pk))
+        keys.add(_version_key(entity, ANY))
+    pending = getattr(_batch, "keys", None)
+    if pending is not None:
+        pending.update(keys)
+    else:
+        _schedule(keys, using)
+
+
+@contextmanager
+def batched(using=DEFAULT_DB_ALIAS):
+    """Collect the bumps made inside the block and write them once, when it ends."""
+    if getattr(_batch, "keys", None) is not None:
+        yield
+        return
+    _batch.keys = set()
+    try:
+        yield
+    finally:
+        keys, _batch.keys = _batch.keys, None
+        _schedule(keys, using)
+
+
+def track(model, *dependencies):
+    """
+    Bump the ``(entity, attribute path)`` dependencies of ``model`` rows whenever one is saved
+    or deleted. The path is read from the instance and may follow relations with ``__``.
+    """
+
+    def changed(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+        pairs = []
+        for entity, path in dependencies:
+            try:
+                pk = _resolve(instance, path)
+            except ObjectDoesNotExist:
+                pk = None  # the parent went first in a cascade and bumped itself
+            if pk is not None:
+                pairs.append((entity, pk))
+        bump(*pairs, using=using)
+
+    uid = f"entity-versions-{model._meta.label_lower}"
+    post_save.connect(changed, sender=model, weak=False, dispatch_uid=f"{uid}-saved")
+    post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f"{uid}-deleted")
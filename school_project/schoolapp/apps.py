@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class SchoolAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schoolapp'
+
+    def ready(self):
+        from school_project.versions import warn_if_not_shared
+
+        # Connects the principal cache and entity version invalidation receivers.
+        from . import invalidation, principals  # noqa: F401
+
+        warn_if_not_shared()
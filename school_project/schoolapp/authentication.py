@@ -0,0 +1,77 @@
+"""
+Authentication classes that avoid per-request database lookups: DRF tokens resolved
+through the principal cache in ``schoolapp.principals`` and JWTs whose claims carry the
+role and profile ids (``schoolapp.tokens``).
+"""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .tokens import ROLE_CLAIM, STAFF_CLAIM, STUDENT_CLAIM, TEACHER_CLAIM, USERNAME_CLAIM
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that serves repeat requests from ``PRINCIPALS``."""
+
+    def authenticate_credentials(self, key):
+        # DRF imports authentication classes while settings load, before models are ready.
+        from .principals import PRINCIPALS, principal_entry, principal_from_entry
+
+        model = self.get_model()
+        entry = PRINCIPALS.get(key)
+        if entry is None:
+            try:
+                token = model.objects.select_related(
+                    "user__teacher_profile", "user__student_profile"
+                ).get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            entry = principal_entry(token)
+            PRINCIPALS.set(key, entry)
+
+        user, token = principal_from_entry(entry)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return user, token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that builds the user and its profiles from the token claims.
+
+    The user and profiles only have their ids (plus username and ``is_staff``) loaded;
+    any other field is fetched from the database on first access. Tokens issued without
+    a role claim fall back to the database lookup of the parent class.
+    """
+
+    def get_user(self, validated_token):
+        from django.contrib.auth.models import User
+
+        from .models import Student, Teacher
+        from .principals import attach_profiles, loaded_instance
+
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            # simplejwt writes the id claim as a string.
+            user_id = User._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = loaded_instance(
+            User,
+            id=user_id,
+            username=validated_token.get(USERNAME_CLAIM, ""),
+            is_staff=bool(validated_token.get(STAFF_CLAIM)),
+            is_active=True,
+        )
+        teacher_id = validated_token.get(TEACHER_CLAIM)
+        student_id = validated_token.get(STUDENT_CLAIM)
+        return attach_profiles(
+            user,
+            loaded_instance(Teacher, id=teacher_id, user_id=user_id) if teacher_id else None,
+            loaded_instance(Student, id=student_id, user_id=user_id) if student_id else None,
+        )
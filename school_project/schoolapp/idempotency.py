@@ -0,0 +1,172 @@
+"""
+``Idempotency-Key`` support for POST handlers that must not run twice for one client action.
+
+A client sends a fresh key (a UUID, say) with a request and the same key with every retry
+of it. The first request claims the key in the ``IdempotencyKey`` table and runs; its
+response is stored, compressed, and replayed to retries for ``IDEMPOTENCY_KEY_TTL`` seconds
+with an ``Idempotent-Replayed: true`` header, without running the handler again::
+
+    class StudentStartAttemptAPIView(APIView):
+        @idempotent
+        def post(self, request, test_id: int):
+            ...
+
+A duplicate that arrives while the first request is still running waits up to
+``IDEMPOTENCY_WAIT_SEC`` seconds for its response, then gets ``409`` with ``Retry-After``.
+Reusing a key for a different request (another path or body) gets ``422``. Responses of 5xx
+and raised exceptions are not stored: the key is released and a retry runs again. A claim
+whose request died without releasing it is taken over after ``IDEMPOTENCY_LOCK_TIMEOUT``
+seconds. Requests without the header, or from anonymous users, run as before.
+
+Put ``@idempotent`` above ``@transaction.atomic``: the claim must commit before the
+handler's transaction starts so that concurrent duplicates can see it.
+
+Responses that embed large shared data keep it out of the table: ``compact`` picks what a
+successful response's data must store and ``expand`` turns that back into the response::
+
+    @idempotent(compact=without_question_set, expand=start_response)
+"""
+
+import functools
+import hashlib
+import json
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from school_project.metrics import IDEMPOTENT_REQUESTS
+from school_project.renderers import FastJSONRenderer
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Seconds between looks at a key whose first request is still running.
+POLL_SECONDS = 0.1
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """``(record, claimed)``: the key's row, and whether this request now owns it."""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint, expires_at=expires_at), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        return None, False  # released meanwhile; the caller tries again
+    abandoned = record.status_code is None and record.created_at <= now - timedelta(
+        seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+    )
+    if record.expires_at <= now or abandoned:
+        # Compare-and-set on created_at, so only one duplicate takes it over.
+        taken = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+            fingerprint=fingerprint, status_code=None, body=None, content_type="", created_at=now, expires_at=expires_at
+        )
+        if taken:
+            record.fingerprint, record.status_code, record.created_at = fingerprint, None, now
+            return record, True
+    return record, False
+
+
+def _owned(record):
+    # Compare-and-set on created_at, like _claim(): a request whose claim was taken over
+    # must not release or overwrite the new owner's row.
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def _replay(record, expand):
+    body = zlib.decompress(record.body)
+    if expand is not None and status.is_success(record.status_code):
+        response = expand(json.loads(body), record.status_code)
+    else:
+        response = HttpResponse(body, status=record.status_code, content_type=record.content_type)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _store(record, response, compact):
+    if isinstance(response, Response):
+        data = response.data
+        if compact is not None and status.is_success(response.status_code):
+            data = compact(data)
+        body = FastJSONRenderer().render(data)
+        content_type = "application/json"
+    else:
+        body = response.content
+        content_type = response.get("Content-Type", "")
+    _owned(record).update(status_code=response.status_code, body=zlib.compress(body), content_type=content_type)
+
+
+def idempotent(handler=None, *, compact=None, expand=None):
+    """Decorator for an ``APIView`` handler method; see the module docstring."""
+    if handler is None:
+        return functools.partial(idempotent, compact=compact, expand=expand)
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = _fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SEC
+        waited = False
+        while True:
+            record, claimed = _claim(request.user, key, fingerprint)
+            if claimed:
+                break
+            if record is not None and record.fingerprint != fingerprint:
+                IDEMPOTENT_REQUESTS.inc("mismatch")
+                return Response(
+                    {"detail": f"This {HEADER} was already used for a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record is not None and record.status_code is not None:
+                IDEMPOTENT_REQUESTS.inc("waited" if waited else "replayed")
+                return _replay(record, expand)
+            if time.monotonic() >= deadline:
+                IDEMPOTENT_REQUESTS.inc("in_progress")
+                return Response(
+                    {"detail": f"A request with this {HEADER} is still being processed."},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Retry-After": "1"},
+                )
+            waited = True
+            time.sleep(POLL_SECONDS)
+
+        IDEMPOTENT_REQUESTS.inc("first")
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            _owned(record).delete()
+            raise
+        if response.status_code >= 500:
+            _owned(record).delete()
+        else:
+            _store(record, response, compact)
+        return response
+
+    return wrapper
@@ -0,0 +1,28 @@
+"""
+Entity versions (``school_project.versions``) bumped by this app's models.
+
+``course`` and ``student`` stamps also change with the enrollments of the course or
+student, so anything built from "what is this student enrolled in" depends on
+``("student", pk)``. A student's task submissions change the student's stamp as well, but
+not the task's, so that one submission does not invalidate every student's task list.
+"""
+
+from django.dispatch import receiver
+
+from school_project.versions import bump, track
+
+from .models import Course, Enrollment, Student, Task, TaskSubmission
+from .signals import enrollments_changed
+
+
+track(Course, ("course", "pk"))
+track(Student, ("student", "pk"))
+track(Enrollment, ("enrollment", "pk"), ("student", "student_id"), ("course", "course_id"))
+track(Task, ("task", "pk"), ("course", "course_id"))
+track(TaskSubmission, ("task_submission", "pk"), ("student", "student_id"))
+
+
+@receiver(enrollments_changed, dispatch_uid="entity-versions-enrollments-changed")
+def _enrollments_changed(sender, student_ids, course_ids, **kwargs):
+    # Bulk enrollment writes with bulk_create, which sends no per-row signals.
+    bump(*[("student", pk) for pk in student_ids], *[("course", pk) for pk in course_ids])
@@ -0,0 +1,31 @@
+"""
+Delete expired ``Idempotency-Key`` records (``schoolapp.idempotency``).
+
+    python manage.py purge_idempotency_keys --batch-size 5000
+
+Run it from cron or a scheduler, e.g. hourly. Rows go in batches of primary keys so that
+no single statement holds locks on a large part of the table.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from schoolapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records whose replay window has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows deleted per statement.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+        deleted = 0
+        while True:
+            batch = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys.")
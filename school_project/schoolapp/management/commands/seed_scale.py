@@ -0,0 +1,408 @@
+"""
+Generate a large, reproducible school for benchmarks and query-plan checks.
+
+    python manage.py seed_scale L --seed 42 --flush
+
+The same size and seed always produce the same rows on an empty database. Rows are
+written with chunked ``bulk_create`` (``StudentAnswer.selected_answers`` through rows
+included), one transaction per phase, so memory stays flat even at XL.
+"""
+
+import random
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from nazoratapp.models import Nazorat
+from schoolapp.models import Course, Enrollment, Student, Task, TaskSubmission, Teacher
+from testapp.models import Answer, EnrollmentTest, Question, StudentAnswer, Test, TestAttempt
+
+
+@dataclass(frozen=True)
+class Scale:
+    students: int
+    teachers: int
+    courses: int
+    tests: int
+    attempts: int
+    questions_per_test: int = 10
+    courses_per_student: tuple = (3, 6)
+    tasks_per_course: tuple = (3, 8)
+
+
+# StudentAnswer rows are roughly attempts * questions_per_test.
+SCALES = {
+    "XS": Scale(students=60, teachers=4, courses=8, tests=12, attempts=150, questions_per_test=5),
+    "S": Scale(students=1_000, teachers=20, courses=40, tests=100, attempts=5_000),
+    "M": Scale(students=10_000, teachers=100, courses=200, tests=500, attempts=25_000),
+    "L": Scale(students=30_000, teachers=300, courses=600, tests=1_500, attempts=100_000),
+    "XL": Scale(students=100_000, teachers=1_000, courses=2_000, tests=5_000, attempts=500_000),
+}
+
+FIRST_NAMES = [
+    "Ali", "Vali", "Aziz", "Bobur", "Jasur", "Sardor", "Otabek", "Sherzod", "Javlon", "Ulug'bek",
+    "Laylo", "Madina", "Nilufar", "Dilnoza", "Gulnora", "Malika", "Sevara", "Zarina", "Shahnoza", "Kamola",
+]
+LAST_NAMES = [
+    "Karimov", "Rahimov", "Aliyev", "Valiyev", "Yusupov", "Tursunov", "Qodirov", "Saidov", "Ergashev", "Nazarov",
+]
+FACULTIES = ["Matematika", "Fizika", "Informatika", "Kimyo", "Biologiya", "Iqtisodiyot"]
+SUBJECTS = ["Algebra", "Geometriya", "Mexanika", "Dasturlash", "Statistika", "Organik kimyo", "Genetika", "Makroiqtisod"]
+# Probability of each question type, written answers get the remainder.
+QUESTION_TYPES = [("OC", 0.5), ("MC", 0.3), ("WR", 0.2)]
+# A pre-hashed unusable password: hashing 100k real passwords would dominate the run.
+UNUSABLE_PASSWORD = "!seed_scale"
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic S/M/L/XL school dataset for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("size", choices=list(SCALES), help="Dataset size.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (default 42).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT statement.")
+        parser.add_argument(
+            "--flush", action="store_true", help="Empty the whole database first (manage.py flush)."
+        )
+
+    def handle(self, *args, **options):
+        if options["flush"]:
+            call_command("flush", interactive=False, verbosity=0)
+        elif Student.objects.exists() or Course.objects.exists():
+            raise CommandError("The database already has students or courses; rerun with --flush.")
+
+        seeder = ScaleSeeder(
+            SCALES[options["size"]],
+            random.Random(options["seed"]),
+            batch_size=options["batch_size"],
+            log=self.stdout.write if options["verbosity"] else (lambda message: None),
+        )
+        started = time.perf_counter()
+        seeder.run()
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Seeded size {options['size']} (seed {options['seed']}) in {time.perf_counter() - started:.1f}s"
+            ))
+
+
+class ScaleSeeder:
+    def __init__(self, scale, rng, batch_size=5000, log=print):
+        self.scale = scale
+        self.rng = rng
+        self.batch_size = batch_size
+        self.log = log
+        self.now = timezone.now()
+        self.course_teacher = {}
+        self.course_students = {}
+        self.teacher_courses = {}
+        self.student_ability = {}
+
+    def run(self):
+        for phase in (
+            self.seed_teachers,
+            self.seed_students,
+            self.seed_courses,
+            self.seed_enrollments,
+            self.seed_tasks,
+            self.seed_tests,
+            self.seed_attempts,
+            self.seed_nazorats,
+        ):
+            started = time.perf_counter()
+            with transaction.atomic():
+                rows = phase()
+            self.log(f"{phase.__name__[5:]:<12} {rows:>10,} rows  {time.perf_counter() - started:6.1f}s")
+
+    # --- helpers ------------------------------------------------------------
+
+    def insert(self, model, objs):
+        """bulk_create that always leaves primary keys on ``objs``."""
+        if not objs:
+            return objs
+        if connection.features.can_return_rows_from_bulk_insert:
+            return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+        # Single writer inside a transaction: new ids are the ones above the old maximum.
+        before = model.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        ids = model.objects.filter(pk__gt=before).order_by("pk").values_list("pk", flat=True)
+        for obj, pk in zip(objs, ids):
+            obj.pk = pk
+        return objs
+
+    def chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def person(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def users(self, prefix, indexes):
+        return self.insert(User, [
+            User(username=f"{prefix}_{index}", password=UNUSABLE_PASSWORD, email=f"{prefix}_{index}@seed.local")
+            for index in indexes
+        ])
+
+    # --- phases -------------------------------------------------------------
+
+    def seed_teachers(self):
+        users = self.users("seed_teacher", range(self.scale.teachers))
+        teachers = []
+        for user in users:
+            name, last_name = self.person()
+            teachers.append(Teacher(
+                user_id=user.pk, name=name, last_name=last_name, email=user.email,
+                specialization=self.rng.choice(SUBJECTS),
+            ))
+        self.teacher_ids = [teacher.pk for teacher in self.insert(Teacher, teachers)]
+        return len(self.teacher_ids) * 2
+
+    def seed_students(self):
+        self.student_ids = []
+        for indexes in self.chunks(self.scale.students):
+            users = self.users("seed_student", indexes)
+            students = []
+            for user in users:
+                name, last_name = self.person()
+                students.append(Student(
+                    user_id=user.pk, name=name, last_name=last_name, email=user.email,
+                    gender=self.rng.choice(("male", "female")),
+                    faculty=self.rng.choice(FACULTIES),
+                    course_year=str(self.rng.randint(1, 4)),
+                    semester=str(self.rng.randint(1, 2)),
+                ))
+            for student in self.insert(Student, students):
+                self.student_ids.append(student.pk)
+                # Chance of answering a question correctly; drives attempt scores.
+                self.student_ability[student.pk] = min(0.98, max(0.05, self.rng.gauss(0.65, 0.18)))
+        return len(self.student_ids) * 2
+
+    def seed_courses(self):
+        courses = [
+            Course(
+                title=f"{self.rng.choice(SUBJECTS)} {index + 1}",
+                teacher_id=self.rng.choice(self.teacher_ids),
+                schedule={"days": sorted(self.rng.sample(range(6), 3)), "time": f"{self.rng.randint(8, 16)}:00"},
+            )
+            for index in range(self.scale.courses)
+        ]
+        for course in self.insert(Course, courses):
+            self.course_teacher[course.pk] = course.teacher_id
+            self.course_students[course.pk] = []
+            self.teacher_courses.setdefault(course.teacher_id, []).append(course.pk)
+        return len(courses)
+
+    def seed_enrollments(self):
+        # Zipf-like popularity: a few large lecture courses, a long tail of small ones.
+        course_ids = list(self.course_teacher)
+        weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(course_ids))))
+        low, high = self.scale.courses_per_student
+        rows = 0
+        batch = []
+        for student_id in self.student_ids:
+            wanted = min(self.rng.randint(low, high), len(course_ids))
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.add(course_ids[bisect_left(weights, self.rng.random() * weights[-1])])
+            for course_id in sorted(chosen):
+                self.course_students[course_id].append(student_id)
+                batch.append(Enrollment(student_id=student_id, course_id=course_id))
+            if len(batch) >= self.batch_size:
+                rows += len(Enrollment.objects.bulk_create(batch, batch_size=self.batch_size))
+                batch = []
+        rows += len(Enrollment.objects.bulk_create(batch, batch_size=self.batch_size))
+        return rows
+
+    def seed_tasks(self):
+        low, high = self.scale.tasks_per_course
+        tasks = [
+            Task(
+                title=f"Topshiriq {number + 1}",
+                description="Seeded task",
+                teacher_id=teacher_id,
+                course_id=course_id,
+                max_score=100,
+                due_date=date(2026, 1, 15) + timedelta(days=self.rng.randint(0, 120)),
+            )
+            for course_id, teacher_id in self.course_teacher.items()
+            for number in range(self.rng.randint(low, high))
+        ]
+        self.insert(Task, tasks)
+
+        rows = len(tasks)
+        batch = []
+        for task in tasks:
+            for student_id in self.course_students[task.course_id]:
+                if self.rng.random() >= 0.7:
+                    continue
+                graded = self.rng.random() < 0.6
+                batch.append(TaskSubmission(
+                    task_id=task.pk, student_id=student_id, teacher_id=task.teacher_id,
+                    submitted_text="Seeded answer",
+                    is_done=self.rng.random() < 0.9,
+                    score=round(self.rng.triangular(30, 100, 80)) if graded else None,
+                ))
+            if len(batch) >= self.batch_size:
+                rows += len(TaskSubmission.objects.bulk_create(batch, batch_size=self.batch_size))
+                batch = []
+        rows += len(TaskSubmission.objects.bulk_create(batch, batch_size=self.batch_size))
+        return rows
+
+    def seed_tests(self):
+        statuses = [Test.STATUS_PUBLISHED] * 16 + [Test.STATUS_DRAFT] * 3 + [Test.STATUS_ARCHIVED]
+        teachers_with_courses = sorted(self.teacher_courses)
+        tests = self.insert(Test, [
+            Test(
+                title=f"Test {index + 1}",
+                teacher_id=self.rng.choice(teachers_with_courses),
+                status=self.rng.choice(statuses),
+                time_limit_sec=self.rng.choice((900, 1800, 2700, 3600)),
+            )
+            for index in range(self.scale.tests)
+        ])
+
+        questions = []
+        for test in tests:
+            for number in range(self.scale.questions_per_test):
+                roll, question_type = self.rng.random(), "WR"
+                for candidate, probability in QUESTION_TYPES:
+                    if roll < probability:
+                        question_type = candidate
+                        break
+                    roll -= probability
+                questions.append(Question(
+                    test_id=test.pk, text=f"Savol {number + 1}", question_type=question_type,
+                    mark=self.rng.choice((1, 1, 2, 3)),
+                ))
+        self.insert(Question, questions)
+
+        answers = []
+        for question in questions:
+            if question.question_type == "WR":
+                answers.append(Answer(question_id=question.pk, text=str(self.rng.randint(1, 500)), is_correct=True))
+                continue
+            correct = {0} if question.question_type == "OC" else set(self.rng.sample(range(4), 2))
+            answers.extend(
+                Answer(question_id=question.pk, text=f"Variant {option + 1}", is_correct=option in correct)
+                for option in range(4)
+            )
+        self.insert(Answer, answers)
+
+        # Answer key per test, kept for generating attempts.
+        options = {}
+        for answer in answers:
+            options.setdefault(answer.question_id, []).append(answer)
+        self.test_questions = {}
+        for question in questions:
+            self.test_questions.setdefault(question.test_id, []).append((question, options[question.pk]))
+
+        self.assignments = []
+        enrollment_tests = []
+        for test in tests:
+            if test.status != Test.STATUS_PUBLISHED:
+                continue
+            courses = self.teacher_courses[test.teacher_id]
+            for course_id in self.rng.sample(courses, min(len(courses), self.rng.randint(1, 2))):
+                self.assignments.append((test, course_id))
+                enrollment_tests.append(EnrollmentTest(
+                    teacher_id=test.teacher_id, test_id=test.pk, course_id=course_id,
+                    attempt_count=self.rng.choice((1, 2, 3)),
+                ))
+        EnrollmentTest.objects.bulk_create(enrollment_tests, batch_size=self.batch_size)
+        return len(tests) + len(questions) + len(answers) + len(enrollment_tests)
+
+    def seed_attempts(self):
+        assignments = [item for item in self.assignments if self.course_students[item[1]]]
+        if not assignments:
+            return 0
+        through = StudentAnswer.selected_answers.through
+        attempts_per_chunk = max(1, self.batch_size // self.scale.questions_per_test)
+        rows = 0
+
+        for start in range(0, self.scale.attempts, attempts_per_chunk):
+            planned = []
+            for _ in range(min(attempts_per_chunk, self.scale.attempts - start)):
+                test, course_id = self.rng.choice(assignments)
+                student_id = self.rng.choice(self.course_students[course_id])
+                planned.append(self.plan_attempt(test, student_id))
+
+            attempts = [attempt for attempt, _ in planned]
+            # started_at is auto_now_add, which bulk_create overwrites: put the planned times back.
+            started = [attempt.started_at for attempt in attempts]
+            self.insert(TestAttempt, attempts)
+            for attempt, started_at in zip(attempts, started):
+                attempt.started_at = started_at
+            TestAttempt.objects.bulk_update(attempts, ["started_at"], batch_size=self.batch_size)
+            student_answers, selections = [], []
+            for attempt, answers in planned:
+                for answer, selected in answers:
+                    answer.attempt_id = attempt.pk
+                    student_answers.append(answer)
+                    selections.append(selected)
+            self.insert(StudentAnswer, student_answers)
+            links = [
+                through(studentanswer_id=answer.pk, answer_id=option_id)
+                for answer, selected in zip(student_answers, selections)
+                for option_id in selected
+            ]
+            through.objects.bulk_create(links, batch_size=self.batch_size)
+            rows += len(attempts) + len(student_answers) + len(links)
+        return rows
+
+    def plan_attempt(self, test, student_id):
+        ability = self.student_ability[student_id]
+        completed = self.rng.random() < 0.9
+        answers, score, max_score = [], 0.0, 0.0
+        for question, options in self.test_questions[test.pk]:
+            max_score += question.mark
+            if self.rng.random() < 0.05:
+                continue  # skipped question
+            correct = self.rng.random() < ability
+            right = [option.pk for option in options if option.is_correct]
+            wrong = [option.pk for option in options if not option.is_correct]
+            if question.question_type == "WR":
+                selected, written = [], options[0].text if correct else str(self.rng.randint(501, 999))
+            else:
+                selected, written = (right if correct else [self.rng.choice(wrong)]), None
+            mark = question.mark if correct and completed else 0.0
+            score += mark
+            answers.append((
+                StudentAnswer(question_id=question.pk, written_answer=written, scored_mark=mark),
+                selected,
+            ))
+
+        time_limit = timedelta(seconds=test.time_limit_sec)
+        if completed:
+            # Started in the last 30 days, early enough to have ended by now.
+            started_at = self.now - timedelta(seconds=self.rng.randint(test.time_limit_sec, 30 * 86400))
+        else:
+            # Open attempts started within two time limits: about half are running, half are
+            # past their deadline and waiting for manage.py expire_attempts.
+            started_at = self.now - timedelta(seconds=self.rng.randint(0, 2 * test.time_limit_sec))
+        attempt = TestAttempt(
+            test_id=test.pk, student_id=student_id, started_at=started_at, deadline_at=started_at + time_limit
+        )
+        if completed:
+            attempt.completed_at = started_at + timedelta(seconds=self.rng.randint(300, test.time_limit_sec))
+            attempt.score = score
+            attempt.percentage = round(score / max_score * 100, 2) if max_score else 0
+        return attempt, answers
+
+    def seed_nazorats(self):
+        nazorats = [
+            Nazorat(
+                course_id=course_id, title="Oraliq nazorat", source_type="test", source_id=test.pk,
+                max_score=100,
+            )
+            for test, course_id in self.assignments[: self.scale.courses]
+        ]
+        Nazorat.objects.bulk_create(nazorats, batch_size=self.batch_size)
+        return len(nazorats)
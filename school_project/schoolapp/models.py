@@ -1,11 +1,9 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
 from django.contrib.auth.models import User
 from phonenumber_field.modelfields import PhoneNumberField
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
 
 
 class Department(models.Model):
@@ -369,6 +367,27 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student} in {self.course}"
 
+class TaskQuerySet(models.QuerySet):
+    def for_student(self, student):
+        """
+        Tasks from the student's courses with the student's own submission projected onto
+        each row (``has_submission``, ``submission_id``, ``submission_score``,
+        ``submission_is_done``, ``submitted_at``), so listing them is a single query.
+        """
+        submissions = TaskSubmission.objects.filter(task=OuterRef('pk'), student=student)
+        return (
+            self.filter(course_id__in=Enrollment.objects.filter(student=student).values('course_id'))
+            .select_related('course', 'teacher')
+            .annotate(
+                has_submission=Exists(submissions),
+                submission_id=Subquery(submissions.values('id')[:1]),
+                submission_score=Subquery(submissions.values('score')[:1]),
+                submission_is_done=Subquery(submissions.values('is_done')[:1]),
+                submitted_at=Subquery(submissions.values('submitted_at')[:1]),
+            )
+        )
+
+
 class Task(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -380,7 +399,9 @@ class Task(models.Model):
     due_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.title}"
 
@@ -401,3 +422,30 @@ class TaskSubmission(models.Model):
 
     def __str__(self):
         return f"Submission: {self.student.name} → {self.task.title}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's ``Idempotency-Key`` and the response its first request got, replayed to retries
+    (``schoolapp.idempotency``). ``manage.py purge_idempotency_keys`` deletes expired rows.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # sha256 of the method, path and body: a key names one request.
+    fingerprint = models.CharField(max_length=64)
+    # Null while the first request is still running.
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # The rendered response body, zlib-compressed.
+    body = models.BinaryField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='schoolapp_idempotencykey_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
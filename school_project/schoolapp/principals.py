@@ -0,0 +1,148 @@
+"""
+Principal cache behind ``schoolapp.authentication.CachedTokenAuthentication``.
+
+A principal is everything authentication and the role checks need: the token, the user
+(without the password hash) and the user's teacher and student profiles. It is resolved
+with one query on a miss and kept in the tiered cache (``school_project.cache``): in
+process memory for ``PRINCIPAL_CACHE_LOCAL_TTL`` seconds and in the shared cache for
+``PRINCIPAL_CACHE_TTL`` seconds, so a warm token request runs no authentication queries.
+
+The user built from the cache has both reverse one-to-one caches filled, including
+"no profile". ``request.user.teacher_profile``, ``hasattr(user, "student_profile")``,
+``IsTeacher`` and ``get_teacher_profile_or_403`` therefore never query again within the
+request, however often they are called.
+
+Entries are dropped when the token is saved or deleted, when the user logs out and when
+the user or one of its profiles is saved or deleted. The shared entry goes at once; other
+processes may keep their in-memory copy for up to the local TTL. When the "shared" cache is
+per process (``locmem://`` with several workers) a delete cannot reach the others, and
+entries live only ``CACHE_PROCESS_LOCAL_TTL`` seconds instead.
+"""
+
+import hashlib
+
+from django.contrib.auth import user_logged_out
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from school_project.cache import namespace
+
+from .models import Student, Teacher
+
+
+LOCAL_MAX_ENTRIES = 10_000
+# Loaded on demand from the database; never cached.
+USER_EXCLUDED_FIELDS = ("password",)
+
+
+def _concrete_values(instance, exclude=()):
+    # get_prep_value gives what the database would return (file names, phone strings).
+    return {
+        field.attname: field.get_prep_value(getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def loaded_instance(model, **values):
+    """An instance as if loaded with ``.only(*values)``; other fields load on first access."""
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def attach_profiles(user, teacher, student):
+    """Fill both reverse one-to-one caches of ``user``; ``None`` caches "no profile"."""
+    for accessor, profile in (("teacher_profile", teacher), ("student_profile", student)):
+        if profile is not None:
+            type(profile).user.field.set_cached_value(profile, user)
+        User._meta.get_field(accessor).set_cached_value(user, profile)
+    return user
+
+
+class PrincipalCache:
+    """Principal entries in the ``principal`` namespace of ``school_project.cache``."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.entries = namespace("principal", ttl=300, local_ttl=10, max_entries=max_entries)
+
+    @staticmethod
+    def cache_key(token_key):
+        # Token keys are credentials; keep them out of the shared cache's key space.
+        return hashlib.sha256(token_key.encode("utf-8")).hexdigest()[:40]
+
+    def get(self, token_key):
+        return self.entries.get(self.cache_key(token_key))
+
+    def set(self, token_key, entry):
+        self.entries.set(self.cache_key(token_key), entry)
+
+    def invalidate_token(self, token_key):
+        self.entries.delete(self.cache_key(token_key))
+
+    def invalidate_user(self, user_id):
+        for token_key in Token.objects.filter(user_id=user_id).values_list("key", flat=True):
+            self.invalidate_token(token_key)
+
+    def clear(self):
+        self.entries.clear_local()
+
+
+PRINCIPALS = PrincipalCache()
+
+
+def principal_entry(token):
+    """Cacheable values of a token loaded with ``user__teacher_profile`` and ``user__student_profile``."""
+    user = token.user
+    teacher = getattr(user, "teacher_profile", None)
+    student = getattr(user, "student_profile", None)
+    return {
+        "token": _concrete_values(token),
+        "user": _concrete_values(user, exclude=USER_EXCLUDED_FIELDS),
+        "teacher": _concrete_values(teacher) if teacher is not None else None,
+        "student": _concrete_values(student) if student is not None else None,
+    }
+
+
+def principal_from_entry(entry):
+    """Rebuild (user, token) with the profile caches filled so role checks do not query."""
+    user = loaded_instance(User, **entry["user"])
+    token = loaded_instance(Token, **entry["token"])
+    Token.user.field.set_cached_value(token, user)
+    attach_profiles(
+        user,
+        loaded_instance(Teacher, **entry["teacher"]) if entry["teacher"] is not None else None,
+        loaded_instance(Student, **entry["student"]) if entry["student"] is not None else None,
+    )
+    return user, token
+
+
+@receiver(post_save, sender=Token, dispatch_uid="principal-token-saved")
+@receiver(post_delete, sender=Token, dispatch_uid="principal-token-deleted")
+def _token_changed(sender, instance, **kwargs):
+    PRINCIPALS.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User, dispatch_uid="principal-user-saved")
+@receiver(post_delete, sender=User, dispatch_uid="principal-user-deleted")
+def _user_changed(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    PRINCIPALS.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Teacher, dispatch_uid="principal-teacher-saved")
+@receiver(post_delete, sender=Teacher, dispatch_uid="principal-teacher-deleted")
+@receiver(post_save, sender=Student, dispatch_uid="principal-student-saved")
+@receiver(post_delete, sender=Student, dispatch_uid="principal-student-deleted")
+def _profile_changed(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        PRINCIPALS.invalidate_user(instance.user_id)
+
+
+@receiver(user_logged_out, dispatch_uid="principal-logged-out")
+def _logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        PRINCIPALS.invalidate_user(user.pk)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from school_project.fieldsets import SparseFieldsetSerializerMixin
 from .models import Department, Classroom, Teacher, Student, Course, Enrollment, Task, TaskSubmission
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -11,37 +12,116 @@ class ClassroomSerializer(serializers.ModelSerializer):
         model = Classroom
         fields = '__all__'
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Teacher
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
-class StudentSerializer(serializers.ModelSerializer):
+class TeacherListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Teacher
+        fields = ['id', 'user', 'name', 'middle_name', 'last_name', 'specialization', 'is_active']
+
+class StudentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
-class CourseSerializer(serializers.ModelSerializer):
+class StudentListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Student
+        fields = ['id', 'user', 'name', 'middle_name', 'last_name', 'is_active']
+
+class CourseSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = '__all__'
+        expandable_fields = {'teacher': (TeacherListSerializer, {})}
+
+class CourseListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'teacher']
+        expandable_fields = {'teacher': (TeacherListSerializer, {})}
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.name', read_only=True)  # yoki student.name
     course_title = serializers.CharField(source='course.title', read_only=True)
 
     class Meta:
         model = Enrollment
         fields = ['id', 'student', 'student_name', 'course', 'course_title']
+        expandable_fields = {
+            'student': (StudentListSerializer, {}),
+            'course': (CourseListSerializer, {}),
+        }
+
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    """
+    Select students either by explicit ids or by a cohort filter
+    (faculty / course_year / semester), and the courses to (un)enroll them in.
+    """
+    course_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    student_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    faculty = serializers.CharField(required=False, allow_blank=False)
+    course_year = serializers.CharField(required=False, allow_blank=False)
+    semester = serializers.CharField(required=False, allow_blank=False)
+
+    FILTER_FIELDS = ('faculty', 'course_year', 'semester')
+
+    def validate(self, attrs):
+        has_ids = bool(attrs.get('student_ids'))
+        has_filter = any(attrs.get(field) for field in self.FILTER_FIELDS)
+        if has_ids == has_filter:
+            raise serializers.ValidationError(
+                "Provide either student_ids or a student filter (faculty, course_year, semester), not both."
+            )
+        attrs['course_ids'] = sorted(set(attrs['course_ids']))
+        if has_ids:
+            attrs['student_ids'] = sorted(set(attrs['student_ids']))
+        return attrs
+
+    def student_queryset(self):
+        data = self.validated_data
+        if data.get('student_ids'):
+            return Student.objects.filter(id__in=data['student_ids'])
+        filters = {field: data[field] for field in self.FILTER_FIELDS if data.get(field)}
+        return Student.objects.filter(**filters)
+
+class TaskSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    course_title = serializers.CharField(source='course.title', read_only=True, default=None)
+    teacher_name = serializers.StringRelatedField(source='teacher', read_only=True)
 
-class TaskSerializer(serializers.ModelSerializer):
-    student = StudentSerializer()
-    course = CourseSerializer()
     class Meta:
         model = Task
         fields = '__all__'
+        read_only_fields = ('teacher', 'created_at', 'updated_at')
+        expandable_fields = {'course': (CourseListSerializer, {})}
+
+
+class StudentTaskSerializer(TaskSerializer):
+    """
+    Read-only task row for the student task list, fed by ``Task.objects.for_student()``
+    annotations so the client does not have to fetch each submission separately.
+    """
+    submission_id = serializers.IntegerField(read_only=True)
+    submission_status = serializers.SerializerMethodField()
+    score = serializers.IntegerField(source='submission_score', read_only=True)
+    is_done = serializers.SerializerMethodField()
+    submitted_at = serializers.DateTimeField(read_only=True)
+
+    def get_submission_status(self, obj):
+        if not obj.has_submission:
+            return 'not_submitted'
+        if obj.submission_score is not None:
+            return 'graded'
+        return 'submitted'
+
+    def get_is_done(self, obj):
+        return bool(obj.submission_is_done)
 
 
 class StudentSubmissionSerializer(serializers.ModelSerializer):
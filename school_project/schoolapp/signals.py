@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent once per committed bulk enroll/unenroll batch instead of once per row,
+# with ``student_ids`` and ``course_ids`` describing the affected pairs.
+enrollments_changed = Signal()
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import os
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.exam_day import sign_init_data
+from testapp.models import StudentAnswer, TestAttempt
+
+from .principals import PRINCIPALS
+from .management.commands.seed_scale import SCALES
+from .models import Course, Enrollment, IdempotencyKey, Student, Task, TaskSubmission, Teacher
+from .signals import enrollments_changed
+from .views import TEACHER_STATS, TELEGRAM_LOGINS
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="teacher", password="x")
+        self.teacher = Teacher.objects.create(user=user, name="T", last_name="One", email="t@example.com")
+        self.courses = [
+            Course.objects.create(title=f"Course {i}", teacher=self.teacher, schedule={}) for i in range(2)
+        ]
+        self.students = [
+            Student.objects.create(name=f"S{i}", faculty="math" if i % 2 else "physics", semester="1")
+            for i in range(6)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_bulk_enroll_skips_existing_pairs(self):
+        Enrollment.objects.create(student=self.students[0], course=self.courses[0])
+        received = []
+        enrollments_changed.connect(lambda **kwargs: received.append(kwargs), weak=False, dispatch_uid="test-bulk")
+        self.addCleanup(enrollments_changed.disconnect, dispatch_uid="test-bulk")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("enrollment-bulk-enroll"),
+                {"student_ids": [s.id for s in self.students], "course_ids": [c.id for c in self.courses]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"requested": 12, "created": 11, "skipped": 1})
+        self.assertEqual(Enrollment.objects.count(), 12)
+        self.assertEqual(len(received), 1)
+
+    def test_bulk_enroll_by_filter_and_unenroll(self):
+        payload = {"faculty": "math", "course_ids": [self.courses[1].id]}
+        response = self.client.post(reverse("enrollment-bulk-enroll"), payload, format="json")
+        self.assertEqual(response.data["created"], 3)
+
+        response = self.client.post(reverse("enrollment-bulk-unenroll"), payload, format="json")
+        self.assertEqual(response.data, {"requested": 3, "deleted": 3, "skipped": 0})
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_bulk_enroll_rejects_foreign_courses(self):
+        other = Teacher.objects.create(name="O", last_name="Two", email="o@example.com")
+        course = Course.objects.create(title="Other", teacher=other, schedule={})
+        response = self.client.post(
+            reverse("enrollment-bulk-enroll"),
+            {"student_ids": [self.students[0].id], "course_ids": [course.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Enrollment.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="viewer", password="x"))
+        Student.objects.bulk_create([Student(name=f"S{i}") for i in range(5)])
+
+    def test_pages_follow_next_cursor_newest_first(self):
+        response = self.client.get(reverse("student-list"), {"page_size": 2, "include_count": 1})
+        self.assertEqual(response.data["count"], 5)
+        self.assertTrue(response.data["count_is_exact"])
+        first_page = [row["id"] for row in response.data["results"]]
+
+        response = self.client.get(response.data["next"])
+        second_page = [row["id"] for row in response.data["results"]]
+
+        self.assertEqual(len(first_page + second_page), 4)
+        self.assertEqual(first_page + second_page, sorted(first_page + second_page, reverse=True))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username="viewer", password="x")
+        self.client.force_authenticate(user)
+        self.teacher = Teacher.objects.create(user=user, name="T", last_name="One", email="t@example.com")
+        self.course = Course.objects.create(title="Algebra", teacher=self.teacher, schedule={})
+        self.student = Student.objects.create(name="Ali", last_name="Valiyev", faculty="math")
+        Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_list_uses_slim_representation(self):
+        response = self.client.get(reverse("student-list"))
+        self.assertEqual(
+            set(response.data["results"][0]),
+            {"id", "user", "name", "middle_name", "last_name", "is_active"},
+        )
+
+    def test_fields_limit_payload_and_columns(self):
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(reverse("student-list"), {"fields": "id,faculty"})
+        self.assertEqual(response.data["results"], [{"id": self.student.id, "faculty": "math"}])
+        self.assertNotIn("jshshir_code", queries.captured_queries[0]["sql"])
+
+    def test_expand_nests_related_objects_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("enrollment-list"), {"expand": "course"})
+        row = response.data["results"][0]
+        self.assertEqual(row["course"]["title"], "Algebra")
+        self.assertEqual(row["student_name"], "Ali")
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse("student-list"), {"fields": "id,nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+class StudentTaskListTests(TestCase):
+    def setUp(self):
+        teacher = Teacher.objects.create(name="T", last_name="One", email="t@example.com")
+        course = Course.objects.create(title="Algebra", teacher=teacher, schedule={})
+        user = User.objects.create_user(username="student", password="x")
+        self.student = Student.objects.create(user=user, name="Ali")
+        Enrollment.objects.create(student=self.student, course=course)
+        self.tasks = [
+            Task.objects.create(title=f"Task {i}", description="", teacher=teacher, course=course)
+            for i in range(3)
+        ]
+        TaskSubmission.objects.create(task=self.tasks[0], student=self.student, teacher=teacher, is_done=True, score=90)
+        TaskSubmission.objects.create(task=self.tasks[1], student=self.student, teacher=teacher, is_done=True)
+        Task.objects.create(title="Other course", description="", teacher=teacher)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_tasks_carry_submission_state_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("student_tasks"), HTTP_ACCEPT="application/json")
+
+        rows = {row["title"]: row for row in response.data}
+        self.assertEqual(set(rows), {"Task 0", "Task 1", "Task 2"})
+        self.assertEqual((rows["Task 0"]["submission_status"], rows["Task 0"]["score"]), ("graded", 90))
+        self.assertEqual(rows["Task 1"]["submission_status"], "submitted")
+        self.assertEqual(rows["Task 2"]["submission_status"], "not_submitted")
+        self.assertFalse(rows["Task 2"]["is_done"])
+        self.assertEqual(rows["Task 0"]["course_title"], "Algebra")
+
+    @override_settings(CACHE_SINGLE_PROCESS=True)
+    def test_unchanged_task_list_is_not_modified(self):
+        url = reverse("student_tasks")
+        etag = self.client.get(url, HTTP_ACCEPT="application/json")["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        TaskSubmission.objects.create(task=self.tasks[2], student=self.student, teacher=self.tasks[2].teacher)
+        response = self.client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(CACHE_SINGLE_PROCESS=True)
+class CourseStatsTests(TestCase):
+    def setUp(self):
+        TEACHER_STATS.clear()
+        user = User.objects.create_user(username="teacher", password="x")
+        teacher = Teacher.objects.create(user=user, name="T", last_name="One", email="t@example.com")
+        self.course = Course.objects.create(title="Algebra", teacher=teacher, schedule={})
+        tasks = [Task.objects.create(title=f"Task {i}", description="", teacher=teacher, course=self.course) for i in range(2)]
+        ali = Student.objects.create(name="Ali", last_name="V")
+        Student.objects.create(name="Laylo", last_name="K")
+        Enrollment.objects.create(student=ali, course=self.course)
+        self.graded = TaskSubmission.objects.create(task=tasks[0], student=ali, teacher=teacher, is_done=True, score=80)
+        TaskSubmission.objects.create(task=tasks[1], student=ali, teacher=teacher, is_done=False, score=60)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_course_stats_per_student(self):
+        response = self.client.get(reverse("course_stats"))
+        rows = {row["student"]: row for row in response.data["students"]}
+        self.assertEqual(response.data["tasks"], ["Task 0", "Task 1"])
+        self.assertEqual(rows["Ali V"]["tasks"], {"Task 0": 80, "Task 1": 60})
+        self.assertEqual((rows["Ali V"]["total_tasks"], rows["Ali V"]["submitted_tasks"]), (2, 1))
+        self.assertEqual(rows["Ali V"]["completion_rate"], 50.0)
+        self.assertEqual((rows["Laylo K"]["total_tasks"], rows["Laylo K"]["completion_rate"]), (0, 0))
+
+    def test_course_stats_table_only_counts_done_tasks(self):
+        response = self.client.get(reverse("teacher/course_stats_table", args=[self.course.id]))
+        (row,) = response.data["students"]
+        self.assertEqual(row["tasks"], {"Task 0": 80, "Task 1": None})
+        self.assertEqual((row["submitted_tasks"], row["completion_rate"], row["avg_score"]), (1, 50.0, 70.0))
+
+    def test_stats_refresh_when_a_grade_is_saved(self):
+        table_url = reverse("teacher/course_stats_table", args=[self.course.id])
+        self.client.get(reverse("course_stats"))
+        self.client.get(table_url)
+
+        self.graded.score = 95
+        self.graded.save()
+
+        rows = {row["student"]: row for row in self.client.get(reverse("course_stats")).data["students"]}
+        self.assertEqual(rows["Ali V"]["tasks"]["Task 0"], 95)
+        (row,) = self.client.get(table_url).data["students"]
+        self.assertEqual(row["tasks"]["Task 0"], 95)
+
+
+class SeedScaleTests(TestCase):
+    def _fingerprint(self):
+        return (
+            list(Student.objects.order_by("id").values_list("name", "last_name", "faculty")),
+            list(Enrollment.objects.order_by("id").values_list("student__user__username", "course__title")),
+            list(TestAttempt.objects.order_by("id").values_list("student__user__username", "test__title", "score")),
+            StudentAnswer.selected_answers.through.objects.count(),
+        )
+
+    def test_same_seed_gives_same_dataset(self):
+        call_command("seed_scale", "XS", seed=7, verbosity=0)
+        first = self._fingerprint()
+        self.assertEqual(Student.objects.count(), SCALES["XS"].students)
+        self.assertEqual(TestAttempt.objects.count(), SCALES["XS"].attempts)
+        self.assertGreater(StudentAnswer.objects.count(), SCALES["XS"].attempts)
+        # Attempts happened in the past: started, then completed by now.
+        self.assertFalse(TestAttempt.objects.filter(completed_at__lt=F("started_at")).exists())
+        self.assertFalse(TestAttempt.objects.filter(completed_at__gt=timezone.now()).exists())
+        open_attempts = TestAttempt.objects.filter(completed_at__isnull=True)
+        self.assertTrue(open_attempts.exists())
+        self.assertFalse(open_attempts.filter(deadline_at__isnull=True).exists())
+
+        with self.assertRaises(CommandError):
+            call_command("seed_scale", "XS", verbosity=0)
+
+        User.objects.filter(username__startswith="seed_").delete()
+        Course.objects.all().delete()
+        call_command("seed_scale", "XS", seed=7, verbosity=0)
+        self.assertEqual(self._fingerprint(), first)
+
+
+@mock.patch.dict(os.environ, {"TELEGRAM_BOT_TOKEN": "123:test-token"})
+class TelegramLoginTests(TestCase):
+    def setUp(self):
+        TELEGRAM_LOGINS.clear()
+
+    def test_signed_init_data_logs_in_as_student(self):
+        init_data = sign_init_data("123:test-token", 42)
+        response = APIClient().post(reverse("telegram_login"), {"initData": init_data}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["role"], "student")
+        self.assertTrue(Student.objects.filter(user__username="tg_42").exists())
+        self.assertEqual(AccessToken(response.data["access"])["student_id"], Student.objects.get().pk)
+
+    def test_repeat_logins_reuse_the_user_without_writes(self):
+        url = reverse("telegram_login")
+        init_data = sign_init_data("123:test-token", 42)
+        first = APIClient().post(url, {"initData": init_data}, format="json")
+
+        # The same initData again only looks up the token of the cached user.
+        with self.assertNumQueries(1):
+            replay = APIClient().post(url, {"initData": init_data}, format="json")
+        self.assertEqual((replay.data["token"], replay.data["role"]), (first.data["token"], "student"))
+        self.assertEqual(AccessToken(replay.data["access"])["student_id"], Student.objects.get().pk)
+
+        # A fresh initData for a known user is one read.
+        fresh = sign_init_data("123:test-token", 42, auth_date=time.time() - 5)
+        with self.assertNumQueries(1):
+            again = APIClient().post(url, {"initData": fresh}, format="json")
+        self.assertEqual(again.data["token"], first.data["token"])
+        self.assertEqual(again.data["role"], "student")
+
+    def test_replayed_init_data_never_returns_a_revoked_token(self):
+        url = reverse("telegram_login")
+        init_data = sign_init_data("123:test-token", 42)
+        first = APIClient().post(url, {"initData": init_data}, format="json")
+
+        Token.objects.filter(key=first.data["token"]).delete()
+
+        replay = APIClient().post(url, {"initData": init_data}, format="json")
+        self.assertEqual(replay.status_code, 200)
+        self.assertNotEqual(replay.data["token"], first.data["token"])
+        self.assertEqual(Token.objects.get().key, replay.data["token"])
+
+    def test_tampered_init_data_is_rejected(self):
+        init_data = sign_init_data("123:other-token", 42)
+        response = APIClient().post(reverse("telegram_login"), {"initData": init_data}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="student", password="x")
+        self.student = Student.objects.create(user=self.user, name="S", last_name="One")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        PRINCIPALS.clear()
+        self.addCleanup(PRINCIPALS.clear)
+
+    def test_warm_requests_run_no_auth_queries(self):
+        url = reverse("api_protected")
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Role checks and profile access come from the cached principal as well.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("testapp:api_v1_student_tests"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse("teacher_tasks")).status_code, 403)
+
+    def test_profile_change_and_token_deletion_invalidate(self):
+        url = reverse("course_stats")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        Teacher.objects.create(user=self.user, name="T", last_name="One", email="t@example.com")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.token.delete()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_logout_drops_the_entry(self):
+        self.client.get(reverse("api_protected"))
+        self.assertIsNotNone(PRINCIPALS.get(self.token.key))
+
+        self.client.post(reverse("logout"))
+
+        PRINCIPALS.clear()
+        self.assertIsNone(PRINCIPALS.get(self.token.key))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class JWTClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="student", password="pass-123")
+        self.student = Student.objects.create(user=self.user, name="S", last_name="One")
+
+    def login(self):
+        response = APIClient().post(
+            reverse("login"), {"username": "student", "password": "pass-123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_login_issues_tokens_with_role_claims(self):
+        data = self.login()
+
+        self.assertEqual(data["role"], "student")
+        claims = AccessToken(data["access"])
+        self.assertEqual(claims["user_id"], str(self.user.pk))
+        self.assertEqual(claims["student_id"], self.student.pk)
+        self.assertIsNone(claims["teacher_id"])
+
+        refreshed = APIClient().post(reverse("token_refresh"), {"refresh": data["refresh"]}, format="json")
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(AccessToken(refreshed.data["access"])["role"], "student")
+
+    def test_requests_read_profiles_from_claims(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+
+        # Only the view's own query: no user, token or profile lookups.
+        with self.assertNumQueries(1):
+            response = client.get(reverse("testapp:api_v1_student_tests"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(reverse("teacher_tasks")).status_code, 403)
+
+
+class PurgeIdempotencyKeysTests(TestCase):
+    def test_deletes_expired_keys_in_batches(self):
+        user = User.objects.create_user(username="student", password="x")
+        now = timezone.now()
+        for index in range(3):
+            IdempotencyKey.objects.create(user=user, key=f"old-{index}", fingerprint="f", expires_at=now)
+        IdempotencyKey.objects.create(user=user, key="live", fingerprint="f", expires_at=now + timedelta(hours=1))
+
+        output = StringIO()
+        call_command("purge_idempotency_keys", "--batch-size", "2", stdout=output)
+
+        self.assertIn("Deleted 3 expired idempotency keys.", output.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["live"])
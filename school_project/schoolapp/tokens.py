@@ -0,0 +1,53 @@
+"""
+JWT access and refresh tokens that carry the user's role and profile ids.
+
+``ClaimsJWTAuthentication`` rebuilds ``request.user`` and its profiles from these claims,
+so requests authenticated with a JWT need no database lookup. Claims are fixed when the
+refresh token is issued: a role change shows up after the next login, and a deactivated
+user keeps access until the current access token expires.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+ROLE_CLAIM = "role"
+USERNAME_CLAIM = "username"
+STAFF_CLAIM = "is_staff"
+TEACHER_CLAIM = "teacher_id"
+STUDENT_CLAIM = "student_id"
+
+
+def user_role(user):
+    """``"teacher"``, ``"student"`` or ``None``; teacher wins when a user has both profiles."""
+    if getattr(user, "teacher_profile", None) is not None:
+        return "teacher"
+    if getattr(user, "student_profile", None) is not None:
+        return "student"
+    return None
+
+
+class RoleRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        teacher = getattr(user, "teacher_profile", None)
+        student = getattr(user, "student_profile", None)
+        token[USERNAME_CLAIM] = user.get_username()
+        token[STAFF_CLAIM] = user.is_staff
+        token[ROLE_CLAIM] = user_role(user)
+        token[TEACHER_CLAIM] = teacher.pk if teacher is not None else None
+        token[STUDENT_CLAIM] = student.pk if student is not None else None
+        return token
+
+
+def issue_tokens(user):
+    """Response fields for a fresh access/refresh pair; the access token copies every claim."""
+    refresh = RoleRefreshToken.for_user(user)
+    access = refresh.access_token
+    return {
+        "access": str(access),
+        "refresh": str(refresh),
+        "accessExpiresAt": datetime.fromtimestamp(access["exp"], tz=dt_timezone.utc).isoformat(),
+    }
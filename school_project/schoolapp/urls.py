@@ -55,7 +55,7 @@ urlpatterns = [
 
     # path('teacher/task-stats/', TaskStatsView.as_view(), name='teacher-task-stats'),
     path('course/<int:course_id>/tasks/', CourseView, name='course_tasks'),
-    path('teacher/course-stats/', CourseStatsView.as_view()),
+    path('teacher/course-stats/', CourseStatsView.as_view(), name='course_stats'),
     path('teacher/course-stats/<int:course_id>/', CourseStatsTableView.as_view(), name='teacher/course_stats_table'),
 
     path('teacher/task-stats/<int:pk>/', TaskStatsTableView.as_view(), name='task_stats_detail'),
@@ -6,7 +6,7 @@ from django.db.models import OuterRef, Subquery
 from django.db.models.functions import Coalesce
 from django.urls import reverse_lazy
 from urllib.parse import parse_qsl
-from rest_framework.renderers import TemplateHTMLRenderer, JSONRenderer
+from rest_framework.renderers import TemplateHTMLRenderer
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -17,20 +17,23 @@ import hashlib
 import hmac
 import time
 import os
+from functools import lru_cache
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
 
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.conf import settings
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from django.views.decorators.csrf import csrf_exempt
@@ -39,13 +42,22 @@ from django.utils import timezone
 
 from django.utils.decorators import method_decorator
 
+from school_project.cache import namespace
+from school_project.conditional import ConditionalGetMixin, Validators
+from school_project.db_routers import ReplicaReadMixin
+from school_project.fieldsets import SparseFieldsetViewMixin
+from school_project.renderers import FastJSONRenderer
+from school_project.versions import ANY, batched
+
 from .forms import StudentRegisterForm  # Make sure this exists
+from .signals import enrollments_changed
+from .tokens import issue_tokens, user_role
 from .permissions import IsStudent, IsTeacher, IsAuthenticated
 from .models import Department, Classroom, Teacher, Student, Course, Enrollment, Task, TaskSubmission
 from .serializers import (
     DepartmentSerializer, ClassroomSerializer,
-    TeacherSerializer, StudentSerializer,
-    CourseSerializer, EnrollmentSerializer, TaskSerializer, StudentSubmissionSerializer, TeacherSubmissionSerializer, StudentTaskStatsSerializer, 
+    TeacherSerializer, TeacherListSerializer, StudentSerializer, StudentListSerializer,
+    CourseSerializer, CourseListSerializer, EnrollmentSerializer, BulkEnrollmentSerializer, TaskSerializer, StudentTaskSerializer, StudentSubmissionSerializer, TeacherSubmissionSerializer, StudentTaskStatsSerializer, 
 )
 
 
@@ -92,24 +104,27 @@ class ClassroomViewSet(viewsets.ModelViewSet):
     queryset = Classroom.objects.all()
     serializer_class = ClassroomSerializer
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
+    list_serializer_class = TeacherListSerializer
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
+    list_serializer_class = StudentListSerializer
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    list_serializer_class = CourseListSerializer
 
 @method_decorator(csrf_exempt, name='dispatch')  # testing / HTML forms uchun
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [IsAuthenticated]
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [FastJSONRenderer]
 
     def perform_create(self, serializer):
         serializer.save()
@@ -117,10 +132,92 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    # Rows per INSERT statement for bulk enrollment.
+    BULK_BATCH_SIZE = 1000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_enroll(self, request):
+        """Enroll many students into many courses in one transaction; existing pairs are skipped."""
+        students, student_ids, course_ids = self._get_bulk_targets(request)
+        requested = len(student_ids) * len(course_ids)
+        pairs = Enrollment.objects.filter(student__in=students, course_id__in=course_ids)
+        students_per_chunk = max(1, self.BULK_BATCH_SIZE // len(course_ids))
+
+        with transaction.atomic():
+            existing = pairs.count()
+            for start in range(0, len(student_ids), students_per_chunk):
+                chunk = student_ids[start:start + students_per_chunk]
+                Enrollment.objects.bulk_create(
+                    [Enrollment(student_id=student_id, course_id=course_id) for student_id in chunk for course_id in course_ids],
+                    batch_size=self.BULK_BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
+            created = pairs.count() - existing
+            if created:
+                self._notify_enrollments_changed(student_ids, course_ids)
+
+        return Response(
+            {"requested": requested, "created": created, "skipped": requested - created},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk-unenroll')
+    def bulk_unenroll(self, request):
+        """Remove many student/course pairs at once; pairs that are not enrolled are skipped."""
+        students, student_ids, course_ids = self._get_bulk_targets(request)
+        requested = len(student_ids) * len(course_ids)
+
+        with transaction.atomic(), batched():
+            _, deleted_per_model = Enrollment.objects.filter(
+                student__in=students, course_id__in=course_ids
+            ).delete()
+            deleted = deleted_per_model.get(Enrollment._meta.label, 0)
+            if deleted:
+                self._notify_enrollments_changed(student_ids, course_ids)
+
+        return Response(
+            {"requested": requested, "deleted": deleted, "skipped": requested - deleted},
+            status=status.HTTP_200_OK,
+        )
+
+    def _get_bulk_targets(self, request):
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course_ids = serializer.validated_data['course_ids']
+
+        courses = Course.objects.filter(id__in=course_ids)
+        if not request.user.is_staff:
+            teacher = getattr(request.user, 'teacher_profile', None)
+            if teacher is None:
+                raise PermissionDenied("Only teachers can manage enrollments in bulk.")
+            courses = courses.filter(teacher=teacher)
+        found_course_ids = set(courses.values_list('id', flat=True))
+        missing_courses = [course_id for course_id in course_ids if course_id not in found_course_ids]
+        if missing_courses:
+            raise ValidationError({"course_ids": [f"Unknown courses or courses you do not teach: {missing_courses}"]})
+
+        students = serializer.student_queryset()
+        student_ids = list(students.order_by('id').values_list('id', flat=True))
+        requested_ids = serializer.validated_data.get('student_ids')
+        if requested_ids:
+            missing_students = sorted(set(requested_ids) - set(student_ids))
+            if missing_students:
+                raise ValidationError({"student_ids": [f"Unknown students: {missing_students}"]})
+
+        return students, student_ids, course_ids
+
+    def _notify_enrollments_changed(self, student_ids, course_ids):
+        # One notification per batch, fired only once the rows are committed.
+        transaction.on_commit(
+            lambda: enrollments_changed.send(
+                sender=Enrollment, student_ids=student_ids, course_ids=course_ids
+            )
+        )
+
 
 class RegisterStudentView(APIView):
     permission_classes = [AllowAny]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'accounts/register_student.html'
 
     def get(self, request):
@@ -164,7 +261,7 @@ def register_student(request):
 
 class RegisterTeacherView(APIView):
     permission_classes = [AllowAny]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'accounts/register_teacher.html'
 
     def get(self, request):
@@ -214,7 +311,8 @@ def register_teacher(request):
 
 
 class CustomLoginAPIView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    permission_classes = [AllowAny]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'accounts/login.html'
 
     def get(self, request):
@@ -257,10 +355,12 @@ class CustomLoginAPIView(APIView):
             if request.accepted_renderer.format == 'html':
                 return redirect(redirect_url)
 
-            # Agar API POST bo‘lsa, JSON qaytarish
+            # Agar API POST bo‘lsa, JSON qaytarish (session bilan birga JWT juftligi)
             return Response({
                 "detail": "Login successful",
-                "redirect_url": str(redirect_url)
+                "redirect_url": str(redirect_url),
+                "role": user_role(user),
+                **issue_tokens(user),
             }, status=status.HTTP_200_OK)
 
         return Response(
@@ -270,6 +370,22 @@ class CustomLoginAPIView(APIView):
         )
 
 
+@lru_cache(maxsize=4)
+def _telegram_secret_key(bot_token):
+    # Derived once per process per bot token instead of on every login.
+    return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=4)
+def _parse_teacher_ids(raw_value):
+    return frozenset(item.strip() for item in raw_value.split(",") if item.strip())
+
+
+# User ids of Telegram logins by initData hash, so a Mini App's repeated logins skip the
+# user and profile writes. Tokens are never cached: a revoked token must not come back.
+TELEGRAM_LOGINS = namespace("telegram_login", ttl=300, local_ttl=30, version=2)
+
+
 class TelegramWebAppLoginAPIView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
@@ -287,47 +403,79 @@ class TelegramWebAppLoginAPIView(APIView):
             return Response({"detail": "TELEGRAM_BOT_TOKEN is not configured."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
-            telegram_user = self._validate_init_data(init_data, bot_token, max_age)
+            telegram_user, provided_hash, auth_date = self._validate_init_data(init_data, bot_token, max_age)
         except ValueError as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_401_UNAUTHORIZED)
 
+        # Qayta yuborilgan (replay) initData: foydalanuvchi keshdan, token esa bazadan (bitta so'rov).
+        user_id = TELEGRAM_LOGINS.get(provided_hash)
+        if user_id is not None:
+            try:
+                token = (
+                    Token.objects.select_related("user__teacher_profile", "user__student_profile")
+                    .filter(user_id=user_id)
+                    .first()
+                )
+            except DatabaseError as exc:
+                return _database_error_response(exc)
+            if token is not None:
+                return Response(self._payload(token.user, token, user_role(token.user)), status=status.HTTP_200_OK)
+
         telegram_id = telegram_user["id"]
         username = f"tg_{telegram_id}"
         first_name = (telegram_user.get("first_name") or "").strip()
         last_name = (telegram_user.get("last_name") or "").strip()
 
         try:
-            user, created = User.objects.get_or_create(username=username)
-            if created:
+            # Takroriy kirish: user, profillar va token bitta so'rovda
+            user = (
+                User.objects.select_related("teacher_profile", "student_profile", "auth_token")
+                .filter(username=username)
+                .first()
+            )
+            if user is None:
+                user, _ = User.objects.get_or_create(
+                    username=username,
+                    defaults={
+                        "first_name": first_name,
+                        "last_name": last_name,
+                        "email": f"{username}@telegram.local",
+                        "password": make_password(None),
+                    },
+                )
+            changed_fields = []
+            if first_name and user.first_name != first_name:
                 user.first_name = first_name
+                changed_fields.append("first_name")
+            if last_name and user.last_name != last_name:
                 user.last_name = last_name
-                user.email = f"{username}@telegram.local"
-                user.set_unusable_password()
-                user.save(update_fields=["first_name", "last_name", "email", "password"])
-            else:
-                changed_fields = []
-                if first_name and user.first_name != first_name:
-                    user.first_name = first_name
-                    changed_fields.append("first_name")
-                if last_name and user.last_name != last_name:
-                    user.last_name = last_name
-                    changed_fields.append("last_name")
-                if changed_fields:
-                    user.save(update_fields=changed_fields)
+                changed_fields.append("last_name")
+            if changed_fields:
+                user.save(update_fields=changed_fields)
 
             role = self._ensure_role_profile(user, role_hint, first_name, last_name, telegram_id)
-            token, _ = Token.objects.get_or_create(user=user)
+            token = getattr(user, "auth_token", None)
+            if token is None:
+                token, _ = Token.objects.get_or_create(user=user)
         except DatabaseError as exc:
             return _database_error_response(exc)
 
-        return Response(
-            {
-                "token": token.key,
-                "role": role,
-                "expiresAt": (timezone.now() + timedelta(hours=8)).isoformat(),
-            },
-            status=status.HTTP_200_OK,
+        # Never cache past the moment the initData itself expires.
+        cache_ttl = min(
+            self._parse_cache_ttl(os.getenv("TELEGRAM_LOGIN_CACHE_SEC", "300")),
+            auth_date + max_age - int(time.time()),
         )
+        if cache_ttl > 0:
+            TELEGRAM_LOGINS.set(provided_hash, user.pk, cache_ttl)
+        return Response(self._payload(user, token, role), status=status.HTTP_200_OK)
+
+    def _payload(self, user, token, role):
+        return {
+            "token": token.key,
+            "role": role,
+            "expiresAt": (timezone.now() + timedelta(hours=8)).isoformat(),
+            **issue_tokens(user),
+        }
 
     def _ensure_role_profile(self, user, role_hint, first_name, last_name, telegram_id):
         student_name = self._fit_to_model(Student, "name", first_name or "Student")
@@ -335,7 +483,7 @@ class TelegramWebAppLoginAPIView(APIView):
         teacher_name = self._fit_to_model(Teacher, "name", first_name or "Teacher")
         teacher_last_name = self._fit_to_model(Teacher, "last_name", last_name or "User")
 
-        teacher_ids = self._parse_teacher_ids(os.getenv("TELEGRAM_TEACHER_IDS", ""))
+        teacher_ids = _parse_teacher_ids(os.getenv("TELEGRAM_TEACHER_IDS", ""))
         if str(telegram_id) in teacher_ids:
             if not hasattr(user, "teacher_profile"):
                 Teacher.objects.create(
@@ -368,8 +516,11 @@ class TelegramWebAppLoginAPIView(APIView):
             return text[:max_len]
         return text
 
-    def _parse_teacher_ids(self, raw_value):
-        return {item.strip() for item in raw_value.split(",") if item.strip()}
+    def _parse_cache_ttl(self, value):
+        try:
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            return 300
 
     def _parse_max_age(self, value):
         try:
@@ -398,7 +549,7 @@ class TelegramWebAppLoginAPIView(APIView):
             raise ValueError("initData expired.")
 
         data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(parts.items()))
-        secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+        secret_key = _telegram_secret_key(bot_token)
         calculated_hash = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
 
         if not hmac.compare_digest(calculated_hash, provided_hash):
@@ -416,7 +567,7 @@ class TelegramWebAppLoginAPIView(APIView):
         if not isinstance(user_data, dict) or "id" not in user_data:
             raise ValueError("user payload is invalid.")
 
-        return user_data
+        return user_data, provided_hash, auth_date
 
 
 
@@ -436,7 +587,7 @@ class CustomLogoutAPIView(APIView):
 
 class PostLoginRedirectAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'accounts/login.html'
 
     def get(self, request):
@@ -449,7 +600,7 @@ class PostLoginRedirectAPIView(APIView):
 
 class StudentProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'student_profile.html'
 
     def get(self, request):
@@ -470,7 +621,7 @@ class StudentProfileAPIView(APIView):
 
 class TeacherProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'accounts/teacher_profile.html'
 
     def get(self, request):
@@ -705,26 +856,27 @@ class FrontendMockDataAPIView(APIView):
 # Please place your form and script in a Django template (e.g., templates/accounts/register_student.html).
 
 class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all()
+    queryset = Task.objects.select_related('course', 'teacher')
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
 
-class StudentTasksListView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+class StudentTasksListView(ConditionalGetMixin, APIView):
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'student_tasks.html'
 
 
     permission_classes = [IsAuthenticated, IsStudent]
-    serializer_class = TaskSerializer
+    serializer_class = StudentTaskSerializer
+
+    def get_validators(self, request, *args, **kwargs):
+        # Enrollments and the student's submissions bump the student, task edits any task.
+        return Validators([("student", request.user.student_profile.pk), ("task", ANY)])
 
     def get(self, request, *args, **kwargs):
         student = request.user.student_profile
 
-        # Studentning barcha kurslari
-        course_ids = student.enrollments.values_list('course_id', flat=True)
-
-        # Faqat shu kurslarga tegishli topshiriqlar
-        course_tasks = Task.objects.filter(course_id__in=course_ids)
+        # Studentning kurslaridagi topshiriqlar, topshiriq holati bilan bitta so'rovda
+        course_tasks = Task.objects.for_student(student).order_by('id')
 
         serializer = self.serializer_class(course_tasks, many=True)
 
@@ -737,15 +889,14 @@ class StudentTasksListView(APIView):
 
 
 class StudentTasksView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'student_task_detail.html'
     permission_classes = [IsAuthenticated, IsStudent]
-    serializer_class = TaskSerializer
+    serializer_class = StudentTaskSerializer
 
     def get(self, request, pk=None, *args, **kwargs):
         student = request.user.student_profile
-        course_ids = student.enrollments.values_list('course_id', flat=True)
-        course_tasks = Task.objects.filter(course_id__in=course_ids)
+        course_tasks = Task.objects.for_student(student).order_by('id')
 
         if pk:
             task = course_tasks.filter(id=pk).first()
@@ -770,15 +921,15 @@ class CourseTasksView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, course_id):
-        course = get_object_or_404(course, id=course_id)
-        tasks = course.tasks.all()
+        course = get_object_or_404(Course, id=course_id)
+        tasks = Task.objects.filter(course=course).select_related('course', 'teacher').order_by('id')
         serializer = TaskSerializer(tasks, many=True)
         return Response(serializer.data)
     
 
 
 class SubmitTaskView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'submit_task.html'
     permission_classes = [IsAuthenticated, IsStudent]
     serializer_class = StudentSubmissionSerializer
@@ -824,30 +975,33 @@ class SubmitTaskView(APIView):
         return Response({"message": "Task submitted successfully."})
 
 class TeacherTaskViewSet(viewsets.ModelViewSet):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher_tasks.html'
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated, IsTeacher]
 
     def get_queryset(self):
-        queryset = Task.objects.filter(teacher__user=self.request.user)
+        queryset = Task.objects.filter(teacher__user=self.request.user).select_related('course', 'teacher')
         pk = self.kwargs.get('pk')
         if pk:
             return queryset.filter(pk=pk)
         return queryset
 
+    def perform_create(self, serializer):
+        serializer.save(teacher=self.request.user.teacher_profile)
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
 
         if request.accepted_renderer.format == 'html':
             return Response({'tasks': serializer.data}, template_name=self.template_name)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 # Teacher Submissions List + Create
 class TeacherSubmitListCreateView(ListCreateAPIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher_submissions.html'
     serializer_class = TeacherSubmissionSerializer
     permission_classes = [IsAuthenticated, IsTeacher]
@@ -856,17 +1010,17 @@ class TeacherSubmitListCreateView(ListCreateAPIView):
         return TaskSubmission.objects.filter(task__teacher__user=self.request.user)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
 
         if request.accepted_renderer.format == 'html':
             return Response({'submissions': serializer.data}, template_name=self.template_name)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 # Teacher Submission Detail / Update / Delete
 class TeacherSubmitRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher_submission_detail.html'
     serializer_class = TeacherSubmissionSerializer
     permission_classes = [IsAuthenticated, IsTeacher]
@@ -911,14 +1065,14 @@ class TeacherSubmitRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
+from rest_framework.renderers import TemplateHTMLRenderer
 from django.shortcuts import get_object_or_404
 from django.db.models import Avg
 from rest_framework.permissions import IsAuthenticated
 
-class TaskStatsTableView(APIView):
+class TaskStatsTableView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated, IsTeacher]
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher/task_stats_table.html'
 
     def get(self, request, pk):
@@ -946,7 +1100,7 @@ class TaskStatsTableView(APIView):
         avg_score = submissions.aggregate(Avg('score'))['score__avg']
 
         context = {
-            'task': task,
+            'task': task if request.accepted_renderer.format == 'html' else {'id': task.id, 'title': task.title},
             'submissions': student_data,
             'total_students': total_students,
             'submitted_count': submitted_count,
@@ -961,41 +1115,64 @@ class TaskStatsTableView(APIView):
 
 
 
-from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
+from rest_framework.renderers import TemplateHTMLRenderer
 from django.db.models import Avg
 
-class CourseStatsView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+# Teacher statistics, recomputed by one request at a time (STATS_CACHE_TTL in settings).
+TEACHER_STATS = namespace("teacher_stats", ttl=30, local_ttl=5, stale_ttl=60)
+# Any task, grade or enrollment change (student stamps also move with bulk enrollments and
+# with the student's submissions) makes the statistics stale at once.
+STATS_DEPENDENCIES = [("task", ANY), ("task_submission", ANY), ("enrollment", ANY), ("student", ANY)]
+
+
+class CourseStatsView(ReplicaReadMixin, APIView):
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher/course_stats.html'
     permission_classes = [IsAuthenticated, IsTeacher]
 
     def get(self, request):
         teacher = request.user.teacher_profile
+        context = TEACHER_STATS.single_flight(
+            ("course_stats", teacher.pk), lambda: self._stats(teacher), depends_on=STATS_DEPENDENCIES
+        )
 
+        if request.accepted_renderer.format == 'html':
+            return Response(context, template_name=self.template_name)
+        return Response(context)
+
+    def _stats(self, teacher):
         # O'qituvchining barcha tasklari
-        tasks = Task.objects.filter(teacher=teacher)
-        task_list = list(tasks.values('id', 'title'))
+        tasks = list(Task.objects.filter(teacher=teacher).order_by('id').only('id', 'title', 'course_id'))
+        tasks_per_course = defaultdict(int)
+        for task in tasks:
+            tasks_per_course[task.course_id] += 1
+
+        # Topshiriqlar va kurslar bitta so'rovda, har bir talaba uchun alohida so'rov yo'q
+        submissions = defaultdict(dict)
+        for student_id, task_id, score, is_done in TaskSubmission.objects.filter(
+            task__teacher=teacher
+        ).values_list('student_id', 'task_id', 'score', 'is_done'):
+            submissions[student_id][task_id] = (score, is_done)
+
+        enrolled_courses = defaultdict(set)
+        for student_id, course_id in Enrollment.objects.filter(
+            course_id__in=[course_id for course_id in tasks_per_course if course_id is not None]
+        ).values_list('student_id', 'course_id'):
+            enrolled_courses[student_id].add(course_id)
 
         # Barcha talabalar
-        students = Student.objects.all()
+        students = Student.objects.only('id', 'name', 'last_name')
 
         result = []
         for student in students:
+            student_submissions = submissions.get(student.id, {})
             task_scores = {}
             for task in tasks:
-                submission = TaskSubmission.objects.filter(task=task, student=student).first()
-                task_scores[task.title] = submission.score if submission and submission.score is not None else 0
-
-            total_tasks = Task.objects.filter(
-                teacher=teacher,
-                course__in=student.enrollments.values_list('course', flat=True)
-            ).count()
+                score, _ = student_submissions.get(task.id, (None, False))
+                task_scores[task.title] = score if score is not None else 0
 
-            submitted_tasks = TaskSubmission.objects.filter(
-                student=student,
-                task__teacher=teacher,
-                is_done=True
-            ).count()
+            total_tasks = sum(tasks_per_course[course_id] for course_id in enrolled_courses.get(student.id, ()))
+            submitted_tasks = sum(1 for _, is_done in student_submissions.values() if is_done)
 
             completion_rate = round((submitted_tasks / total_tasks) * 100, 2) if total_tasks else 0
 
@@ -1007,44 +1184,58 @@ class CourseStatsView(APIView):
                 "tasks": task_scores
             })
 
-        context = {
-            "tasks": [t['title'] for t in task_list],
+        return {
+            "tasks": [task.title for task in tasks],
             "students": result
         }
 
-        if request.accepted_renderer.format == 'html':
-            return Response(context, template_name=self.template_name)
-        return Response(context)
-
-class CourseStatsTableView(APIView):
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+class CourseStatsTableView(ReplicaReadMixin, APIView):
+    renderer_classes = [FastJSONRenderer, TemplateHTMLRenderer]
     template_name = 'teacher/course_stats_table.html'
     permission_classes = [IsAuthenticated, IsTeacher]
 
     def get(self, request, course_id):
         teacher = request.user.teacher_profile
-        tasks = Task.objects.filter(teacher=teacher, course_id=course_id).order_by('id')
+        context = TEACHER_STATS.single_flight(
+            ("course_stats_table", teacher.pk, course_id),
+            lambda: self._stats(teacher, course_id),
+            depends_on=STATS_DEPENDENCIES,
+        )
+
+        if request.accepted_renderer.format == 'html':
+            return Response(context, template_name=self.template_name)
+        return Response(context)
+
+    def _stats(self, teacher, course_id):
+        tasks = list(Task.objects.filter(teacher=teacher, course_id=course_id).order_by('id').only('id', 'title'))
         task_names = [task.title for task in tasks]
+        titles = {task.id: task.title for task in tasks}
+
+        submissions = defaultdict(list)
+        for student_id, task_id, score, is_done in TaskSubmission.objects.filter(
+            task_id__in=list(titles)
+        ).values_list('student_id', 'task_id', 'score', 'is_done'):
+            submissions[student_id].append((task_id, score, is_done))
 
-        students = Student.objects.filter(enrollments__course_id=course_id).distinct()
+        students = Student.objects.filter(enrollments__course_id=course_id).distinct().only('id', 'name', 'last_name')
         student_data = []
 
         for student in students:
-            total_tasks = tasks.count()
-            submissions = TaskSubmission.objects.filter(student=student, task__in=tasks)
+            total_tasks = len(tasks)
+            student_submissions = submissions.get(student.id, [])
 
-            submitted_tasks = submissions.filter(is_done=True).count()
+            submitted_tasks = sum(1 for _, _, is_done in student_submissions if is_done)
             completion_rate = round((submitted_tasks / total_tasks) * 100, 2) if total_tasks else 0
 
             task_scores = {task.title: None for task in tasks}
-            for submission in submissions:
-                if submission.is_done:
-                    task_scores[submission.task.title] = submission.score
+            for task_id, score, is_done in student_submissions:
+                if is_done:
+                    task_scores[titles[task_id]] = score
 
-            avg_score = (
-                submissions.aggregate(avg=Avg('score'))['avg']
-                if submitted_tasks > 0 else 0
-            )
+            avg_score = 0
+            if submitted_tasks > 0:
+                scores = [score for _, score, _ in student_submissions if score is not None]
+                avg_score = sum(scores) / len(scores) if scores else None
 
             student_data.append({
                 "student": str(student),
@@ -1055,15 +1246,11 @@ class CourseStatsTableView(APIView):
                 "tasks": task_scores
             })
 
-        context = {
+        return {
             "students": student_data,
             "task_names": task_names
         }
 
-        if request.accepted_renderer.format == 'html':
-            return Response(context, template_name=self.template_name)
-        return Response(context)
-
 def CourseView(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     tasks = Task.objects.filter(course=course)
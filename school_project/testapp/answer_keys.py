@@ -0,0 +1,55 @@
+"""
+Answer keys used to grade submitted attempts.
+
+A test's key (question types, marks, answer options and which are correct) is loaded with two queries and
+cached in the ``answer_keys`` namespace under the test's entity version, so every grading
+of the test reuses it until a question or answer option of the test changes.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from school_project.cache import namespace
+
+from .models import Answer, Question
+
+
+# Version 2: KeyedQuestion.option_ids.
+ANSWER_KEYS = namespace("answer_keys", ttl=3600, local_ttl=60, max_entries=500, version=2)
+
+
+@dataclass(frozen=True)
+class KeyedQuestion:
+    id: int
+    question_type: str
+    points: Decimal
+    correct_option_ids: frozenset
+    # Every option of the question, to validate what students select.
+    option_ids: frozenset = frozenset()
+    # First correct option of a written question: accepted text, tolerance in match_text.
+    correct_text: str | None = None
+    correct_match_text: str | None = None
+
+
+@ANSWER_KEYS.memoize(depends_on=lambda test_id: [("test", test_id)])
+def answer_key(test_id):
+    """``{question_id: KeyedQuestion}`` of the test, in question order."""
+    options_by_question, correct = {}, {}
+    for option in Answer.objects.filter(question__test_id=test_id).order_by("id"):
+        options_by_question.setdefault(option.question_id, []).append(option.id)
+        if option.is_correct:
+            correct.setdefault(option.question_id, []).append(option)
+
+    key = {}
+    for question in Question.objects.filter(test_id=test_id).order_by("id").only("id", "question_type", "mark"):
+        options = correct.get(question.id, [])
+        key[question.id] = KeyedQuestion(
+            id=question.id,
+            question_type=question.question_type,
+            points=Decimal(str(question.mark)),
+            correct_option_ids=frozenset(option.id for option in options),
+            option_ids=frozenset(options_by_question.get(question.id, ())),
+            correct_text=options[0].text if options else None,
+            correct_match_text=options[0].match_text if options else None,
+        )
+    return key
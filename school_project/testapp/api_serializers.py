@@ -7,10 +7,24 @@ class AttemptAnswerInputSerializer(serializers.Serializer):
         child=serializers.IntegerField(), required=False, allow_empty=True
     )
     written_answer = serializers.CharField(required=False, allow_blank=True)
+    # Grows with every edit on the client; see testapp.autosave.
+    revision = serializers.IntegerField(required=False, min_value=0, max_value=2**63 - 1)
+
+
+class AttemptAutosaveInputSerializer(serializers.Serializer):
+    answers = AttemptAnswerInputSerializer(many=True, allow_empty=False, max_length=500)
 
 
 class AttemptSubmitInputSerializer(serializers.Serializer):
-    answers = AttemptAnswerInputSerializer(many=True)
+    # Optional: answers autosaved before are already stored.
+    answers = AttemptAnswerInputSerializer(many=True, required=False)
+
+
+class AttemptAutosaveOutputSerializer(serializers.Serializer):
+    attempt_id = serializers.IntegerField()
+    saved = serializers.IntegerField()
+    unchanged = serializers.IntegerField()
+    stale = serializers.IntegerField()
 
 
 class AttemptResultOutputSerializer(serializers.Serializer):
@@ -19,3 +33,5 @@ class AttemptResultOutputSerializer(serializers.Serializer):
     percentage = serializers.FloatField()
     total_questions = serializers.IntegerField()
     total_answers = serializers.IntegerField()
+    # Submitted after the deadline: answers sent with the submit were not counted.
+    late = serializers.BooleanField(default=False)
@@ -1,6 +1,11 @@
+from datetime import timedelta
 from decimal import Decimal, InvalidOperation
+from time import perf_counter
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Count
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import status
@@ -8,23 +13,63 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from school_project.conditional import ConditionalGetMixin, Validators
+from school_project.db_routers import ReplicaReadMixin
+from school_project.metrics import EXAM_ATTEMPTS_STARTED, EXAM_ATTEMPTS_SUBMITTED, EXAM_GRADING_DURATION
+from school_project.versions import ANY
+from schoolapp.idempotency import idempotent
 from schoolapp.models import Enrollment
-from .api_serializers import AttemptResultOutputSerializer, AttemptSubmitInputSerializer
-from .models import Answer, EnrollmentTest, Question, StudentAnswer, Test, TestAttempt
-from .scoring_engine import (
-    ChoiceQuestion,
-    ComputationalQuestion,
-    ShortAnswerQuestion,
-    grade_computational,
-    grade_multiple_choice_exact,
-    grade_short_answer,
-    grade_single_choice,
+from .answer_keys import answer_key
+from .api_serializers import (
+    AttemptAutosaveInputSerializer,
+    AttemptAutosaveOutputSerializer,
+    AttemptResultOutputSerializer,
+    AttemptSubmitInputSerializer,
 )
-
-
-class StudentAvailableTestsAPIView(APIView):
+from .autosave import save_answers
+from .grading import grade_attempts
+from .models import EnrollmentTest, Question, StudentAnswer, Test, TestAttempt
+from .start_payloads import start_payload
+
+
+def _is_late(attempt, now):
+    """Whether ``now`` is past the attempt's deadline and the grace period for slow networks."""
+    grace = timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SEC)
+    return attempt.deadline_at is not None and now > attempt.deadline_at + grace
+
+
+def _attempt_deadline(test, student, now):
+    """
+    ``(open, deadline_at)`` of an attempt started ``now``: whether one of the student's
+    assignments of the test is open (tests assigned to none of their courses always are), and
+    when the attempt ends: after the time limit, or when the latest open window closes.
+    """
+    windows = list(
+        EnrollmentTest.objects.filter(test_id=test.id, course__enrollments__student=student).values_list(
+            "start_date", "end_date"
+        )
+    )
+    window_end = None
+    if windows:
+        open_ends = [end for start, end in windows if (start is None or start <= now) and (end is None or now < end)]
+        if not open_ends:
+            return False, None
+        if None not in open_ends:
+            window_end = max(open_ends)
+    limit_end = now + timedelta(seconds=test.time_limit_sec) if test.time_limit_sec else None
+    return True, min((end for end in (limit_end, window_end) if end is not None), default=None)
+
+
+class StudentAvailableTestsAPIView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self, request):
+        # Enrollments bump the student; assignments, questions and status changes a test.
+        student = getattr(request.user, "student_profile", None)
+        if student is None:
+            return None
+        return Validators([("student", student.pk), ("test", ANY)])
+
     def get(self, request):
         student = request.user.student_profile
         enrollments = Enrollment.objects.filter(student=student)
@@ -32,7 +77,7 @@ class StudentAvailableTestsAPIView(APIView):
             id__in=EnrollmentTest.objects.filter(
                 course__in=enrollments.values_list("course_id", flat=True)
             ).values_list("test_id", flat=True)
-        ).filter(status=Test.STATUS_PUBLISHED).distinct()
+        ).filter(status=Test.STATUS_PUBLISHED).annotate(question_count=Count("questions"))
 
         payload = [
             {
@@ -42,8 +87,8 @@ class StudentAvailableTestsAPIView(APIView):
                 "status": t.status,
                 "time_limit_sec": t.time_limit_sec,
                 "passing_percent": t.passing_percent,
-                "teacher": getattr(t.teacher, "id", None),
-                "question_count": t.questions.count(),
+                "teacher": t.teacher_id,
+                "question_count": t.question_count,
                 "created_at": t.created_at,
             }
             for t in tests
@@ -51,100 +96,58 @@ class StudentAvailableTestsAPIView(APIView):
         return Response(payload)
 
 
+def _start_response(data, status_code=status.HTTP_201_CREATED):
+    """Start response of an attempt described by ``data``, with its test's cached question set."""
+    payload = start_payload(data["test_id"])
+    response = Response({**data, "test": payload.test}, status=status_code)
+    # CompressionMiddleware reuses the question set's cached gzip bytes.
+    response.compressed_segment = payload.segment
+    return response
+
+
+def _without_question_set(data):
+    # Idempotency-Key records keep only the attempt; replays rebuild the rest.
+    return {name: value for name, value in data.items() if name != "test"}
+
+
 class StudentStartAttemptAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent(compact=_without_question_set, expand=_start_response)
     def post(self, request, test_id: int):
         student = request.user.student_profile
-        test = get_object_or_404(
-            Test.objects.prefetch_related("questions__answer_options"),
-            id=test_id,
-            status=Test.STATUS_PUBLISHED,
-        )
+        test = get_object_or_404(Test.objects.only("id", "time_limit_sec"), id=test_id, status=Test.STATUS_PUBLISHED)
+        now = timezone.now()
+        is_open, deadline_at = _attempt_deadline(test, student, now)
+        if not is_open:
+            return Response({"detail": "This test is not open for you now."}, status=status.HTTP_403_FORBIDDEN)
+        payload = start_payload(test.id)
 
         # Validate test payload before creating attempt; choice questions must have options.
-        invalid_questions: list[str] = []
-        for question in test.questions.all():
-            answers = list(question.answer_options.all())
-            if question.question_type in {"OC", "MC"}:
-                non_empty_options = [answer for answer in answers if (answer.text or "").strip()]
-                correct_non_empty = [answer for answer in non_empty_options if answer.is_correct]
-                if len(non_empty_options) < 2 or len(correct_non_empty) == 0:
-                    invalid_questions.append(
-                        f"Question {question.id} is invalid: choice questions need >=2 options and >=1 correct option."
-                    )
-
-        if invalid_questions:
+        if payload.invalid_questions:
             return Response(
                 {
                     "detail": "Test configuration is invalid for student attempt.",
-                    "invalid_questions": invalid_questions,
+                    "invalid_questions": payload.invalid_questions,
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Start endpoint should always create a fresh attempt.
-        attempt = TestAttempt.objects.create(student=student, test=test)
-        questions_payload = []
-
-        for question in test.questions.all():
-            answers = list(question.answer_options.all())
-            question_payload = {
-                "id": question.id,
-                "text": question.text,
-                "question_type": question.question_type,
-                "mark": question.mark,
-                "answer_options": [],
-            }
-
-            # Choice-like questions: return options without correctness metadata.
-            if question.question_type in {"OC", "MC", "ORD", "MAT"}:
-                options = []
-                for answer in answers:
-                    option_payload = {
-                        "id": answer.id,
-                        "text": answer.text,
-                    }
-                    if question.question_type == "ORD" and answer.order is not None:
-                        option_payload["order"] = answer.order
-                    if question.question_type == "MAT" and answer.match_text:
-                        option_payload["match_text"] = answer.match_text
-                    options.append(option_payload)
-
-                question_payload["answer_options"] = options
-
-            # Written questions: expose only input mode, never expected answer text.
-            if question.question_type == "WR":
-                input_kind = "text"
-                correct_answer = next((a for a in answers if a.is_correct), None)
-                if correct_answer:
-                    try:
-                        Decimal((correct_answer.text or "").strip())
-                        input_kind = "numeric"
-                    except (InvalidOperation, ValueError):
-                        input_kind = "text"
-                question_payload["input_kind"] = input_kind
-
-            questions_payload.append(question_payload)
-
-        return Response(
+        # Start endpoint should always create a fresh attempt; retries carrying the first
+        # request's Idempotency-Key get its response instead.
+        attempt = TestAttempt.objects.create(student=student, test=test, deadline_at=deadline_at)
+        EXAM_ATTEMPTS_STARTED.inc()
+        return _start_response(
             {
                 "attempt_id": attempt.id,
                 "test_id": test.id,
                 "started_at": attempt.started_at,
-                "test": {
-                    "id": test.id,
-                    "title": test.title,
-                    "description": test.description,
-                    "time_limit_sec": test.time_limit_sec,
-                    "questions": questions_payload,
-                },
-            },
-            status=status.HTTP_201_CREATED,
+                "deadline_at": attempt.deadline_at,
+            }
         )
 
 
-class StudentSubmitAttemptAPIView(APIView):
+class StudentAutosaveAttemptAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @transaction.atomic
@@ -154,117 +157,85 @@ class StudentSubmitAttemptAPIView(APIView):
             id=attempt_id,
             student=request.user.student_profile,
         )
+        if attempt.completed_at is not None:
+            return Response({"detail": "The attempt is already submitted."}, status=status.HTTP_409_CONFLICT)
+        if _is_late(attempt, timezone.now()):
+            return Response({"detail": "The attempt's time is up."}, status=status.HTTP_409_CONFLICT)
 
-        serializer = AttemptSubmitInputSerializer(data=request.data)
+        serializer = AttemptAutosaveInputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        result = save_answers(attempt, serializer.validated_data["answers"], answer_key(attempt.test_id))
+        return Response(AttemptAutosaveOutputSerializer({"attempt_id": attempt.id, **result._asdict()}).data)
 
-        StudentAnswer.objects.filter(attempt=attempt).delete()
-
-        total_score = Decimal("0")
-        answers_payload = serializer.validated_data["answers"]
-
-        for item in answers_payload:
-            question = get_object_or_404(Question, id=item["question_id"], test=attempt.test)
-            selected_ids = item.get("selected_option_ids", [])
-            written_answer = item.get("written_answer", "")
 
-            student_answer = StudentAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                written_answer=written_answer,
-                scored_mark=0,
-            )
-
-            scoring = self._score_question(question, selected_ids, written_answer)
-            student_answer.scored_mark = float(scoring.awarded_points)
-            student_answer.save(update_fields=["scored_mark"])
-
-            if selected_ids:
-                student_answer.selected_answers.add(*Answer.objects.filter(id__in=selected_ids))
+class StudentSubmitAttemptAPIView(APIView):
+    permission_classes = [IsAuthenticated]
 
-            total_score += scoring.awarded_points
+    @idempotent
+    @transaction.atomic
+    def post(self, request, attempt_id: int):
+        attempt = get_object_or_404(
+            TestAttempt.objects.select_for_update(),
+            id=attempt_id,
+            student=request.user.student_profile,
+        )
+        if attempt.completed_at is not None:
+            # The result is final (and served as immutable); a repeated submit must not regrade it.
+            return Response({"detail": "The attempt is already submitted."}, status=status.HTTP_409_CONFLICT)
 
-        total_questions = attempt.test.questions.count() or 1
-        max_score = sum([Decimal(str(q.mark)) for q in attempt.test.questions.all()], start=Decimal("0"))
-        percentage = Decimal("0") if max_score == 0 else (total_score / max_score) * Decimal("100")
+        serializer = AttemptSubmitInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        attempt.score = float(total_score)
-        attempt.percentage = float(percentage.quantize(Decimal("0.01")))
-        attempt.completed_at = timezone.now()
-        attempt.save(update_fields=["score", "percentage", "completed_at"])
+        grading_started = perf_counter()
+        now = timezone.now()
+        late = _is_late(attempt, now)
+        if late:
+            # Past the deadline only what was saved in time counts, and the attempt ends at its deadline.
+            attempt.completed_at = attempt.deadline_at
+        else:
+            # Answers sent with the submit are the last autosave; then grade everything stored.
+            save_answers(attempt, serializer.validated_data.get("answers", ()), answer_key(attempt.test_id))
+            attempt.completed_at = now
+        grade = grade_attempts([attempt])[attempt.pk]
+        EXAM_GRADING_DURATION.observe(perf_counter() - grading_started)
+        EXAM_ATTEMPTS_SUBMITTED.inc()
 
         response_data = AttemptResultOutputSerializer(
             {
                 "attempt_id": attempt.id,
-                "score": float(total_score),
-                "percentage": float(percentage),
-                "total_questions": total_questions,
-                "total_answers": len(answers_payload),
+                "score": float(grade.score),
+                "percentage": float(grade.percentage),
+                "total_questions": grade.total_questions,
+                "total_answers": grade.total_answers,
+                "late": late,
             }
         ).data
         return Response(response_data)
 
-    def _score_question(self, question: Question, selected_ids: list[int], written_answer: str):
-        points = Decimal(str(question.mark))
-        correct_options = set(
-            Answer.objects.filter(question=question, is_correct=True).values_list("id", flat=True)
-        )
-
-        if question.question_type == "OC":
-            return grade_single_choice(
-                ChoiceQuestion(points=points, correct_option_ids=correct_options),
-                selected_ids,
-            )
-
-        if question.question_type == "MC":
-            return grade_multiple_choice_exact(
-                ChoiceQuestion(points=points, correct_option_ids=correct_options),
-                selected_ids,
-            )
-
-        # WR fallback for short/computational based on answer metadata
-        correct_answer = Answer.objects.filter(question=question, is_correct=True).first()
-        if not correct_answer:
-            return grade_short_answer(
-                ShortAnswerQuestion(points=points, accepted_answers=set(), case_sensitive=False),
-                written_answer,
-            )
 
-        tolerance = Decimal("0")
-        if correct_answer.match_text:
-            try:
-                tolerance = Decimal(str(correct_answer.match_text))
-            except InvalidOperation:
-                tolerance = Decimal("0")
-
-        try:
-            numeric_value = Decimal((written_answer or "").strip())
-            return grade_computational(
-                ComputationalQuestion(
-                    points=points,
-                    expected_answer=Decimal(correct_answer.text.strip()),
-                    tolerance=tolerance,
-                ),
-                numeric_value,
-            )
-        except (InvalidOperation, ValueError):
-            return grade_short_answer(
-                ShortAnswerQuestion(
-                    points=points,
-                    accepted_answers={correct_answer.text},
-                    case_sensitive=False,
-                ),
-                written_answer,
-            )
-
-
-class StudentAttemptResultAPIView(APIView):
+class StudentAttemptResultAPIView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self, request, attempt_id: int):
+        # The one query of a 304; the handler reuses the row.
+        student = getattr(request.user, "student_profile", None)
+        self.attempt = TestAttempt.objects.filter(id=attempt_id, student=student).first() if student else None
+        if self.attempt is None:
+            return None
+        cache_control = None
+        if self.attempt.completed_at is not None:
+            # A submitted attempt's result does not change any more.
+            cache_control = f"private, max-age={settings.COMPLETED_RESULT_MAX_AGE}, immutable"
+        return Validators(
+            [("attempt", self.attempt.pk), ("test", self.attempt.test_id)], self.attempt.completed_at, cache_control
+        )
+
     def get(self, request, attempt_id: int):
-        attempt = get_object_or_404(TestAttempt, id=attempt_id, student=request.user.student_profile)
+        attempt = self.attempt
+        if attempt is None:
+            raise Http404("No TestAttempt matches the given query.")
         total_answers = StudentAnswer.objects.filter(attempt=attempt).count()
-        total_questions = attempt.test.questions.count()
+        total_questions = Question.objects.filter(test_id=attempt.test_id).count()
         return Response(
             {
                 "attempt_id": attempt.id,
@@ -278,9 +249,13 @@ class StudentAttemptResultAPIView(APIView):
         )
 
 
-class TeacherTestResultsAPIView(APIView):
+class TeacherTestResultsAPIView(ConditionalGetMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self, request, test_id: int):
+        # The ETag includes the user, so it is safe to check before test ownership.
+        return Validators([("test", test_id), ("test_attempts", test_id), ("student", ANY)])
+
     def get(self, request, test_id: int):
         teacher = getattr(request.user, "teacher_profile", None)
         if teacher is None:
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TestappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'testapp'
+
+    def ready(self):
+        # Connects the entity version invalidation receivers.
+        from . import invalidation  # noqa: F401
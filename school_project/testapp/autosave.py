@@ -0,0 +1,105 @@
+"""
+Stored answers of an attempt, written question by question while the student works.
+
+Each autosaved item replaces the student's answer to one question. Items carry an optional
+client ``revision`` that grows with every edit; an item whose revision is not newer than the
+stored one is a retry or arrived out of order and is ignored, so clients may resend freely.
+Items that match the stored answer are not written. Submitting grades the stored answers.
+
+Callers hold the attempt's row lock (``select_for_update``), which orders autosaves and the
+submit of one attempt.
+"""
+
+from collections import defaultdict, namedtuple
+
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+
+from school_project.versions import bump
+
+from .models import StudentAnswer
+
+
+SelectedOption = StudentAnswer.selected_answers.through
+
+# Counts of items written, matching what was stored, and older than what was stored.
+SaveResult = namedtuple("SaveResult", "saved unchanged stale")
+
+
+def selected_options(answer_ids):
+    """``{student_answer_id: set of selected option ids}``."""
+    selected = defaultdict(set)
+    links = SelectedOption.objects.filter(studentanswer_id__in=answer_ids).values_list("studentanswer_id", "answer_id")
+    for answer_id, option_id in links:
+        selected[answer_id].add(option_id)
+    return selected
+
+
+def save_answers(attempt, items, key):
+    """
+    Upsert validated ``AttemptAnswerInputSerializer`` items into ``attempt``'s answers;
+    ``key`` is the test's ``answer_key``. Returns a ``SaveResult``.
+    """
+    latest = {}
+    for item in items:
+        question = key.get(item["question_id"])
+        if question is None:
+            raise Http404("No Question matches the given query.")
+        unknown = set(item.get("selected_option_ids", ())) - question.option_ids
+        if unknown:
+            raise ValidationError(
+                {"answers": [f"Options {sorted(unknown)} are not options of question {question.id}."]}
+            )
+        # Within one request, the last item of a question wins.
+        latest[question.id] = item
+    if not latest:
+        return SaveResult(0, 0, 0)
+
+    stored = {answer.question_id: answer for answer in StudentAnswer.objects.filter(attempt=attempt, question_id__in=latest)}
+    selected = selected_options([answer.pk for answer in stored.values()])
+
+    created, updated, reselected = [], [], []
+    unchanged = stale = 0
+    for question_id, item in latest.items():
+        written = item.get("written_answer", "")
+        options = set(item.get("selected_option_ids", ()))
+        revision = item.get("revision")
+        answer = stored.get(question_id)
+        if answer is None:
+            answer = StudentAnswer(attempt=attempt, question_id=question_id, written_answer=written, revision=revision or 0)
+            created.append((answer, options))
+            continue
+        if revision is not None and revision <= answer.revision:
+            stale += 1
+            continue
+        if (answer.written_answer or "") == written and selected[answer.pk] == options:
+            unchanged += 1
+            if revision is None:
+                continue
+            # Same answer, newer revision: store the revision so older edits stay rejected.
+        else:
+            answer.written_answer = written
+            if selected[answer.pk] != options:
+                reselected.append((answer, options))
+        if revision is not None:
+            answer.revision = revision
+        updated.append(answer)
+
+    if created:
+        StudentAnswer.objects.bulk_create([answer for answer, _ in created])
+    if updated:
+        StudentAnswer.objects.bulk_update(updated, ["written_answer", "revision"])
+    if reselected:
+        SelectedOption.objects.filter(studentanswer_id__in=[answer.pk for answer, _ in reselected]).delete()
+    links = [
+        SelectedOption(studentanswer_id=answer.pk, answer_id=option_id)
+        for answer, options in created + reselected
+        for option_id in options
+    ]
+    if links:
+        SelectedOption.objects.bulk_create(links)
+    saved = len(latest) - unchanged - stale
+    if saved:
+        # The bulk writes send no signals: move the attempt's stamp so its result's ETag changes.
+        bump(("attempt", attempt.pk))
+    return SaveResult(saved, unchanged, stale)
@@ -0,0 +1,130 @@
+"""
+Grading of attempts from their stored answers (``testapp.autosave``).
+
+``grade_attempts`` grades any number of attempts in a fixed number of queries: one for their
+answers, one for the selected options and two bulk updates; answer keys come from the
+``answer_keys`` cache. The submit endpoint grades one attempt with it and
+``manage.py expire_attempts`` a batch of expired ones.
+"""
+
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from school_project.versions import bump
+
+from .answer_keys import KeyedQuestion, answer_key
+from .autosave import selected_options
+from .models import StudentAnswer, TestAttempt
+from .scoring_engine import (
+    ChoiceQuestion,
+    ComputationalQuestion,
+    ShortAnswerQuestion,
+    grade_computational,
+    grade_multiple_choice_exact,
+    grade_short_answer,
+    grade_single_choice,
+)
+
+
+# ``score`` and ``percentage`` unrounded, as Decimals.
+Grade = namedtuple("Grade", "score percentage total_questions total_answers")
+
+
+def score_question(question: KeyedQuestion, selected_ids: list[int], written_answer: str):
+    points = question.points
+    correct_options = set(question.correct_option_ids)
+
+    if question.question_type == "OC":
+        return grade_single_choice(
+            ChoiceQuestion(points=points, correct_option_ids=correct_options),
+            selected_ids,
+        )
+
+    if question.question_type == "MC":
+        return grade_multiple_choice_exact(
+            ChoiceQuestion(points=points, correct_option_ids=correct_options),
+            selected_ids,
+        )
+
+    # WR fallback for short/computational based on answer metadata
+    if question.correct_text is None:
+        return grade_short_answer(
+            ShortAnswerQuestion(points=points, accepted_answers=set(), case_sensitive=False),
+            written_answer,
+        )
+
+    tolerance = Decimal("0")
+    if question.correct_match_text:
+        try:
+            tolerance = Decimal(str(question.correct_match_text))
+        except InvalidOperation:
+            tolerance = Decimal("0")
+
+    try:
+        numeric_value = Decimal((written_answer or "").strip())
+        return grade_computational(
+            ComputationalQuestion(
+                points=points,
+                expected_answer=Decimal(question.correct_text.strip()),
+                tolerance=tolerance,
+            ),
+            numeric_value,
+        )
+    except (InvalidOperation, ValueError):
+        return grade_short_answer(
+            ShortAnswerQuestion(
+                points=points,
+                accepted_answers={question.correct_text},
+                case_sensitive=False,
+            ),
+            written_answer,
+        )
+
+
+def grade_attempts(attempts):
+    """
+    Score ``attempts`` from their stored answers and save ``score``, ``percentage`` and
+    ``completed_at`` (set by the caller) on each. Returns ``{attempt.pk: Grade}``.
+    """
+    attempts = list(attempts)
+    if not attempts:
+        return {}
+    stored = list(
+        StudentAnswer.objects.filter(attempt__in=attempts).only("id", "attempt_id", "question_id", "written_answer", "scored_mark")
+    )
+    selected = selected_options([student_answer.pk for student_answer in stored])
+    keys = {test_id: answer_key(test_id) for test_id in {attempt.test_id for attempt in attempts}}
+
+    scores = {attempt.pk: Decimal("0") for attempt in attempts}
+    answered = dict.fromkeys(scores, 0)
+    test_of = {attempt.pk: attempt.test_id for attempt in attempts}
+    regraded = []
+    for student_answer in stored:
+        question = keys[test_of[student_answer.attempt_id]].get(student_answer.question_id)
+        awarded = Decimal("0")
+        if question is not None:  # else moved to another test since it was answered
+            scoring = score_question(question, sorted(selected[student_answer.pk]), student_answer.written_answer or "")
+            awarded = scoring.awarded_points
+        scores[student_answer.attempt_id] += awarded
+        answered[student_answer.attempt_id] += 1
+        if student_answer.scored_mark != float(awarded):
+            student_answer.scored_mark = float(awarded)
+            regraded.append(student_answer)
+    StudentAnswer.objects.bulk_update(regraded, ["scored_mark"], batch_size=500)
+
+    grades = {}
+    for attempt in attempts:
+        key = keys[attempt.test_id]
+        max_score = sum((question.points for question in key.values()), start=Decimal("0"))
+        score = scores[attempt.pk]
+        percentage = Decimal("0") if max_score == 0 else (score / max_score) * Decimal("100")
+        attempt.score = float(score)
+        attempt.percentage = float(percentage.quantize(Decimal("0.01")))
+        grades[attempt.pk] = Grade(score, percentage, len(key) or 1, answered[attempt.pk])
+    TestAttempt.objects.bulk_update(attempts, ["score", "percentage", "completed_at"])
+    # bulk_update sends no signals: bump what testapp.invalidation would have.
+    bump(
+        *[("attempt", attempt.pk) for attempt in attempts],
+        *[("test_attempts", attempt.test_id) for attempt in attempts],
+    )
+    return grades
@@ -0,0 +1,19 @@
+"""
+Entity versions (``school_project.versions``) bumped by this app's models.
+
+The ``test`` stamp covers the test, its questions and answer options and the courses it is
+assigned to; an assignment also changes the course's stamp. Attempts have their own stamps,
+per attempt and per test (``test_attempts``), so that starting and submitting attempts
+leaves the ``test`` stamp, and what is cached under it, alone.
+"""
+
+from school_project.versions import track
+
+from .models import Answer, EnrollmentTest, Question, Test, TestAttempt
+
+
+track(Test, ("test", "pk"))
+track(Question, ("test", "test_id"))
+track(Answer, ("test", "question__test_id"))
+track(EnrollmentTest, ("test", "test_id"), ("course", "course_id"))
+track(TestAttempt, ("attempt", "pk"), ("test_attempts", "test_id"))
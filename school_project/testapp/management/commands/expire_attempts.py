@@ -0,0 +1,60 @@
+"""
+Finalize open test attempts whose deadline (plus ``EXAM_DEADLINE_GRACE_SEC``) has passed.
+
+    python manage.py expire_attempts --batch-size 500
+    python manage.py expire_attempts --interval 30      # keep sweeping every 30 seconds
+
+Expired attempts are graded from their autosaved answers, in batches, and completed at their
+deadline. Batches are read through the partial index on open attempts' ``deadline_at`` and
+locked with ``SKIP LOCKED`` on PostgreSQL, so several sweepers and the submits they race
+with never wait for each other.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from school_project.metrics import EXAM_ATTEMPTS_EXPIRED
+from testapp.grading import grade_attempts
+from testapp.models import TestAttempt
+
+
+def expire_attempts(batch_size=500):
+    """Finalize every attempt expired by now, ``batch_size`` per transaction; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SEC)
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                TestAttempt.objects.select_for_update(skip_locked=True)
+                .filter(completed_at__isnull=True, deadline_at__lt=cutoff)
+                .order_by("deadline_at")[:batch_size]
+            )
+            for attempt in batch:
+                attempt.completed_at = attempt.deadline_at
+            grade_attempts(batch)
+        expired += len(batch)
+        EXAM_ATTEMPTS_EXPIRED.inc(amount=len(batch))
+        if len(batch) < batch_size:
+            return expired
+
+
+class Command(BaseCommand):
+    help = "Grade and close test attempts whose time is up."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Attempts graded per transaction.")
+        parser.add_argument("--interval", type=float, default=0, help="Seconds between sweeps; 0 sweeps once.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        while True:
+            expired = expire_attempts(batch_size)
+            self.stdout.write(f"Finalized {expired} expired attempts.")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    # Sheets submitted twice left several answers per question; the newest one was graded last.
+    StudentAnswer = apps.get_model('testapp', 'StudentAnswer')
+    duplicates = (
+        StudentAnswer.objects.using(schema_editor.connection.alias)
+        .values('attempt_id', 'question_id')
+        .annotate(rows=Count('id'), newest=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for row in list(duplicates):
+        StudentAnswer.objects.using(schema_editor.connection.alias).filter(
+            attempt_id=row['attempt_id'], question_id=row['question_id'], id__lt=row['newest'],
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0019_test_description_test_passing_percent_test_status_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+    ]
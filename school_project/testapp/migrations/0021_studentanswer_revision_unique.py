@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0020_drop_duplicate_student_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentanswer',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='studentanswer',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='testapp_studentanswer_attempt_question_uniq'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_open_attempt_deadlines(apps, schema_editor):
+    # Open attempts get the deadline of their test's time limit, so the sweeper closes the abandoned ones.
+    TestAttempt = apps.get_model('testapp', 'TestAttempt')
+    open_attempts = TestAttempt.objects.using(schema_editor.connection.alias).filter(
+        completed_at__isnull=True, test__time_limit_sec__gt=0,
+    )
+    for limit in open_attempts.order_by().values_list('test__time_limit_sec', flat=True).distinct():
+        open_attempts.filter(test__time_limit_sec=limit).update(deadline_at=F('started_at') + timedelta(seconds=limit))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0021_studentanswer_revision_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='deadline_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(condition=models.Q(('completed_at__isnull', True)), fields=['deadline_at'], name='testapp_attempt_open_deadline'),
+        ),
+        migrations.RunPython(set_open_attempt_deadlines, migrations.RunPython.noop),
+    ]
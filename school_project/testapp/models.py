@@ -80,9 +80,21 @@ class TestAttempt(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # End of the time limit or of the assignment window, whichever comes first; None for neither.
+    deadline_at = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(default=0)
     percentage = models.FloatField(default=0)
 
+    class Meta:
+        indexes = [
+            # Open attempts only: what the expiry sweeper scans, kept small as attempts finish.
+            models.Index(
+                fields=["deadline_at"],
+                name="testapp_attempt_open_deadline",
+                condition=models.Q(completed_at__isnull=True),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.test}"
 
@@ -102,6 +114,13 @@ class StudentAnswer(models.Model):
     selected_answers = models.ManyToManyField(Answer, blank=True)
     written_answer = models.TextField(blank=True, null=True)
     scored_mark = models.FloatField(default=0.0)
+    # Client-side revision of the last autosave; older revisions arriving late are ignored.
+    revision = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["attempt", "question"], name="testapp_studentanswer_attempt_question_uniq"),
+        ]
 
     def __str__(self):
         return f"Answer to Q{self.question.id} by {self.attempt.student.user.username}"
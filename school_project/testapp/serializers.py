@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from school_project.fieldsets import SparseFieldsetSerializerMixin
 from .models import Test, Question, Answer, StudentAnswer, TestAttempt, EnrollmentTest
 from schoolapp.serializers import CourseSerializer
 from schoolapp.models import Course
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Test
         fields = [
@@ -19,18 +20,23 @@ class TestSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['teacher', 'created_at', 'updated_at']
 
-class QuestionSerializer(serializers.ModelSerializer):
+class TestListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Test
+        fields = ['id', 'title', 'status', 'time_limit_sec', 'passing_percent', 'teacher', 'created_at']
+
+class QuestionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ['id', 'text', 'question_type', 'mark', 'test']
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Answer
         fields = ['id', 'text', 'is_correct', 'question']
 
 
-class EnrollmentTestSerializer(serializers.ModelSerializer):
+class EnrollmentTestSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # GET uchun nested
     course = CourseSerializer(read_only=True)
     test = TestSerializer(read_only=True)
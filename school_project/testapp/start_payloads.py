@@ -0,0 +1,93 @@
+"""
+Question sets sent to students when they start an attempt.
+
+Every student starting a test gets the same questions, so the set is built once per test
+version (three queries) and cached in the ``start_payloads`` namespace together with its
+rendered JSON, deflated once (``school_project.compression.Segment``): gzip responses to
+the start endpoint only compress the few bytes of the attempt around it.
+"""
+
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from school_project.cache import namespace
+from school_project.compression import segment
+from school_project.renderers import FastJSONRenderer
+
+from .models import Test
+
+
+START_PAYLOADS = namespace("start_payloads", ttl=3600, local_ttl=60, max_entries=200)
+
+# ``invalid_questions``: reasons the test cannot be started (empty when it can); ``test``: the
+# payload of the test and its questions; ``segment``: ``test`` rendered and deflated.
+StartPayload = namedtuple("StartPayload", "invalid_questions test segment")
+
+
+def _question_payload(question):
+    answers = list(question.answer_options.all())
+    payload = {
+        "id": question.id,
+        "text": question.text,
+        "question_type": question.question_type,
+        "mark": question.mark,
+        "answer_options": [],
+    }
+
+    # Choice-like questions: return options without correctness metadata.
+    if question.question_type in {"OC", "MC", "ORD", "MAT"}:
+        options = []
+        for answer in answers:
+            option_payload = {
+                "id": answer.id,
+                "text": answer.text,
+            }
+            if question.question_type == "ORD" and answer.order is not None:
+                option_payload["order"] = answer.order
+            if question.question_type == "MAT" and answer.match_text:
+                option_payload["match_text"] = answer.match_text
+            options.append(option_payload)
+
+        payload["answer_options"] = options
+
+    # Written questions: expose only input mode, never expected answer text.
+    if question.question_type == "WR":
+        input_kind = "text"
+        correct_answer = next((a for a in answers if a.is_correct), None)
+        if correct_answer:
+            try:
+                Decimal((correct_answer.text or "").strip())
+                input_kind = "numeric"
+            except (InvalidOperation, ValueError):
+                input_kind = "text"
+        payload["input_kind"] = input_kind
+
+    return payload
+
+
+@START_PAYLOADS.memoize(depends_on=lambda test_id: [("test", test_id)])
+def start_payload(test_id):
+    """``StartPayload`` of the test; the caller checks that it exists and is published."""
+    test = Test.objects.prefetch_related("questions__answer_options").get(id=test_id)
+
+    # Choice questions must have options to be answerable.
+    invalid_questions = []
+    for question in test.questions.all():
+        if question.question_type in {"OC", "MC"}:
+            non_empty_options = [answer for answer in question.answer_options.all() if (answer.text or "").strip()]
+            correct_non_empty = [answer for answer in non_empty_options if answer.is_correct]
+            if len(non_empty_options) < 2 or len(correct_non_empty) == 0:
+                invalid_questions.append(
+                    f"Question {question.id} is invalid: choice questions need >=2 options and >=1 correct option."
+                )
+    if invalid_questions:
+        return StartPayload(invalid_questions, None, None)
+
+    payload = {
+        "id": test.id,
+        "title": test.title,
+        "description": test.description,
+        "time_limit_sec": test.time_limit_sec,
+        "questions": [_question_payload(question) for question in test.questions.all()],
+    }
+    return StartPayload([], payload, segment(FastJSONRenderer().render(payload)))
@@ -1,3 +1,434 @@
-from django.test import TestCase
+import gzip
+import json
+import zlib
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from school_project.versions import versions
+from schoolapp.idempotency import _claim, _owned, _store
+from schoolapp.models import Course, Enrollment, IdempotencyKey, Student, Teacher
+
+from .answer_keys import ANSWER_KEYS
+from .models import Answer, EnrollmentTest, Question, StudentAnswer, Test, TestAttempt
+from .start_payloads import START_PAYLOADS
+
+
+class ExamFixtureMixin:
+    """A published test with a choice and a written question, and its student's API client."""
+
+    def setUp(self):
+        super().setUp()
+        ANSWER_KEYS.clear()
+        teacher = Teacher.objects.create(name="T", last_name="One", email="t@example.com")
+        self.test = Test.objects.create(title="Algebra", teacher=teacher, status=Test.STATUS_PUBLISHED)
+        self.choice = Question.objects.create(test=self.test, text="2+2?", question_type="OC", mark=2)
+        self.right = Answer.objects.create(question=self.choice, text="4", is_correct=True)
+        self.wrong = Answer.objects.create(question=self.choice, text="5")
+        self.written = Question.objects.create(test=self.test, text="6*7?", question_type="WR", mark=3)
+        Answer.objects.create(question=self.written, text="42", match_text="0.5", is_correct=True)
+
+        user = User.objects.create_user(username="student", password="x")
+        self.student = Student.objects.create(user=user, name="S", last_name="One")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+
+class SubmitAttemptGradingTests(ExamFixtureMixin, TestCase):
+    def submit(self, choice_id, written="42.3"):
+        attempt = TestAttempt.objects.create(student=self.student, test=self.test)
+        return self.client.post(
+            reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt.id}),
+            {"answers": [
+                {"question_id": self.choice.id, "selected_option_ids": [choice_id]},
+                {"question_id": self.written.id, "written_answer": written},
+            ]},
+            format="json",
+        )
+
+    def test_grades_with_the_answer_key(self):
+        response = self.submit(self.right.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["score"], response.data["percentage"]), (5.0, 100.0))
+        self.assertEqual(self.submit(self.wrong.id, written="40").data["score"], 0.0)
+
+    @override_settings(CACHE_SINGLE_PROCESS=True)
+    def test_answer_key_is_reused_until_the_test_changes(self):
+        self.submit(self.right.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.submit(self.right.id).data["score"], 5.0)
+        self.assertFalse([query["sql"] for query in queries if 'FROM "testapp_question"' in query["sql"]])
+
+        # Marking the other option correct reaches the next grading at once.
+        self.right.is_correct = False
+        self.right.save()
+        self.wrong.is_correct = True
+        self.wrong.save()
+        self.assertEqual(self.submit(self.wrong.id).data["score"], 5.0)
+
+    def test_questions_of_other_tests_are_rejected(self):
+        other = Test.objects.create(title="Other", teacher=self.test.teacher)
+        self.choice.test = other
+        self.choice.save()
+
+        self.assertEqual(self.submit(self.right.id).status_code, 404)
+
+
+class AutosaveTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.attempt = TestAttempt.objects.create(student=self.student, test=self.test)
+
+    def autosave(self, *answers):
+        return self.client.post(
+            reverse("testapp:api_v1_student_autosave_attempt", kwargs={"attempt_id": self.attempt.id}),
+            {"answers": list(answers)},
+            format="json",
+        )
+
+    def test_submit_grades_the_autosaved_answers(self):
+        self.autosave({"question_id": self.choice.id, "selected_option_ids": [self.wrong.id], "revision": 1})
+        self.autosave(
+            {"question_id": self.choice.id, "selected_option_ids": [self.right.id], "revision": 2},
+            {"question_id": self.written.id, "written_answer": "42.3", "revision": 1},
+        )
+
+        response = self.client.post(
+            reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": self.attempt.id}), {}, format="json"
+        )
+        self.assertEqual((response.data["score"], response.data["total_answers"]), (5.0, 2))
+        self.assertEqual(StudentAnswer.objects.filter(attempt=self.attempt).count(), 2)
+        self.assertEqual(self.autosave({"question_id": self.choice.id}).status_code, 409)
+
+    def test_retries_and_late_revisions_change_nothing(self):
+        right = {"question_id": self.choice.id, "selected_option_ids": [self.right.id], "revision": 5}
+        self.assertEqual(self.autosave(right).data["saved"], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.autosave(right, {**right, "selected_option_ids": [self.wrong.id], "revision": 4})
+        self.assertEqual((response.data["saved"], response.data["stale"]), (0, 1))
+        self.assertFalse([query["sql"] for query in queries if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+        self.assertEqual(
+            list(StudentAnswer.objects.get(attempt=self.attempt).selected_answers.values_list("id", flat=True)),
+            [self.right.id],
+        )
+        unrevised = {"question_id": self.choice.id, "selected_option_ids": [self.right.id]}
+        self.assertEqual(self.autosave(unrevised).data["unchanged"], 1)
+
+    @override_settings(CACHE_SINGLE_PROCESS=True)
+    def test_autosave_changes_the_result_etag(self):
+        url = reverse("testapp:api_v1_student_attempt_result", kwargs={"attempt_id": self.attempt.id})
+        first = self.client.get(url)
+        self.assertEqual(first.data["total_answers"], 0)
+
+        self.autosave({"question_id": self.choice.id, "selected_option_ids": [self.right.id]})
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_answers"], 1)
+
+    def test_submit_after_submit_keeps_the_graded_answers(self):
+        url = reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": self.attempt.id})
+        self.client.post(url, {"answers": [{"question_id": self.choice.id, "selected_option_ids": [self.wrong.id]}]}, format="json")
+
+        response = self.client.post(
+            url, {"answers": [{"question_id": self.choice.id, "selected_option_ids": [self.right.id]}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 409)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 0.0)
+        self.assertEqual(
+            list(StudentAnswer.objects.get(attempt=self.attempt).selected_answers.values_list("id", flat=True)),
+            [self.wrong.id],
+        )
+
+    def test_options_of_other_questions_are_rejected(self):
+        other = Answer.objects.filter(question=self.written).first()
+        response = self.autosave({"question_id": self.choice.id, "selected_option_ids": [other.id]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentAnswer.objects.exists())
+
+
+@override_settings(CACHE_SINGLE_PROCESS=True)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username="teacher", password="x")
+        self.teacher = Teacher.objects.create(user=teacher_user, name="T", last_name="One", email="t@example.com")
+        self.test = Test.objects.create(title="Algebra", teacher=self.teacher, status=Test.STATUS_PUBLISHED)
+        self.course = Course.objects.create(title="Algebra", teacher=self.teacher, schedule={})
+        EnrollmentTest.objects.create(teacher=self.teacher, test=self.test, course=self.course)
+
+        user = User.objects.create_user(username="student", password="x")
+        self.student = Student.objects.create(user=user, name="S", last_name="One")
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.teacher_client = APIClient()
+        self.teacher_client.force_authenticate(teacher_user)
+
+    def test_available_tests_poll_answers_not_modified_without_queries(self):
+        url = reverse("testapp:api_v1_student_tests")
+        first = self.client.get(url)
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+
+        Test.objects.create(title="Geometry", teacher=self.teacher, status=Test.STATUS_PUBLISHED)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_per_process_cache_sends_no_etags(self):
+        # The shipped default: CACHE_URL unset (locmem://) under several workers.
+        self.assertIsNone(versions([("test", self.test.pk)]))
+        url = reverse("testapp:api_v1_student_tests")
+        first = self.client.get(url)
+        self.assertNotIn("ETag", first)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='W/"anything"').status_code, 200)
+
+    def test_completed_result_is_cacheable(self):
+        attempt = TestAttempt.objects.create(student=self.student, test=self.test, completed_at=timezone.now())
+        url = reverse("testapp:api_v1_student_attempt_result", kwargs={"attempt_id": attempt.id})
+        first = self.client.get(url)
+        self.assertIn("immutable", first["Cache-Control"])
+        self.assertIn("Last-Modified", first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_completed_result_cannot_be_resubmitted(self):
+        question = Question.objects.create(test=self.test, text="2+2?", question_type="OC", mark=2)
+        right = Answer.objects.create(question=question, text="4", is_correct=True)
+        attempt = TestAttempt.objects.create(student=self.student, test=self.test)
+        submit = reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt.id})
+        self.assertEqual(self.client.post(submit, {}, format="json").data["score"], 0.0)
+        attempt.refresh_from_db()
+        graded = (attempt.completed_at, attempt.score)
+
+        answers = {"answers": [{"question_id": question.id, "selected_option_ids": [right.id]}]}
+        self.assertEqual(self.client.post(submit, answers, format="json").status_code, 409)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.completed_at, attempt.score), graded)
+
+    def test_teacher_results_change_with_submissions_and_differ_per_user(self):
+        url = reverse("testapp:api_v1_teacher_test_results", kwargs={"test_id": self.test.id})
+        etag = self.teacher_client.get(url)["ETag"]
+        self.assertEqual(self.teacher_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Someone else's validator never matches, even before ownership is checked.
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+        TestAttempt.objects.create(student=self.student, test=self.test, completed_at=timezone.now())
+        response = self.teacher_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(CACHE_SINGLE_PROCESS=True)
+class StartAttemptTests(TestCase):
+    def setUp(self):
+        START_PAYLOADS.clear()
+        teacher = Teacher.objects.create(name="T", last_name="One", email="t@example.com")
+        self.test = Test.objects.create(title="Algebra", teacher=teacher, status=Test.STATUS_PUBLISHED)
+        for number in range(30):
+            question = Question.objects.create(test=self.test, text=f"Savol {number}: 2+{number}?", question_type="OC")
+            Answer.objects.create(question=question, text=str(2 + number), is_correct=True)
+            Answer.objects.create(question=question, text=str(3 + number))
+
+        user = User.objects.create_user(username="student", password="x")
+        Student.objects.create(user=user, name="S", last_name="One")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.url = reverse("testapp:api_v1_student_start_attempt", kwargs={"test_id": self.test.id})
+
+    def test_question_set_is_cached_and_sent_gzipped(self):
+        first = self.client.post(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Content-Encoding"], "gzip")
+        self.assertFalse([query["sql"] for query in queries if 'FROM "testapp_question"' in query["sql"]])
+        started = [json.loads(gzip.decompress(response.content)) for response in (first, second)]
+        self.assertEqual(started[0]["test"], started[1]["test"])
+        self.assertNotEqual(started[0]["attempt_id"], started[1]["attempt_id"])
+        self.assertEqual(len(started[1]["test"]["questions"]), 30)
+
+    def test_edited_questions_reach_the_next_start(self):
+        self.client.post(self.url)
+        Question.objects.filter(test=self.test).first().answer_options.update(is_correct=False)
+        self.assertEqual(self.client.post(self.url).status_code, 201)  # update() sends no signal
+
+        question = Question.objects.filter(test=self.test).first()
+        question.text = "Changed"
+        question.save()
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["invalid_questions"]), 1)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        START_PAYLOADS.clear()
+        teacher = Teacher.objects.create(name="T", last_name="One", email="t@example.com")
+        self.test = Test.objects.create(title="Algebra", teacher=teacher, status=Test.STATUS_PUBLISHED)
+        self.question = Question.objects.create(test=self.test, text="2+2?", question_type="OC")
+        self.right = Answer.objects.create(question=self.question, text="4", is_correct=True)
+        Answer.objects.create(question=self.question, text="5")
+
+        user = User.objects.create_user(username="student", password="x")
+        Student.objects.create(user=user, name="S", last_name="One")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.url = reverse("testapp:api_v1_student_start_attempt", kwargs={"test_id": self.test.id})
+
+    def start(self, key):
+        return self.client.post(self.url, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retries_replay_the_first_response(self):
+        first = self.start("a1")
+        retry = self.start("a1")
+
+        self.assertEqual(TestAttempt.objects.count(), 1)
+        self.assertEqual((retry.status_code, retry["Idempotent-Replayed"]), (201, "true"))
+        self.assertEqual(json.loads(retry.content), json.loads(first.content))
+        # The stored response leaves the question set to the start_payloads cache.
+        stored = json.loads(zlib.decompress(IdempotencyKey.objects.get().body))
+        self.assertEqual(stored, {name: value for name, value in json.loads(first.content).items() if name != "test"})
+        self.assertEqual(self.start("a2").status_code, 201)
+        self.assertEqual(TestAttempt.objects.count(), 2)
+
+    def test_a_key_names_one_request(self):
+        attempt_id = self.start("a1").data["attempt_id"]
+        response = self.client.post(
+            reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt_id}),
+            {"answers": []}, format="json", HTTP_IDEMPOTENCY_KEY="a1",
+        )
+        self.assertEqual(response.status_code, 422)
+
+    @override_settings(IDEMPOTENCY_WAIT_SEC=0)
+    def test_duplicates_of_a_running_request_are_told_to_retry(self):
+        self.start("a1")
+        IdempotencyKey.objects.update(status_code=None, body=None)
+
+        response = self.start("a1")
+        self.assertEqual((response.status_code, response["Retry-After"]), (409, "1"))
+        # A claim whose request died is taken over.
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.start("a1").status_code, 201)
+        self.assertEqual(TestAttempt.objects.count(), 2)
+
+    def test_a_taken_over_claim_is_left_to_its_new_owner(self):
+        user = User.objects.get(username="student")
+        record, claimed = _claim(user, "a1", "first")
+        self.assertTrue(claimed)
+        # A duplicate took the claim over while this request was still running.
+        IdempotencyKey.objects.filter(pk=record.pk).update(fingerprint="second", created_at=timezone.now())
+
+        _store(record, HttpResponse(b"late"), None)
+        _owned(record).delete()
+
+        taken_over = IdempotencyKey.objects.get()
+        self.assertEqual((taken_over.fingerprint, taken_over.status_code), ("second", None))
+
+    def test_failed_requests_release_the_key(self):
+        attempt = TestAttempt.objects.create(student=Student.objects.get(), test=self.test)
+        url = reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt.id})
+        answers = {"answers": [{"question_id": self.question.id + 100, "selected_option_ids": []}]}
+
+        self.assertEqual(self.client.post(url, answers, format="json", HTTP_IDEMPOTENCY_KEY="s1").status_code, 404)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class DeadlineTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.create(title="Algebra", teacher=self.test.teacher, schedule={})
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.start_url = reverse("testapp:api_v1_student_start_attempt", kwargs={"test_id": self.test.id})
+
+    def expired_attempt(self, seconds_ago=3600):
+        deadline = timezone.now() - timedelta(seconds=seconds_ago)
+        attempt = TestAttempt.objects.create(student=self.student, test=self.test, deadline_at=deadline)
+        StudentAnswer.objects.create(attempt=attempt, question=self.choice).selected_answers.add(self.right)
+        return attempt
+
+    def test_start_ends_at_the_time_limit_or_the_assignment_window(self):
+        assignment = EnrollmentTest.objects.create(teacher=self.test.teacher, test=self.test, course=self.course)
+        started = self.client.post(self.start_url)
+        attempt = TestAttempt.objects.get(id=started.data["attempt_id"])
+        self.assertAlmostEqual((attempt.deadline_at - attempt.started_at).total_seconds(), self.test.time_limit_sec, delta=5)
+
+        assignment.end_date = timezone.now() + timedelta(minutes=5)
+        assignment.save()
+        attempt = TestAttempt.objects.get(id=self.client.post(self.start_url).data["attempt_id"])
+        self.assertEqual(attempt.deadline_at, assignment.end_date)
+
+        assignment.end_date = timezone.now() - timedelta(minutes=5)
+        assignment.save()
+        self.assertEqual(self.client.post(self.start_url).status_code, 403)
+
+    def test_late_submits_only_count_answers_saved_in_time(self):
+        attempt = self.expired_attempt()
+        autosave = reverse("testapp:api_v1_student_autosave_attempt", kwargs={"attempt_id": attempt.id})
+        self.assertEqual(
+            self.client.post(autosave, {"answers": [{"question_id": self.written.id, "written_answer": "42"}]}, format="json").status_code,
+            409,
+        )
+
+        response = self.client.post(
+            reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt.id}),
+            {"answers": [{"question_id": self.written.id, "written_answer": "42"}]},
+            format="json",
+        )
+        self.assertEqual((response.data["score"], response.data["late"]), (2.0, True))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.completed_at, attempt.deadline_at)
+
+    def test_late_submit_after_the_sweeper_is_refused(self):
+        attempt = self.expired_attempt()
+        call_command("expire_attempts", stdout=StringIO())
+        attempt.refresh_from_db()
+        finalized = (attempt.completed_at, attempt.score)
+
+        response = self.client.post(
+            reverse("testapp:api_v1_student_submit_attempt", kwargs={"attempt_id": attempt.id}),
+            {"answers": [{"question_id": self.written.id, "written_answer": "42"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.completed_at, attempt.score), finalized)
+        self.assertFalse(StudentAnswer.objects.filter(attempt=attempt, question=self.written).exists())
+
+    def test_sweeper_grades_expired_attempts_in_batches(self):
+        expired = [self.expired_attempt(), self.expired_attempt(seconds_ago=600), self.expired_attempt()]
+        within_grace = self.expired_attempt(seconds_ago=5)
+        unlimited = TestAttempt.objects.create(student=self.student, test=self.test)
+
+        output = StringIO()
+        call_command("expire_attempts", "--batch-size", "2", stdout=output)
+
+        self.assertIn("Finalized 3 expired attempts.", output.getvalue())
+
+        for attempt in expired:
+            attempt.refresh_from_db()
+            self.assertEqual((attempt.completed_at, attempt.score), (attempt.deadline_at, 2.0))
+        self.assertEqual(
+            set(TestAttempt.objects.filter(completed_at__isnull=True).values_list("id", flat=True)),
+            {within_grace.id, unlimited.id},
+        )
 
-# Create your tests here.
@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 from .api_views_v1 import (
     StudentAttemptResultAPIView,
+    StudentAutosaveAttemptAPIView,
     StudentAvailableTestsAPIView,
     StudentStartAttemptAPIView,
     StudentSubmitAttemptAPIView,
@@ -33,6 +34,11 @@ urlpatterns = [
     # v1 JSON API
     path("api/v1/student/tests/", StudentAvailableTestsAPIView.as_view(), name="api_v1_student_tests"),
     path("api/v1/student/tests/<int:test_id>/start/", StudentStartAttemptAPIView.as_view(), name="api_v1_student_start_attempt"),
+    path(
+        "api/v1/student/attempts/<int:attempt_id>/autosave/",
+        StudentAutosaveAttemptAPIView.as_view(),
+        name="api_v1_student_autosave_attempt",
+    ),
     path("api/v1/student/attempts/<int:attempt_id>/submit/", StudentSubmitAttemptAPIView.as_view(), name="api_v1_student_submit_attempt"),
     path("api/v1/student/attempts/<int:attempt_id>/result/", StudentAttemptResultAPIView.as_view(), name="api_v1_student_attempt_result"),
     path("api/v1/teacher/tests/<int:test_id>/results/", TeacherTestResultsAPIV1.as_view(), name="api_v1_teacher_test_results"),
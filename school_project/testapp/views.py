@@ -4,10 +4,11 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Test, Question, TestAttempt, StudentAnswer, Answer, EnrollmentTest, AnswerSelection
 from .serializers import (
-    TestSerializer, QuestionSerializer,TestAttemptResultSerializer,TestSerializer,
+    TestSerializer, TestListSerializer, QuestionSerializer,TestAttemptResultSerializer,TestSerializer,
     TestAttemptSerializer, AnswerSerializer, StudentAnswerSerializer,EnrollmentTestSerializer
 )
 from schoolapp.permissions import IsTeacher, IsStudent
+from school_project.fieldsets import SparseFieldsetViewMixin
 from schoolapp.models import Student
 import random
 from django.utils import timezone
@@ -46,10 +47,11 @@ def get_teacher_profile_or_403(user):
 
 
 # STEP 1: Create and manage Tests
-class TestViewSet(viewsets.ModelViewSet):
+class TestViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     queryset = Test.objects.all()
     serializer_class = TestSerializer
+    list_serializer_class = TestListSerializer
 
     def get_queryset(self):
         teacher = get_teacher_profile_or_403(self.request.user)
@@ -82,7 +84,7 @@ class TestViewSet(viewsets.ModelViewSet):
 
 
 # STEP 2: Create and manage Questions
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = QuestionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -111,7 +113,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
 
 
 # STEP 3: Create and manage Answers
-class AnswerViewSet(viewsets.ModelViewSet):
+class AnswerViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = AnswerSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -190,10 +192,12 @@ class SubmitAnswersView(APIView):
             question = get_object_or_404(Question, id=ans['question_id'])
             selected_options = ans.get('selected_option', [])
 
-            student_answer = StudentAnswer.objects.create(
+            # One answer per question and attempt: a resubmitted sheet replaces the old one.
+            student_answer, _ = StudentAnswer.objects.get_or_create(
                 attempt=attempt,
                 question=question
             )
+            student_answer.selected_answers.clear()
 
             # Single choice variantini listga aylantirish
             if not isinstance(selected_options, list):
@@ -288,7 +292,7 @@ def student_test_attempts_view(request):
 
 
 
-class EnrollmentTestViewSet(viewsets.ModelViewSet):
+class EnrollmentTestViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = EnrollmentTestSerializer
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
 